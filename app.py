@@ -4,6 +4,8 @@ import os
 from dotenv import load_dotenv
 from openai import OpenAI
 
+from src.utils.columnar_cache import load_table
+
 # Load environment variables
 load_dotenv()
 
@@ -21,8 +23,8 @@ except Exception as e:
 
 # Try loading the data files
 try:
-    buildings_df = pd.read_csv('data/Buildings.csv')
-    financial_df = pd.read_csv('data/Financial_Data.csv')
+    buildings_df = load_table('data/Buildings.csv')
+    financial_df = load_table('data/Financial_Data.csv')
 except Exception as e:
     st.error(f"Error loading data files: {str(e)}")
     st.stop()
@@ -6,6 +6,8 @@ import logging
 import re
 from datetime import datetime
 
+from src.utils.columnar_cache import load_table
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -19,8 +21,8 @@ class DataAwareAgent:
     def load_data(self, buildings_path: str, financial_path: str) -> Dict:
         """Load and validate CSV data files"""
         try:
-            self.buildings_df = pd.read_csv(buildings_path)
-            self.financial_df = pd.read_csv(financial_path)
+            self.buildings_df = load_table(buildings_path)
+            self.financial_df = load_table(financial_path)
             self.financial_df['Date'] = pd.to_datetime(self.financial_df['Date'])
             return {"status": "success", "buildings": len(self.buildings_df)}
         except Exception as e:
@@ -0,0 +1,378 @@
+import asyncio
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Tuple
+
+try:
+    import asyncpg
+except ImportError:  # Optional: without it queries run on the execution backend in worker threads
+    asyncpg = None
+from openai import AsyncOpenAI
+
+from src.utils.config import Config
+from src.chat_gpt import gpt_sql
+from src.chat_gpt.bounded_fetch import fetch_bounded_async, inject_limit, is_row_returning
+from src.chat_gpt.db_pool import database_dsn
+from src.chat_gpt.query_guard import QueryRejected, check_plan, explain_plan_async
+from src.chat_gpt.result_cache import get_result_cache
+from src.data_manager.data_versions import fetch_data_versions_async
+
+logger = logging.getLogger(__name__)
+
+
+class StageTimeout(Exception):
+    """A pipeline stage did not finish within its timeout."""
+
+
+class _Stage:
+    def __init__(self, name: str, concurrency: int, timeout: float):
+        """
+        Concurrency limit and timeout for one pipeline stage
+
+        :param name: Stage name used in logs and metrics
+        :param concurrency: Maximum calls in flight; further callers wait
+        :param timeout: Seconds before a call is cancelled
+        """
+        self.name = name
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+        self.completed = 0
+        self.timeouts = 0
+        self.cancelled = 0
+        self.total_seconds = 0.0
+
+    @asynccontextmanager
+    async def slot(self):
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        started = time.perf_counter()
+        try:
+            yield
+            self.completed += 1
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self.total_seconds += time.perf_counter() - started
+            self._slots.release()
+
+    async def run(self, coro):
+        """Await `coro` inside a slot, cancelling it after the stage timeout."""
+        async with self.slot():
+            try:
+                return await asyncio.wait_for(coro, self.timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                logger.error(f"Pipeline stage '{self.name}' timed out after {self.timeout:g}s")
+                raise StageTimeout(f"{self.name} timed out after {self.timeout:g}s")
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "concurrency": self.concurrency,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "timeouts": self.timeouts,
+            "cancelled": self.cancelled,
+            "avg_ms": (self.total_seconds / self.completed * 1000) if self.completed else 0.0,
+        }
+
+
+class AsyncQuestionPipeline:
+    def __init__(self, sql_concurrency: int = None, db_concurrency: int = None, narrative_concurrency: int = None,
+                 llm_timeout: float = None, query_timeout: float = None):
+        """
+        Asyncio version of generate_sql_query -> execute_validated_query -> analyze_data_with_gpt
+
+        Each stage has its own concurrency limit, so a burst of questions queues in
+        front of the LLM or the database instead of holding a thread each. Stages are
+        cancelled on timeout; cancelling the awaiting task cancels the in-flight OpenAI
+        request, or the PostgreSQL query when it runs on asyncpg. Must be used from one event loop.
+
+        Queries run on asyncpg when it is installed and EXECUTION_BACKEND is "postgres". Otherwise
+        the configured execution backend runs them on a worker thread, at most db_concurrency at a time.
+
+        :param sql_concurrency: Concurrent SQL-generation calls (default Config.ASYNC_SQL_CONCURRENCY)
+        :param db_concurrency: Concurrent queries, also the asyncpg pool size (default Config.ASYNC_DB_CONCURRENCY)
+        :param narrative_concurrency: Concurrent narrative calls (default Config.ASYNC_NARRATIVE_CONCURRENCY)
+        :param llm_timeout: Seconds per LLM call (default Config.LLM_TIMEOUT_SECONDS)
+        :param query_timeout: Seconds per query (default Config.QUERY_TIMEOUT_SECONDS)
+        """
+        llm_timeout = llm_timeout or Config.LLM_TIMEOUT_SECONDS
+        self.sql_stage = _Stage("sql_generation", sql_concurrency or Config.ASYNC_SQL_CONCURRENCY, llm_timeout)
+        self.db_stage = _Stage("query", db_concurrency or Config.ASYNC_DB_CONCURRENCY,
+                               query_timeout or Config.QUERY_TIMEOUT_SECONDS)
+        self.narrative_stage = _Stage("narrative", narrative_concurrency or Config.ASYNC_NARRATIVE_CONCURRENCY,
+                                      llm_timeout)
+        self.client = AsyncOpenAI(api_key=gpt_sql.openai.api_key)
+        self.use_asyncpg = asyncpg is not None and Config.EXECUTION_BACKEND == "postgres"
+        self._db_pool = None
+        self._db_pool_lock = asyncio.Lock()
+        self._versions: Dict[str, int] = {}
+        self._versions_fetched_at = float("-inf")
+
+    async def _pool(self):
+        async with self._db_pool_lock:
+            if self._db_pool is None:
+                self._db_pool = await asyncpg.create_pool(
+                    database_dsn(),
+                    min_size=min(Config.DB_POOL_MIN_SIZE, self.db_stage.concurrency),
+                    max_size=self.db_stage.concurrency,
+                    max_inactive_connection_lifetime=Config.DB_POOL_MAX_IDLE_SECONDS,
+                    server_settings={"statement_timeout": str(int(Config.STATEMENT_TIMEOUT_MS))},
+                )
+            return self._db_pool
+
+    async def _data_versions(self) -> Dict[str, int]:
+        """Table data versions, refreshed at most every Config.DATA_VERSION_REFRESH_SECONDS."""
+        if not self.use_asyncpg:
+            return await asyncio.to_thread(gpt_sql._data_version_tracker.current)
+        if time.monotonic() - self._versions_fetched_at >= Config.DATA_VERSION_REFRESH_SECONDS:
+            pool = await self._pool()
+            async with pool.acquire() as conn:
+                self._versions = await fetch_data_versions_async(conn)
+            self._versions_fetched_at = time.monotonic()
+        return self._versions
+
+    async def generate_sql(self, question: str, prev_context=None, use_cache: bool = True,
+                           hint: Optional[str] = None, metrics: Optional[Dict[str, Any]] = None) -> str:
+        """Async generate_sql_query: question/SQL cache first, then the LLM."""
+        if use_cache and gpt_sql.sql_cache is not None:
+            try:
+                cached_sql = await asyncio.to_thread(gpt_sql.sql_cache.get, question, prev_context)
+            except Exception as e:
+                logger.error(f"Error reading SQL cache: {e}")
+                cached_sql = None
+            if cached_sql:
+                logger.info(f"SQL cache hit for question: {question}")
+                if metrics is not None:
+                    metrics["sql_cache_hit"] = True
+                return cached_sql
+
+        messages, prompt_stats = gpt_sql.sql_generation_messages(question, prev_context, hint=hint)
+        response = await self.sql_stage.run(
+            self.client.chat.completions.create(model=Config.SQL_MODEL, messages=messages, max_tokens=200)
+        )
+        return gpt_sql.sql_from_completion(response, prompt_stats, metrics)
+
+    async def _run_query(self, query: str, max_rows: int) -> Dict[str, Any]:
+        """Bounded fetch under statement_timeout and the cost guard; raises QueryRejected."""
+        if not self.use_asyncpg:
+            return await asyncio.to_thread(gpt_sql.execute_query, query, max_rows)
+        try:
+            pool = await self._pool()
+            async with pool.acquire() as conn:
+                if Config.QUERY_GUARD_ENABLED and is_row_returning(query):
+                    plan = await explain_plan_async(conn, inject_limit(query, max_rows + 1))
+                    check_plan(plan, Config.MAX_QUERY_COST, Config.MAX_QUERY_ROWS)
+                logger.info(f"Executing SQL Query (asyncpg): {query}")
+                plan_limits = (Config.MAX_QUERY_COST, Config.MAX_QUERY_ROWS) if Config.QUERY_GUARD_ENABLED else None
+                result = await fetch_bounded_async(conn, query, max_rows, batch_size=Config.FETCH_BATCH_SIZE,
+                                                   plan_limits=plan_limits)
+        except QueryRejected:
+            raise
+        except (OSError, asyncpg.exceptions.InterfaceError) as e:
+            logger.error(f"Database connection failed: {e}")
+            return {"error": "Database connection failed", "details": str(e), "rows": [], "columns": []}
+        except asyncpg.exceptions.QueryCanceledError as e:
+            logger.error(f"Query cancelled by statement_timeout: {e}")
+            return {"error": "Query timed out", "details": str(e), "rows": [], "columns": []}
+        except asyncpg.exceptions.PostgresError as e:
+            logger.error(f"Query execution failed: {e}")
+            return {"error": str(e), "rows": [], "columns": []}
+        logger.info(f"Query Results - {len(result['rows'])} rows"
+                    f"{' (truncated at row cap)' if result.get('truncated') else ''}")
+        return result
+
+    async def _execute_prepared(self, query: str, metrics: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Result cache lookup, then the query stage; raises QueryRejected from the cost guard."""
+        versions = None
+        if Config.RESULT_CACHE_ENABLED:
+            versions = await self._data_versions()
+            cached = get_result_cache(gpt_sql.metadata_info).get(query, versions)
+            if cached is not None:
+                logger.info("Serving query result from cache")
+                if metrics is not None:
+                    metrics["result_cache_hit"] = True
+                return cached
+
+        try:
+            result = await self.db_stage.run(self._run_query(query, Config.MAX_RESULT_ROWS))
+        except StageTimeout as e:
+            return {"error": "Query timed out", "details": str(e), "rows": [], "columns": []}
+        if versions is not None and "error" not in result and result.get("columns"):
+            get_result_cache(gpt_sql.metadata_info).put(query, versions, result)
+        return result
+
+    async def execute_validated(self, query: str, question: Optional[str] = None, prev_context=None,
+                                metrics: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Async execute_validated_query: validation, rollup routing, result cache, cost guard and regeneration
+
+        SQL for a question that fails validation, is rejected or errors is evicted from the question/SQL cache;
+        a lost database connection is not the SQL's fault and leaves it cached.
+        """
+        result = await self._validate_and_execute(query, question, prev_context, metrics)
+        if question and "error" in result and result["error"] != "Database connection failed":
+            await asyncio.to_thread(gpt_sql.forget_cached_sql, question, query, prev_context)
+        return result
+
+    async def _validate_and_execute(self, query: str, question: Optional[str], prev_context,
+                                    metrics: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        original_query = query
+        attempts = Config.QUERY_GUARD_REGENERATE_ATTEMPTS if question else 0
+        while True:
+            query, errors = gpt_sql.prepare_query(query)
+            if errors:
+                return {"error": "Query validation failed", "details": errors}
+
+            try:
+                result = await self._execute_prepared(query, metrics)
+            except QueryRejected as rejection:
+                await asyncio.to_thread(gpt_sql.record_rejected_plan, query, rejection, question)
+                if attempts <= 0:
+                    return {"error": "Query rejected by cost guard", "details": rejection.reason,
+                            "estimated_cost": rejection.total_cost, "estimated_rows": rejection.plan_rows,
+                            "rejected": True, "rows": [], "columns": []}
+                attempts -= 1
+                logger.info("Regenerating SQL after cost guard rejection")
+                query = await self.generate_sql(question, prev_context, use_cache=False,
+                                                hint=gpt_sql.rejection_hint(query, rejection.reason), metrics=metrics)
+                continue
+            except Exception as e:
+                logger.error(f"Query execution failed: {e}")
+                return {"error": "Query execution failed", "details": str(e)}
+
+            if query != original_query and "error" not in result:
+                result = dict(result, sql_query=query)
+            return result
+
+    async def analyze(self, question: str, columns, rows, prev_context=None, digest=None,
+                      metrics: Optional[Dict[str, Any]] = None) -> str:
+        """Async analyze_data_with_gpt, returning the full narrative."""
+        messages = gpt_sql.narrative_messages(question, columns, rows, prev_context, digest)
+        started = time.perf_counter()
+        response = await self.narrative_stage.run(
+            self.client.chat.completions.create(model="gpt-4", messages=messages)
+        )
+        if metrics is not None:
+            metrics["total_time"] = time.perf_counter() - started
+            gpt_sql.add_token_usage(metrics, getattr(response, "usage", None))
+        return response.choices[0].message.content
+
+    async def stream_analysis(self, question: str, columns, rows, prev_context=None, digest=None,
+                              metrics: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """
+        Yield narrative tokens as they arrive
+
+        The narrative slot is held until the stream is exhausted or closed; the stage
+        timeout bounds the wait for the response to start. `metrics` receives
+        `time_to_first_token`, `total_time` and token usage.
+        """
+        metrics = metrics if metrics is not None else {}
+        messages = gpt_sql.narrative_messages(question, columns, rows, prev_context, digest)
+        async with self.narrative_stage.slot():
+            started = time.perf_counter()
+            try:
+                response = await asyncio.wait_for(
+                    self.client.chat.completions.create(model="gpt-4", messages=messages, stream=True,
+                                                        stream_options={"include_usage": True}),
+                    self.narrative_stage.timeout,
+                )
+            except asyncio.TimeoutError:
+                self.narrative_stage.timeouts += 1
+                raise StageTimeout(f"narrative timed out after {self.narrative_stage.timeout:g}s")
+            try:
+                async for chunk in response:
+                    gpt_sql.add_token_usage(metrics, getattr(chunk, "usage", None))
+                    if not chunk.choices or not chunk.choices[0].delta.content:
+                        continue
+                    if "time_to_first_token" not in metrics:
+                        metrics["time_to_first_token"] = time.perf_counter() - started
+                        logger.info(f"Narrative time-to-first-token: {metrics['time_to_first_token'] * 1000:.0f} ms")
+                    yield chunk.choices[0].delta.content
+            finally:
+                await response.close()
+                metrics["total_time"] = time.perf_counter() - started
+                logger.info(f"Narrative generation finished in {metrics['total_time'] * 1000:.0f} ms")
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Per-stage concurrency counters"""
+        return {stage.name: stage.metrics() for stage in (self.sql_stage, self.db_stage, self.narrative_stage)}
+
+    async def close(self):
+        if self._db_pool is not None:
+            await self._db_pool.close()
+            self._db_pool = None
+        await self.client.close()
+
+
+class _EventLoopThread:
+    def __init__(self):
+        """Background event loop shared by every synchronous caller (e.g. Streamlit script threads)."""
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="question-pipeline", daemon=True)
+        self._thread.start()
+
+    def run(self, coro, timeout: Optional[float] = None):
+        """Run `coro` on the loop and wait for it; the task is cancelled if the wait times out or is interrupted."""
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    def iterate(self, iterator: AsyncIterator) -> Iterator:
+        """Iterate an async iterator from a synchronous caller; closing the generator closes the iterator."""
+        async def step():
+            try:
+                return True, await iterator.__anext__()
+            except StopAsyncIteration:
+                return False, None
+
+        async def close():
+            await iterator.aclose()
+
+        try:
+            while True:
+                more, item = self.run(step())
+                if not more:
+                    return
+                yield item
+        finally:
+            self.run(close())
+
+
+_loop_thread: Optional[_EventLoopThread] = None
+_pipeline: Optional[AsyncQuestionPipeline] = None
+_lock = threading.Lock()
+
+
+def shared_pipeline() -> Tuple[_EventLoopThread, AsyncQuestionPipeline]:
+    """
+    The process-wide pipeline and the background loop it is bound to
+
+    The sync stage functions in gpt_sql run their coroutines through it, so every script
+    thread shares one loop and one set of per-stage limits.
+    """
+    global _loop_thread, _pipeline
+    with _lock:
+        if _loop_thread is None:
+            _loop_thread = _EventLoopThread()
+
+            async def create():
+                return AsyncQuestionPipeline()
+
+            _pipeline = _loop_thread.run(create())
+        return _loop_thread, _pipeline
@@ -0,0 +1,237 @@
+import logging
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.chat_gpt.query_guard import QueryRejected, check_plan, explain_plan, explain_plan_async
+from src.chat_gpt.sql_text import statement_kind, strip_trailing_semicolons, top_level_words
+
+logger = logging.getLogger(__name__)
+
+# PostgreSQL type OIDs treated as numeric for the digest: int2, int4, int8, float4, float8, numeric, money
+NUMERIC_TYPE_OIDS = {21, 23, 20, 700, 701, 1700, 790}
+
+
+def is_row_returning(sql_query: str) -> bool:
+    """Whether the statement can run through a server-side (DECLARE ... CURSOR) cursor."""
+    return statement_kind(sql_query) in ("select", "with", "values", "table")
+
+
+def has_top_level_limit(sql_query: str) -> bool:
+    words = top_level_words(sql_query)
+    return "limit" in words or "fetch" in words
+
+
+def inject_limit(sql_query: str, limit: int) -> str:
+    """
+    Append a LIMIT to row-returning statements that do not already have one
+
+    :param sql_query: Generated SQL
+    :param limit: Row cap
+    :return: SQL with a top-level LIMIT
+    """
+    sql_query = strip_trailing_semicolons(sql_query)
+    if not is_row_returning(sql_query) or has_top_level_limit(sql_query):
+        return sql_query
+    return f"{sql_query}\nLIMIT {int(limit)}"
+
+
+def _quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def build_digest_query(sql_query: str, numeric_columns: List[str]) -> str:
+    """SQL computing row count and min/max/sum of each numeric column over the full result."""
+    parts = ["COUNT(*)"]
+    for column in numeric_columns:
+        quoted = _quote_ident(column)
+        parts.extend([f"MIN({quoted})", f"MAX({quoted})", f"SUM({quoted})"])
+    return f"SELECT {', '.join(parts)} FROM ({strip_trailing_semicolons(sql_query)}) AS digest_source"
+
+
+def build_page_query(sql_query: str, page: int, page_size: int) -> str:
+    """SQL returning one page of the full (uncapped) result."""
+    offset = max(page, 0) * page_size
+    return (f"SELECT * FROM ({strip_trailing_semicolons(sql_query)}) AS paged_result "
+            f"LIMIT {int(page_size)} OFFSET {int(offset)}")
+
+
+def compute_digest(connection, sql_query: str, description,
+                   plan_limits: Optional[Tuple[float, float]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Run the digest query in the database
+
+    The digest reads the full, unlimited result, so with plan_limits it is planned first and
+    skipped when the estimate is over the cost guard's limits.
+
+    :param connection: Open DB-API connection (transaction is left for the caller to end)
+    :param sql_query: Original SQL without the injected row cap
+    :param description: cursor.description of the original query
+    :param plan_limits: (max_cost, max_rows) for check_plan, or None to run the digest unchecked
+    :return: {'row_count': n, 'columns': {name: {'min', 'max', 'sum'}}} or None on failure
+    """
+    numeric_columns = [desc[0] for desc in description if desc[1] in NUMERIC_TYPE_OIDS]
+    digest_query = build_digest_query(sql_query, numeric_columns)
+    try:
+        if plan_limits:
+            check_plan(explain_plan(connection, digest_query), *plan_limits)
+        with connection.cursor() as cursor:
+            cursor.execute(digest_query)
+            values = cursor.fetchone()
+    except QueryRejected as rejection:
+        logger.info(f"Skipped result digest: {rejection.reason}")
+        return None
+    except Exception as e:
+        # e.g. duplicate output column names cannot be wrapped in a subquery
+        logger.warning(f"Could not compute result digest: {e}")
+        return None
+
+    digest = {"row_count": values[0], "columns": {}}
+    for i, column in enumerate(numeric_columns):
+        low, high, total = values[1 + 3 * i: 4 + 3 * i]
+        digest["columns"][column] = {"min": low, "max": high, "sum": total}
+    return digest
+
+
+def fetch_bounded(connection, sql_query: str, max_rows: int, batch_size: int = 500,
+                  with_digest: bool = True, plan_limits: Optional[Tuple[float, float]] = None) -> Dict[str, Any]:
+    """
+    Execute a generated query and read at most `max_rows` rows
+
+    Row-returning statements run through a server-side named cursor read with
+    fetchmany, after a LIMIT of max_rows + 1 is injected when the query has none.
+    If the result was cut off, a digest of the full result is computed in the database.
+
+    :param connection: Open psycopg2 connection
+    :param sql_query: Generated SQL
+    :param max_rows: Row cap
+    :param batch_size: Rows per fetchmany round trip
+    :param with_digest: Compute an in-database digest when the result is truncated
+    :param plan_limits: (max_cost, max_rows) the digest query's plan must stay within
+    :return: Result dict with columns, rows, row_count, truncated and digest
+    """
+    if not is_row_returning(sql_query):
+        with connection.cursor() as cursor:
+            cursor.execute(sql_query)
+            if cursor.description:
+                columns = [desc[0] for desc in cursor.description]
+                rows = cursor.fetchmany(max_rows)
+                return {"columns": columns, "rows": rows, "row_count": len(rows),
+                        "truncated": cursor.fetchone() is not None, "digest": None}
+        connection.commit()
+        return {"message": "Query executed successfully.", "rows": [], "columns": []}
+
+    bounded_sql = inject_limit(sql_query, max_rows + 1)
+    cursor = connection.cursor(name=f"gen_sql_{uuid.uuid4().hex[:12]}")
+    cursor.itersize = batch_size
+    try:
+        cursor.execute(bounded_sql)
+        rows = []
+        while len(rows) <= max_rows:
+            batch = cursor.fetchmany(min(batch_size, max_rows + 1 - len(rows)))
+            if not batch:
+                break
+            rows.extend(batch)
+        description = cursor.description
+    finally:
+        cursor.close()
+
+    truncated = len(rows) > max_rows
+    rows = rows[:max_rows]
+    columns = [desc[0] for desc in description] if description else []
+
+    digest = None
+    if truncated and with_digest and description:
+        digest = compute_digest(connection, sql_query, description, plan_limits)
+
+    return {"columns": columns, "rows": rows, "row_count": len(rows),
+            "truncated": truncated, "digest": digest}
+
+
+def fetch_page(connection, sql_query: str, page: int, page_size: int) -> Dict[str, Any]:
+    """
+    Read one page of the full result, for UIs that browse past the row cap
+
+    :param connection: Open DB-API connection
+    :param sql_query: Original generated SQL
+    :param page: Zero-based page number
+    :param page_size: Rows per page
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(build_page_query(sql_query, page, page_size))
+        columns = [desc[0] for desc in cursor.description]
+        rows = cursor.fetchall()
+    return {"columns": columns, "rows": rows, "page": page, "page_size": page_size}
+
+
+async def compute_digest_async(connection, sql_query: str, attributes,
+                               plan_limits: Optional[Tuple[float, float]] = None) -> Optional[Dict[str, Any]]:
+    """compute_digest for an asyncpg connection; `attributes` come from PreparedStatement.get_attributes()."""
+    numeric_columns = [attr.name for attr in attributes if attr.type.oid in NUMERIC_TYPE_OIDS]
+    digest_query = build_digest_query(sql_query, numeric_columns)
+    try:
+        if plan_limits:
+            check_plan(await explain_plan_async(connection, digest_query), *plan_limits)
+        values = await connection.fetchrow(digest_query)
+    except QueryRejected as rejection:
+        logger.info(f"Skipped result digest: {rejection.reason}")
+        return None
+    except Exception as e:
+        logger.warning(f"Could not compute result digest: {e}")
+        return None
+
+    digest = {"row_count": values[0], "columns": {}}
+    for i, column in enumerate(numeric_columns):
+        low, high, total = values[1 + 3 * i], values[2 + 3 * i], values[3 + 3 * i]
+        digest["columns"][column] = {"min": low, "max": high, "sum": total}
+    return digest
+
+
+async def fetch_bounded_async(connection, sql_query: str, max_rows: int, batch_size: int = 500,
+                              with_digest: bool = True,
+                              plan_limits: Optional[Tuple[float, float]] = None) -> Dict[str, Any]:
+    """
+    fetch_bounded for an asyncpg connection
+
+    Row-returning statements are read through a server-side cursor inside a
+    transaction, batch_size rows per round trip. Rows are returned as tuples so
+    results look the same as on the psycopg2 path.
+
+    :param connection: asyncpg connection
+    :param sql_query: Generated SQL
+    :param max_rows: Row cap
+    :param batch_size: Rows per cursor fetch
+    :param with_digest: Compute an in-database digest when the result is truncated
+    :param plan_limits: (max_cost, max_rows) the digest query's plan must stay within
+    :return: Result dict with columns, rows, row_count, truncated and digest
+    """
+    if not is_row_returning(sql_query):
+        statement = await connection.prepare(sql_query)
+        attributes = statement.get_attributes()
+        if not attributes:
+            await statement.fetch()
+            return {"message": "Query executed successfully.", "rows": [], "columns": []}
+        records = await statement.fetch()
+        rows = [tuple(record) for record in records[:max_rows]]
+        return {"columns": [attr.name for attr in attributes], "rows": rows, "row_count": len(rows),
+                "truncated": len(records) > max_rows, "digest": None}
+
+    bounded_sql = inject_limit(sql_query, max_rows + 1)
+    async with connection.transaction():
+        statement = await connection.prepare(bounded_sql)
+        attributes = statement.get_attributes()
+        cursor = await statement.cursor()
+        rows = []
+        while len(rows) <= max_rows:
+            batch = await cursor.fetch(min(batch_size, max_rows + 1 - len(rows)))
+            if not batch:
+                break
+            rows.extend(tuple(record) for record in batch)
+
+    truncated = len(rows) > max_rows
+    rows = rows[:max_rows]
+    digest = None
+    if truncated and with_digest and attributes:
+        digest = await compute_digest_async(connection, sql_query, attributes, plan_limits)
+
+    return {"columns": [attr.name for attr in attributes], "rows": rows, "row_count": len(rows),
+            "truncated": truncated, "digest": digest}
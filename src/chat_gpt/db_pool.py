@@ -0,0 +1,347 @@
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+import psycopg2
+
+from src.utils.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available within the acquire timeout."""
+
+
+class _PooledConnection:
+    """Bookkeeping for a single physical connection owned by the pool."""
+
+    __slots__ = ("conn", "created_at", "last_used_at")
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.last_used_at = self.created_at
+
+
+class ConnectionPool:
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        min_size: int = 1,
+        max_size: int = 10,
+        acquire_timeout: float = 10.0,
+        max_idle_seconds: float = 300.0,
+        max_lifetime_seconds: float = 3600.0,
+        health_check_interval: float = 30.0,
+    ):
+        """
+        Thread-safe pool of DB-API connections
+
+        :param connect: Zero-argument callable returning a new connection
+        :param min_size: Number of idle connections kept open when possible
+        :param max_size: Upper bound on open connections (idle + in use)
+        :param acquire_timeout: Seconds to wait for a free connection before raising PoolTimeout
+        :param max_idle_seconds: Idle connections above min_size are closed after this long
+        :param max_lifetime_seconds: Connections older than this are recycled when returned or borrowed
+        :param health_check_interval: Connections idle for longer than this are pinged on borrow
+        """
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"Invalid pool size: min_size={min_size}, max_size={max_size}")
+
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.max_idle_seconds = max_idle_seconds
+        self.max_lifetime_seconds = max_lifetime_seconds
+        self.health_check_interval = health_check_interval
+
+        self._idle = deque()
+        self._in_use = {}
+        self._opening = 0
+        self._closed = False
+        self._cond = threading.Condition(threading.Lock())
+
+        self._stats = {
+            'borrow_count': 0,
+            'wait_count': 0,
+            'total_wait_seconds': 0.0,
+            'max_wait_seconds': 0.0,
+            'connections_created': 0,
+            'total_create_seconds': 0.0,
+            'health_check_failures': 0,
+            'connections_recycled': 0,
+            'timeouts': 0,
+        }
+
+        self._prefill()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def _prefill(self):
+        """Open min_size connections up front; failures are logged and retried lazily."""
+        for _ in range(self.min_size):
+            try:
+                entry = self._create_connection()
+            except Exception as e:
+                logger.warning(f"Could not pre-open pooled connection: {e}")
+                break
+            with self._cond:
+                self._idle.append(entry)
+
+    def _create_connection(self) -> _PooledConnection:
+        started = time.perf_counter()
+        conn = self._connect()
+        elapsed = time.perf_counter() - started
+        if conn is None:
+            raise psycopg2.OperationalError("Connection factory returned no connection")
+
+        with self._cond:
+            self._stats['connections_created'] += 1
+            self._stats['total_create_seconds'] += elapsed
+        logger.info(f"Opened pooled DB connection in {elapsed * 1000:.1f} ms")
+        return _PooledConnection(conn)
+
+    @staticmethod
+    def _close_quietly(entry: _PooledConnection):
+        try:
+            entry.conn.close()
+        except Exception:
+            pass
+
+    def _is_expired(self, entry: _PooledConnection, now: float) -> bool:
+        return bool(self.max_lifetime_seconds) and now - entry.created_at > self.max_lifetime_seconds
+
+    def _is_healthy(self, entry: _PooledConnection, now: float) -> bool:
+        """Cheap closed-flag check always; round-trip ping only for long-idle connections."""
+        if getattr(entry.conn, 'closed', 0):
+            return False
+        if now - entry.last_used_at < self.health_check_interval:
+            return True
+        try:
+            with entry.conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+            entry.conn.rollback()
+            return True
+        except Exception as e:
+            logger.warning(f"Pooled connection failed health check: {e}")
+            return False
+
+    def _reap_idle(self, now: float):
+        """Close idle connections beyond min_size that have sat unused too long. Caller holds the lock."""
+        stale = []
+        while len(self._idle) > self.min_size:
+            oldest = self._idle[0]
+            if now - oldest.last_used_at <= self.max_idle_seconds:
+                break
+            stale.append(self._idle.popleft())
+        self._stats['connections_recycled'] += len(stale)
+        return stale
+
+    def getconn(self, timeout: Optional[float] = None):
+        """
+        Borrow a connection, opening a new one if the pool is below max_size
+
+        :param timeout: Override for acquire_timeout
+        :return: A live DB-API connection
+        :raises PoolTimeout: If the pool stays exhausted for the whole timeout
+        """
+        timeout = self.acquire_timeout if timeout is None else timeout
+        started = time.perf_counter()
+        deadline = time.monotonic() + timeout
+        waited = False
+
+        while True:
+            to_close = []
+            entry = None
+            must_open = False
+
+            with self._cond:
+                if self._closed:
+                    raise PoolTimeout("Connection pool is closed")
+
+                now = time.monotonic()
+                to_close.extend(self._reap_idle(now))
+
+                if self._idle:
+                    # LIFO keeps the hottest connections in use and lets the rest age out
+                    entry = self._idle.pop()
+                elif len(self._in_use) + self._opening < self.max_size:
+                    self._opening += 1
+                    must_open = True
+                else:
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolTimeout(
+                            f"No database connection available after {timeout:.1f}s "
+                            f"({len(self._in_use)} in use, max_size={self.max_size})"
+                        )
+                    waited = True
+                    self._cond.wait(remaining)
+                    continue
+
+            for stale in to_close:
+                self._close_quietly(stale)
+
+            if must_open:
+                try:
+                    entry = self._create_connection()
+                finally:
+                    with self._cond:
+                        self._opening -= 1
+                        if entry is None:
+                            self._cond.notify()
+            else:
+                now = time.monotonic()
+                if self._is_expired(entry, now):
+                    with self._cond:
+                        self._stats['connections_recycled'] += 1
+                    self._close_quietly(entry)
+                    continue
+                if not self._is_healthy(entry, now):
+                    with self._cond:
+                        self._stats['health_check_failures'] += 1
+                    self._close_quietly(entry)
+                    continue
+
+            wait_seconds = time.perf_counter() - started
+            with self._cond:
+                self._in_use[id(entry.conn)] = entry
+                self._stats['borrow_count'] += 1
+                self._stats['total_wait_seconds'] += wait_seconds
+                self._stats['max_wait_seconds'] = max(self._stats['max_wait_seconds'], wait_seconds)
+                if waited:
+                    self._stats['wait_count'] += 1
+            return entry.conn
+
+    def putconn(self, conn, discard: bool = False):
+        """
+        Return a borrowed connection to the pool
+
+        :param conn: Connection previously obtained from getconn
+        :param discard: Close the connection instead of keeping it (e.g. after a network error)
+        """
+        with self._cond:
+            entry = self._in_use.pop(id(conn), None)
+        if entry is None:
+            raise ValueError("Connection does not belong to this pool")
+
+        now = time.monotonic()
+        if not discard and not getattr(conn, 'closed', 0):
+            try:
+                # Never hand out a connection with an open transaction
+                conn.rollback()
+            except Exception as e:
+                logger.warning(f"Discarding pooled connection that failed to reset: {e}")
+                discard = True
+        else:
+            discard = True
+
+        if not discard and self._is_expired(entry, now):
+            discard = True
+            with self._cond:
+                self._stats['connections_recycled'] += 1
+
+        with self._cond:
+            if discard or self._closed:
+                self._cond.notify()
+            else:
+                entry.last_used_at = now
+                self._idle.append(entry)
+                self._cond.notify()
+                return
+        self._close_quietly(entry)
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None):
+        """Borrow a connection for the duration of a `with` block."""
+        conn = self.getconn(timeout)
+        discard = False
+        try:
+            yield conn
+        except psycopg2.extensions.QueryCanceledError:
+            # statement_timeout fired; the connection itself is fine
+            raise
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            discard = True
+            raise
+        finally:
+            self.putconn(conn, discard=discard)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Snapshot of pool usage counters"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats['in_use'] = len(self._in_use)
+            stats['idle'] = len(self._idle)
+            stats['open'] = len(self._in_use) + len(self._idle)
+            stats['max_size'] = self.max_size
+            stats['min_size'] = self.min_size
+        borrows = stats['borrow_count']
+        created = stats['connections_created']
+        stats['avg_wait_ms'] = (stats['total_wait_seconds'] / borrows * 1000) if borrows else 0.0
+        stats['avg_create_ms'] = (stats['total_create_seconds'] / created * 1000) if created else 0.0
+        return stats
+
+    def close(self):
+        """Close all idle connections; borrowed ones are closed when returned."""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        for entry in idle:
+            self._close_quietly(entry)
+
+
+def database_dsn() -> str:
+    """Config.DATABASE_URI as a plain libpq URI (drops the SQLAlchemy driver suffix)."""
+    database_uri = Config.DATABASE_URI
+    if not database_uri:
+        raise ValueError("DATABASE_URI is not set")
+
+    if database_uri.startswith("postgresql+psycopg2://"):
+        database_uri = database_uri.replace("postgresql+psycopg2://", "postgresql://")
+    return database_uri
+
+
+def _connect_from_config():
+    return psycopg2.connect(database_dsn())
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Return the process-wide pool, creating it from Config on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.closed:
+            _pool = ConnectionPool(
+                _connect_from_config,
+                min_size=Config.DB_POOL_MIN_SIZE,
+                max_size=Config.DB_POOL_MAX_SIZE,
+                acquire_timeout=Config.DB_POOL_ACQUIRE_TIMEOUT,
+                max_idle_seconds=Config.DB_POOL_MAX_IDLE_SECONDS,
+                max_lifetime_seconds=Config.DB_POOL_MAX_LIFETIME_SECONDS,
+                health_check_interval=Config.DB_POOL_HEALTH_CHECK_INTERVAL,
+            )
+        return _pool
+
+
+def close_pool():
+    """Close the process-wide pool (e.g. when DATABASE_URI changes)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
@@ -0,0 +1,334 @@
+import glob
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+import psycopg2
+
+from src.utils.columnar_cache import load_table
+from src.utils.config import Config
+from src.utils.schema import metadata
+from src.chat_gpt.bounded_fetch import (build_digest_query, build_page_query, fetch_bounded, fetch_page,
+                                        inject_limit, is_row_returning)
+from src.chat_gpt.db_pool import PoolTimeout, get_pool
+from src.chat_gpt.query_guard import check_plan, explain_plan
+from src.chat_gpt.sqlite_dialect import register_functions, to_sqlite
+from src.data_manager.bulk_loader import normalize_column
+from src.data_manager.data_versions import fetch_data_versions
+from src.data_manager.occupancy_rollups import ROLLUP_DEFINITIONS
+
+logger = logging.getLogger(__name__)
+
+
+def _timed_out(limit_ms) -> Dict[str, Any]:
+    return {"error": "Query timed out",
+            "details": f"The query ran longer than {limit_ms} ms and was cancelled.",
+            "rows": [], "columns": []}
+
+
+class PostgresBackend:
+    """Generated SQL against the PostgreSQL server in Config.DATABASE_URI, through the connection pool"""
+    name = "postgres"
+
+    def _guard(self, conn, sql_query: str, planned_query: str):
+        """
+        statement_timeout for the transaction, then the EXPLAIN cost guard on the SQL that will run
+
+        :raises QueryRejected: When the planner's estimate is over the limits
+        """
+        if Config.STATEMENT_TIMEOUT_MS:
+            with conn.cursor() as cursor:
+                cursor.execute("SET LOCAL statement_timeout = %s", (int(Config.STATEMENT_TIMEOUT_MS),))
+        if Config.QUERY_GUARD_ENABLED and is_row_returning(sql_query):
+            check_plan(explain_plan(conn, planned_query), Config.MAX_QUERY_COST, Config.MAX_QUERY_ROWS)
+
+    def execute(self, sql_query: str, max_rows: int) -> Dict[str, Any]:
+        """
+        Bounded, batched fetch under statement_timeout and the EXPLAIN cost guard
+
+        The digest of a truncated result is planned against the same limits and left out when over them.
+
+        :raises QueryRejected: When the planner's estimate is over the limits
+        """
+        plan_limits = (Config.MAX_QUERY_COST, Config.MAX_QUERY_ROWS) if Config.QUERY_GUARD_ENABLED else None
+        try:
+            with get_pool().connection() as conn:
+                self._guard(conn, sql_query, inject_limit(sql_query, max_rows + 1))
+                return fetch_bounded(conn, sql_query, max_rows, batch_size=Config.FETCH_BATCH_SIZE,
+                                     plan_limits=plan_limits)
+        except psycopg2.extensions.QueryCanceledError as e:
+            logger.error(f"Query cancelled by statement_timeout: {e}")
+            return _timed_out(Config.STATEMENT_TIMEOUT_MS)
+        except (PoolTimeout, psycopg2.OperationalError, ValueError) as e:
+            logger.error(f"Database connection failed: {e}")
+            return {"error": "Database connection failed", "details": str(e), "rows": [], "columns": []}
+
+    def fetch_page(self, sql_query: str, page: int, page_size: int) -> Dict[str, Any]:
+        """
+        One page of the uncapped result, under the same statement_timeout and cost guard as execute
+
+        :raises QueryRejected: When the planner's estimate for the page query is over the limits
+        """
+        try:
+            with get_pool().connection() as conn:
+                self._guard(conn, sql_query, build_page_query(sql_query, page, page_size))
+                return fetch_page(conn, sql_query, page, page_size)
+        except psycopg2.extensions.QueryCanceledError as e:
+            logger.error(f"Result page cancelled by statement_timeout: {e}")
+            return _timed_out(Config.STATEMENT_TIMEOUT_MS)
+
+    def data_versions(self) -> Dict[str, int]:
+        with get_pool().connection() as conn:
+            return fetch_data_versions(conn)
+
+    def metrics(self) -> Dict[str, Any]:
+        return dict(get_pool().metrics(), backend=self.name)
+
+
+# Embedded tables -> files (globs) under the data directory; .parquet files are read when present
+EMBEDDED_SOURCES = {
+    "buildings": ["Buildings.csv", "Buildings.parquet"],
+    "financials": ["Financial_Data.csv", "Financial_Data.parquet"],
+    "floor_occupancy": ["floors_occupancy.csv", "floors_occupancy.parquet"],
+    "floor_utilization": ["floors_utilization_2024.csv", "Building_Group_*_Occupancy_*.csv",
+                          "Building_Group_*_Occupancy_*.parquet"],
+    "energy_consumption": ["Building_Group_*_Energy_*.csv", "Building_Group_*_Energy_*.parquet"],
+}
+
+# Readings files write timestamps day first
+READING_TIME_FORMAT = "%d/%m/%Y %H:%M"
+
+# SQLAlchemy column type -> SQLite affinity; dates are ISO text so they compare and sort correctly
+_SQLITE_TYPES = {"Integer": "INTEGER", "BigInteger": "INTEGER", "Boolean": "INTEGER", "Float": "REAL"}
+
+
+def sqlite_table_ddl(table) -> List[str]:
+    """CREATE TABLE / INDEX statements for a schema.py table (no PostgreSQL-only options)"""
+    columns = ", ".join(f"{column.name} {_SQLITE_TYPES.get(column.type.__class__.__name__, 'TEXT')}"
+                        for column in table.columns)
+    statements = [f"CREATE TABLE {table.name} ({columns})"]
+    for index in table.indexes:
+        if index.dialect_options["postgresql"].get("using"):
+            continue
+        unique = "UNIQUE " if index.unique else ""
+        statements.append(f"CREATE {unique}INDEX {index.name} ON {table.name} "
+                          f"({', '.join(column.name for column in index.columns)})")
+    return statements
+
+
+class SQLiteBackend:
+    name = "sqlite"
+
+    def __init__(self, data_dir: str = "data", timeout_ms: Optional[int] = None):
+        """
+        In-process SQLite copy of the portfolio for single-node and local use
+
+        The data directory is loaded into a shared in-memory database with the tables and
+        columns of schema.py, plus the occupancy rollups. Generated SQL is passed
+        through the sqlite_dialect shim before it runs.
+
+        :param data_dir: Directory laid out like ./data (CSV or Parquet files)
+        :param timeout_ms: Abort statements running longer than this (default Config.STATEMENT_TIMEOUT_MS)
+        """
+        self.data_dir = data_dir
+        self.timeout_ms = Config.STATEMENT_TIMEOUT_MS if timeout_ms is None else timeout_ms
+        self._uri = f"file:embedded_{uuid.uuid4().hex[:8]}?mode=memory&cache=shared"
+        self._local = threading.local()
+        self._load_lock = threading.Lock()
+        self._generation = 0
+        self._stats = {"queries": 0, "timeouts": 0, "load_seconds": 0.0}
+        self._stats_lock = threading.Lock()
+        # The in-memory database lives as long as one connection to it is open
+        self._keeper = self._connect()
+        self.load()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self._uri, uri=True, check_same_thread=False)
+        register_functions(connection)
+        return connection
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = self._connect()
+        return connection
+
+    def _source_files(self, table_name: str) -> List[str]:
+        files = []
+        for pattern in EMBEDDED_SOURCES[table_name]:
+            files.extend(sorted(glob.glob(os.path.join(self.data_dir, pattern))))
+        return files
+
+    def _read_source(self, path: str, table) -> pd.DataFrame:
+        df = pd.read_parquet(path) if path.endswith(".parquet") else load_table(path)
+        df = df.rename(columns=normalize_column)
+        for column in table.columns:
+            if column.name not in df.columns:
+                continue
+            type_name = column.type.__class__.__name__
+            if type_name == "Date":
+                df[column.name] = pd.to_datetime(df[column.name], dayfirst=True).dt.strftime("%Y-%m-%d")
+            elif type_name == "DateTime":
+                values = df[column.name]
+                if not pd.api.types.is_datetime64_any_dtype(values):
+                    values = pd.to_datetime(values, format=READING_TIME_FORMAT)
+                df[column.name] = values.dt.strftime("%Y-%m-%d %H:%M:%S")
+            elif isinstance(df[column.name].dtype, pd.CategoricalDtype):
+                df[column.name] = df[column.name].astype(str)
+        return df[[column.name for column in table.columns if column.name in df.columns]]
+
+    def load(self):
+        """(Re)build every table from the data directory and recompute the rollups."""
+        started = time.perf_counter()
+        with self._load_lock:
+            connection = self._keeper
+            for table_name in EMBEDDED_SOURCES:
+                table = metadata.tables[table_name]
+                connection.execute(f"DROP TABLE IF EXISTS {table_name}")
+                for statement in sqlite_table_ddl(table):
+                    connection.execute(statement)
+                next_id = 1
+                for path in self._source_files(table_name):
+                    df = self._read_source(path, table)
+                    # Surrogate ids are SERIAL in PostgreSQL; number the rows here
+                    if "id" in table.columns and "id" not in df.columns:
+                        df.insert(0, "id", range(next_id, next_id + len(df)))
+                        next_id += len(df)
+                    df.to_sql(table_name, connection, if_exists="append", index=False, chunksize=50_000)
+                    logger.info(f"Embedded backend loaded {len(df)} rows from {path} into {table_name}")
+
+            for view_name, definition in ROLLUP_DEFINITIONS.items():
+                connection.execute(f"DROP TABLE IF EXISTS {view_name}")
+                connection.execute(f"CREATE TABLE {view_name} AS {to_sqlite(definition)}")
+                connection.execute(f"CREATE UNIQUE INDEX {view_name}_key ON {view_name} "
+                                   f"(building_id, floor, period_start)")
+            connection.commit()
+            self._generation += 1
+        with self._stats_lock:
+            self._stats["load_seconds"] = time.perf_counter() - started
+        logger.info(f"Embedded backend ready in {self._stats['load_seconds']:.1f}s")
+
+    @contextmanager
+    def _deadline(self, connection: sqlite3.Connection):
+        """
+        Enforce the statement timeout through SQLite's progress handler
+
+        SQLite computes rows as they are stepped, so the handler stays installed until the caller
+        has read them, not just until execute() returns.
+        """
+        if not self.timeout_ms:
+            yield
+            return
+        deadline = time.monotonic() + self.timeout_ms / 1000
+        connection.set_progress_handler(lambda: int(time.monotonic() > deadline), 10_000)
+        try:
+            yield
+        finally:
+            connection.set_progress_handler(None, 0)
+
+    def _cancelled(self, error: sqlite3.OperationalError) -> Dict[str, Any]:
+        if "interrupted" not in str(error):
+            raise error
+        with self._stats_lock:
+            self._stats["timeouts"] += 1
+        logger.error(f"Embedded query cancelled after {self.timeout_ms} ms")
+        return _timed_out(self.timeout_ms)
+
+    def execute(self, sql_query: str, max_rows: int) -> Dict[str, Any]:
+        """
+        Run generated PostgreSQL-flavoured SQL in process, reading at most max_rows rows
+
+        There is no planner cost estimate in SQLite, so the EXPLAIN guard does not apply;
+        the statement timeout does, to the digest query as well.
+        """
+        sqlite_query = to_sqlite(sql_query)
+        connection = self._connection()
+        with self._stats_lock:
+            self._stats["queries"] += 1
+        try:
+            with self._deadline(connection):
+                if not is_row_returning(sqlite_query):
+                    cursor = connection.execute(sqlite_query)
+                    if cursor.description:
+                        rows = cursor.fetchmany(max_rows)
+                        truncated = cursor.fetchone() is not None
+                        connection.commit()
+                        return {"columns": [desc[0] for desc in cursor.description], "rows": rows,
+                                "row_count": len(rows), "truncated": truncated, "digest": None}
+                    connection.commit()
+                    return {"message": "Query executed successfully.", "rows": [], "columns": []}
+
+                cursor = connection.execute(inject_limit(sqlite_query, max_rows + 1))
+                rows = cursor.fetchall()
+                columns = [desc[0] for desc in cursor.description] if cursor.description else []
+                truncated = len(rows) > max_rows
+                rows = rows[:max_rows]
+                digest = self._digest(connection, sqlite_query, columns, rows) if truncated else None
+            return {"columns": columns, "rows": rows, "row_count": len(rows),
+                    "truncated": truncated, "digest": digest}
+        except sqlite3.OperationalError as e:
+            return self._cancelled(e)
+
+    def _digest(self, connection, sqlite_query: str, columns: List[str], rows) -> Optional[Dict[str, Any]]:
+        """compute_digest for SQLite, which has no column types: numeric columns are judged from the rows read"""
+        numeric_columns = [column for index, column in enumerate(columns)
+                           if rows and all(isinstance(row[index], (int, float)) or row[index] is None for row in rows)
+                           and any(row[index] is not None for row in rows)]
+        try:
+            values = connection.execute(build_digest_query(sqlite_query, numeric_columns)).fetchone()
+        except Exception as e:
+            logger.warning(f"Could not compute result digest: {e}")
+            return None
+        digest = {"row_count": values[0], "columns": {}}
+        for i, column in enumerate(numeric_columns):
+            low, high, total = values[1 + 3 * i: 4 + 3 * i]
+            digest["columns"][column] = {"min": low, "max": high, "sum": total}
+        return digest
+
+    def fetch_page(self, sql_query: str, page: int, page_size: int) -> Dict[str, Any]:
+        connection = self._connection()
+        try:
+            with self._deadline(connection):
+                cursor = connection.execute(build_page_query(to_sqlite(sql_query), page, page_size))
+                rows = cursor.fetchall()
+        except sqlite3.OperationalError as e:
+            return self._cancelled(e)
+        return {"columns": [desc[0] for desc in cursor.description], "rows": rows,
+                "page": page, "page_size": page_size}
+
+    def data_versions(self) -> Dict[str, int]:
+        """Every table changes together when the data directory is reloaded."""
+        return {table_name: self._generation for table_name in list(EMBEDDED_SOURCES) + list(ROLLUP_DEFINITIONS)}
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return dict(self._stats, backend=self.name, generation=self._generation)
+
+BACKENDS = {
+    "postgres": PostgresBackend,
+    "sqlite": SQLiteBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Return the process-wide execution backend selected by Config.EXECUTION_BACKEND."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            name = Config.EXECUTION_BACKEND
+            if name not in BACKENDS:
+                raise ValueError(f"Unknown EXECUTION_BACKEND: {name} (expected one of {sorted(BACKENDS)})")
+            if name == "sqlite":
+                _backend = SQLiteBackend(Config.EMBEDDED_DATA_DIR)
+            else:
+                _backend = PostgresBackend()
+        return _backend
@@ -1,13 +1,21 @@
 import os
+import hashlib
 import openai
-import psycopg2
 import logging
 import json
 from urllib.parse import urlparse
-from datetime import datetime
 from dotenv import load_dotenv
-from openai import OpenAI
 from src.utils.config import Config
+from src.chat_gpt.db_pool import get_pool
+from src.chat_gpt.result_cache import get_result_cache, DataVersionTracker
+from src.chat_gpt.sql_cache import QuestionSQLCache
+from src.chat_gpt.execution_backend import get_backend
+from src.chat_gpt.metrics_store import QuestionTrace, get_metrics_store, outcome_of
+from src.chat_gpt.prompt_builder import PromptBuilder, prompt_version
+from src.chat_gpt.query_guard import QueryRejected, RejectedPlanLog
+from src.chat_gpt.result_digest import digest_rows
+from src.chat_gpt.rollup_rewriter import rewrite_to_rollup
+from src.data_manager.occupancy_rollups import ROLLUP_VIEWS
 
 load_dotenv()
 
@@ -101,12 +109,41 @@ floor_utilization_metadata = {
     }
 }
 
+
+
+def _rollup_metadata(view_name, grain):
+    return {
+        "table_name": view_name,
+        "columns": {
+            "building_id": {"type": "string", "description": "Unique identifier for each building.", "foreign_key": "buildings.building_id"},
+            "floor": {"type": "integer", "description": "The floor number within the building."},
+            "period_start": {"type": "datetime", "description": f"Start of the {grain} the row summarizes (date_trunc('{grain}', floor_utilization.time))."},
+            "occupancy_sum": {"type": "integer", "description": f"Sum of occupancy readings in the {grain}."},
+            "occupancy_avg": {"type": "float", "description": f"Average occupancy over the {grain}'s readings."},
+            "occupancy_max": {"type": "integer", "description": f"Peak occupancy in the {grain}."},
+            "occupancy_min": {"type": "integer", "description": f"Lowest occupancy in the {grain}."},
+            "reading_count": {"type": "integer", "description": f"Number of floor_utilization readings in the {grain}."},
+            "max_capacity": {"type": "integer", "description": "Maximum capacity of the floor (from floor_occupancy)."},
+            "utilization_avg_pct": {"type": "float", "description": f"Average occupancy as a percentage of max_capacity over the {grain}."},
+        },
+        "relationships": {
+            "foreign_keys": {"buildings": "building_id"}
+        }
+    }
+
+
 metadata_info = {
     "buildings": buildings_metadata,
     "financials": financials_metadata,
     "floor_occupancy": floor_occupancy_metadata,
     "floor_utilization": floor_utilization_metadata,
 }
+for _grain, _view_name in ROLLUP_VIEWS.items():
+    metadata_info[_view_name] = _rollup_metadata(_view_name, _grain)
+
+
+# Selects the relevant tables for each question and renders them as compact DDL
+prompt_builder = PromptBuilder(metadata_info, token_budget=Config.SQL_PROMPT_TOKEN_BUDGET)
 
 
 # AI Agent Instructions
@@ -126,270 +163,298 @@ openai.api_key = os.getenv("OPENAI_API_KEY")
 
 if not openai.api_key:
     raise ValueError("OpenAI API key is missing from environment variables.")
-client = OpenAI(api_key=openai.api_key)
 
-def connect_to_db():
+SQL_SYSTEM_PROMPT = "You are an SQL generator. Return ONLY SQL queries without any explanation."
+
+# Question -> validated SQL cache; keyed on the schema, prompt rules and model so a change to any starts a fresh cache
+_schema_fingerprint = hashlib.sha256(json.dumps(
+    {"schema": metadata_info, "prompt": prompt_version(), "system": SQL_SYSTEM_PROMPT, "model": Config.SQL_MODEL},
+    sort_keys=True).encode("utf-8")).hexdigest()[:16]
+sql_cache = QuestionSQLCache(
+    db_path=Config.SQL_CACHE_PATH,
+    schema_version=_schema_fingerprint,
+    max_age_days=Config.SQL_CACHE_MAX_AGE_DAYS
+) if Config.SQL_CACHE_ENABLED else None
+
+# Generated queries refused by the EXPLAIN cost guard, kept for tuning MAX_QUERY_COST / MAX_QUERY_ROWS
+rejected_plans = RejectedPlanLog(Config.REJECTED_PLANS_PATH) if Config.QUERY_GUARD_ENABLED else None
+
+
+def remember_validated_sql(user_input, sql_query, prev_context=None):
+    """Store SQL that validated and executed successfully so the question can skip the LLM next time."""
+    if sql_cache is None:
+        return
     try:
-        #database_uri = os.getenv("DATABASE_URI")
-        database_uri = Config.DATABASE_URI
-
-        if not database_uri:
-            raise ValueError("DATABASE_URI environment variable is not set")
-        
-        if database_uri.startswith("postgresql+psycopg2://"):
-            database_uri = database_uri.replace("postgresql+psycopg2://", "postgresql://")
-        
-        logging.info(f"Connecting to DB at host: localhost, port: 5433")
-
-        # Establish connection
-        return psycopg2.connect(database_uri)
-    
+        sql_cache.put(user_input, sql_query, prev_context)
+    except Exception as e:
+        logging.error(f"Error caching SQL for question: {e}")
+
+
+def forget_cached_sql(user_input, sql_query, prev_context=None):
+    """Drop cached SQL that failed or was rejected at execution, so the question is generated afresh next time."""
+    if sql_cache is None:
+        return
+    try:
+        sql_cache.evict(user_input, prev_context, sql_query)
     except Exception as e:
-        logging.error(f"Database connection failed: {e}")
-        return None
+        logging.error(f"Error evicting cached SQL for question: {e}")
+
+
+def get_sql_cache_metrics():
+    """Question/SQL cache counters for the analytics sidebar."""
+    return sql_cache.metrics() if sql_cache is not None else {}
+
+
+def purge_sql_cache(older_than_days=None):
+    """Admin operation: drop cached question/SQL pairs."""
+    return sql_cache.purge(older_than_days=older_than_days) if sql_cache is not None else 0
+
+
+def sql_generation_messages(user_input, prev_context=None, hint=None):
+    """Chat messages for the SQL-generation call, plus the prompt builder's stats."""
+    prompt, prompt_stats = prompt_builder.build(user_input, prev_context, hint=hint)
+    messages = [
+        {"role": "system", "content": SQL_SYSTEM_PROMPT},
+        {"role": "system", "content": prompt}]
+    return messages, prompt_stats
+
+
+def add_token_usage(metrics, usage):
+    """Accumulate token usage from a completion into a metrics dict."""
+    if metrics is None or usage is None:
+        return
+    metrics["prompt_tokens"] = metrics.get("prompt_tokens", 0) + (usage.prompt_tokens or 0)
+    metrics["completion_tokens"] = metrics.get("completion_tokens", 0) + (usage.completion_tokens or 0)
+
+
+def sql_from_completion(response, prompt_stats, metrics=None):
+    """Extract the generated SQL from a chat completion and log token usage."""
+    usage = getattr(response, "usage", None)
+    add_token_usage(metrics, usage)
+    if usage is not None:
+        logging.info(f"SQL generation tokens: prompt={usage.prompt_tokens} "
+                     f"(estimated {prompt_stats['prompt_tokens']}), completion={usage.completion_tokens}")
+    sql_query = response.choices[0].message.content.strip()
+    logging.info(f"Generated SQL Query: {sql_query}")
+    return sql_query
+
+
+def _pipeline():
+    """Shared event loop and AsyncQuestionPipeline; imported here because the pipeline builds on this module."""
+    from src.chat_gpt.async_pipeline import shared_pipeline
+    return shared_pipeline()
+
 
 # Generate SQL Query using GPT
-def generate_sql_query(user_input, prev_context=None):
+def generate_sql_query(user_input, prev_context=None, use_cache=True, hint=None, metrics=None):
+    """
+    Generate SQL for a question; `hint` explains why a previous attempt was refused.
+
+    `metrics` (dict) receives `sql_cache_hit` and accumulated `prompt_tokens` / `completion_tokens`.
+    Runs AsyncQuestionPipeline.generate_sql on the shared loop.
+    """
+    loop_thread, pipeline = _pipeline()
     try:
-        
-        # Default context values
-        context = {
-            "previous_question": None,
-            "previous_field": None
-        }
-        
-        # Update context if provided
-        if prev_context:
-            context.update(prev_context)                        
-        
-        prompt = f"""
-        You are Synoptik Real Estate Assistant AI. 
-        The database engine is PostgreSQL. Use PostgreSQL syntax for all SQL queries.
-        Use the following conversation history and rules:
-        Conversation History:
-        {context}
-        
-        Conversation Context:
-        Previous Question: "{context["previous_question"]}"
-        
-        Previous Field: "{context["previous_field"]}"
-        Current Question: "{user_input}"
-                
-        Conversation Context Rules:
-            1. Previous Question: "{context["previous_question"]}" used field: "{context["previous_field"]}"
-            2. Current Question: "{user_input}"
-            3. For follow-up questions using "and", use the same field/table as the previous question
-    
-        Use the following metadata to generate valid SQL queries:
-        {metadata_info}
-
-        For occupancy/utilization analysis:
-        - occupancy is usually the number of people in a floor or building
-        - utilization is usually the percentage of number of people versus (devided by) maximum capacity.
-        - Use floor_utilization.occupancy for actual current usage
-        - Use floor_occupancy.max_capacity for maximum allowed capacity
-        - Group by building when aggregating floors
-        - Join floor_utilization and floor_occupancy on both building_id AND floor        
-        - Always include ALL floors from floor_occupancy, unless the question states differently
-        - Include time period details from floor_utilization.time
-        - Calculate average occupancy over specific time periods
-        - Use LEFT JOIN to include all floors even if they have no utilization data
-        - Order results logically (e.g., by floor number)
-        
-        For ranking queries:
-        - Include relevant details (address, size, etc.)
-        - Always show actual values, not just order
-        - Order results appropriately (ASC/DESC)
-        - Include all records that match criteria
-        
-        For highest/lowest queries:
-        - When using MAX() or MIN() with other non-aggregated columns, include all non-aggregated columns in GROUP BY
-        - Return full record details (building_id, address, etc.) for the max/min value
-        - Use subqueries or window functions when appropriate to get the correct record
-
-        Example structure for highest/lowest queries:
-        SELECT b.building_id, b.address, b.employee_capacity
-        FROM buildings b
-        WHERE b.employee_capacity = (
-            SELECT MAX(employee_capacity)
-            FROM buildings
-        )
-
-        Rules:
-        - Return ONLY the SQL query
-        - NO explanations
-        - NO markdown formatting
-        - NO code blocks
-        - Tables and columns are all lowercase
-        
-        Additional Rules:\n"
-            1. Only use data that exists in the query results
-            2. Never make up or infer numbers that aren't in the results
-            3. Maintain consistency with previous questions in the conversation
-            4. If the same field was used in a previous question (e.g., employee_capacity), use the same field for follow-up questions unless explicitly asked otherwise
-            5. Always refer to prior questions and answers to maintain context.
-            6. If the current question is ambiguous (e.g., "and the lowest"), infer the intent based on the most recent question.
-            7. Always clarify your assumptions if needed.
-        
-        
-        Query request: "{user_input}"
-        Return ONLY the SQL query, no explanations.
-        """
-        print(f"Promt: {prompt}")
-        
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are an SQL generator. Return ONLY SQL queries without any explanation."},                
-                {"role": "system", "content": prompt}],
-            max_tokens=200
-        )
-        
-        sql_query = response.choices[0].message.content.strip()                
-        
-        logging.info(f"Generated SQL Query: {sql_query}")
-        return sql_query
+        return loop_thread.run(pipeline.generate_sql(user_input, prev_context, use_cache, hint, metrics))
     except Exception as e:
         logging.error(f"Error generating SQL query: {e}")
         raise
 
 # Execute SQL Query
-def execute_query(sql_query):
-    conn = None
+def execute_query(sql_query, max_rows=None):
+    """
+    Execute generated SQL with a bounded, batched fetch on the configured backend.
+
+    At most `max_rows` rows (default Config.MAX_RESULT_ROWS) are read. When more
+    exist, `truncated` is set and `digest` holds the row count and min/max/sum of
+    numeric columns over the full result. Config.EXECUTION_BACKEND selects
+    PostgreSQL or the in-process SQLite copy of the data directory.
+    """
+    max_rows = max_rows or Config.MAX_RESULT_ROWS
     try:
-        conn = connect_to_db()
-        if conn is None:
-            return {"error": "Database connection failed", "rows": [], "columns": []}
-            
-        cursor = conn.cursor()
-        logging.info(f"Executing SQL Query: {sql_query}")
-        cursor.execute(sql_query)
-        
-        if cursor.description:
-            columns = [desc[0] for desc in cursor.description]
-            rows = cursor.fetchall()
-            logging.info(f"Query Results - Columns: {columns}")
-            logging.info(f"Query Results - Rows: {rows}")
-            return {"columns": columns, "rows": rows}
-        else:
-            conn.commit()
-            return {"message": "Query executed successfully.", "rows": [], "columns": []}
+        backend = get_backend()
+        logging.info(f"Executing SQL Query ({backend.name}): {sql_query}")
+        result = backend.execute(sql_query, max_rows)
+        if "error" not in result:
+            logging.info(f"Query Results - Columns: {result['columns']}")
+            logging.info(f"Query Results - {len(result['rows'])} rows"
+                         f"{' (truncated at row cap)' if result.get('truncated') else ''}")
+            logging.debug(f"Query Results - Rows: {result['rows']}")
+        return result
+    except QueryRejected:
+        raise
     except Exception as e:
         logging.error(f"Query execution failed: {e}")
         return {"error": str(e), "rows": [], "columns": []}
-    finally:
-        if conn:
-            conn.close()
+
+
+def fetch_result_page(sql_query, page, page_size=None):
+    """
+    Read one page of a query's full result; used when the UI browses past the row cap.
+    """
+    page_size = page_size or Config.RESULT_PAGE_SIZE
+    try:
+        return get_backend().fetch_page(sql_query, page, page_size)
+    except QueryRejected as rejection:
+        record_rejected_plan(sql_query, rejection)
+        return {"error": "Query rejected by cost guard", "details": rejection.reason, "rejected": True,
+                "rows": [], "columns": []}
+    except Exception as e:
+        logging.error(f"Fetching result page failed: {e}")
+        return {"error": str(e), "rows": [], "columns": []}
+
+
+def _fetch_current_data_versions():
+    try:
+        return get_backend().data_versions()
+    except Exception as e:
+        logging.warning(f"Could not fetch data versions: {e}")
+        return {}
+
+
+_data_version_tracker = DataVersionTracker(
+    _fetch_current_data_versions,
+    refresh_seconds=Config.DATA_VERSION_REFRESH_SECONDS
+)
+
+
+def get_result_cache_metrics():
+    """Result cache counters for the analytics sidebar."""
+    return get_result_cache(metadata_info).metrics()
+
+
+def get_db_pool_metrics():
+    """Connection pool (or embedded backend) counters for the analytics sidebar."""
+    return get_backend().metrics()
             
-def analyze_data_with_gpt(user_query, columns, rows, prev_context=None):
+def narrative_messages(user_query, columns, rows, prev_context=None, digest=None):
+    """Chat messages asking GPT to narrate a query result (shared by the sync and async paths)."""
+    # Default context values
+    context = {
+        "previous_question": None,
+        "previous_field": None
+    }
+    
+    # Update context if provided
+    if prev_context:
+        context.update(prev_context)
+    
+    previous_field = prev_context["previous_field"] if prev_context else None
+    
+    # Prepare the prompt for GPT
+    data_summary = digest_rows(columns, rows, Config.NARRATIVE_DIGEST_TOKEN_BUDGET, digest)
+    
+    prompt = (
+        f"You are an AI assistant specializing in real estate analysis.\n"
+        "Format your response following these rules:\n"
+        "1. For currency values:\n"
+        "   - Always include $ symbol\n"
+        "   - Use commas for thousands\n"
+        "   - Show cents for precision (.00)\n"
+        "2. For rankings or comparisons:\n"
+        "   - Use numbered list format\n"
+        "   - Include building ID and address in parentheses\n"
+        "   - Show relevant metrics with proper units (sqft, USD, etc.)\n"
+        "   - Indent details with bullet points\n"
+        "3. For occupancy/utilization:\n"
+        "   - Occupancy should be shown as number of people (e.g., '45 people')\n"
+        "   - Utilization should be shown as percentage (e.g., '45.2%')\n"
+        "   - Always specify the time period being analyzed\n"
+        "       -- 3.1. Time periods must be explicitly stated:"
+        "           --- Specify if showing current occupancy\n"
+        "           --- Specify if showing averages (daily, weekly, monthly, yearly)\n"
+        "           --- Include the exact date range being analyzed\n"
+        "       -- 3.2. Missing data:\n"
+        "           --- List ALL floors from floor_occupancy\n"
+        "           --- Explicitly note any floors without utilization data\n"
+        "           --- Explain any gaps in the data\n"
+        "       -- 3.3. Metrics must be clear:\n"
+        "           --- Occupancy = actual number of people\n"
+        "           --- Utilization = percentage of maximum capacity\n"
+        "           --- Always include both metrics for completeness\n"
+        "4. For trends and patterns:\n"
+        "   - Explicitly answer any questions about patterns or trends\n"
+        "   - Identify notable variations or anomalies\n"
+        "   - Compare against relevant benchmarks\n"
+        "5. Time periods:\n"
+        "   - Always specify the time frame for any analysis\n"
+        "   - Use clear date ranges (e.g., 'During 2023', 'From March to April 2023')\n"            
+        "6. If values are identical, explicitly mention this\n"
+        "7. For large numbers:\n"
+        "   - Be specific with units (USD, sqft, etc.)\n"
+        "   - Use commas for readability (e.g., 1,000,000)\n"
+        "   - Round decimal numbers to 2 places\n"
+        "8. Context Rules:\n"
+        f"   - Previous answer used field: {previous_field}\n"
+        f"   - Previous field used: {previous_field if previous_field else 'None'}\n"
+        "   - For follow-up questions using 'and', maintain EXACT same analysis as previous question\n"
+        "   - NEVER switch metrics between questions unless explicitly requested\n"
+        "   - If user asks 'and the lowest?', use the SAME metric as 'highest'\n"
+        "Additional Rules:\n"
+            "1. Only use data that exists in the query results\n"
+            "2. Never make up or infer numbers that aren't in the results\n"
+            "3. Maintain consistency with previous questions in the conversation\n"
+            "4. If the same field was used in a previous question (e.g., employee_capacity), "
+            "5. use the same field for follow-up questions unless explicitly asked otherwise\n"
+            "6. Always maintain context from previous question\n"
+            "7. If previous question was about time patterns, maintain time analysis\n"
+            "8. For 'and in [building]' questions, use same analysis as previous question\n"
+            "9. Format occupancy consistently:\n"
+            "   - Building details on first line\n"
+            "   - Time-based metrics on subsequent lines with consistent indentation\n"
+            "   - Show occupancy as whole numbers with 'people' unit\n"
+            "   - Sort by time for time-based analysis\n"
+        f"Question: {user_query}\n"
+        f"{data_summary}\n"            
+        f"Provide a well-formatted response following the above rules.\n"
+        "Provide comprehensive answers that address all parts of the question.\n"
+        ". No explanations or interpretations.\n"
+    )
+    return [{"role": "system", "content": "You are Sage, a data analyst. Provide only direct, factual answers without explanation."},
+            {"role": "user", "content": prompt}]
+
+
+def analyze_data_with_gpt(user_query, columns, rows, prev_context=None, stream=False, metrics=None, digest=None):
     """
     Use GPT to analyze SQL query results and generate a natural language response.
 
+    Runs AsyncQuestionPipeline.analyze (or stream_analysis) on the shared loop.
+
     Args:
         user_query (str): The original question from the user.
         columns (list): List of column names from the SQL query result.
         rows (list): List of rows (data) from the SQL query result.
+        stream (bool): Return a generator of tokens instead of the full text.
+        metrics (dict): Optional dict that receives `time_to_first_token` and `total_time` (seconds)
+            and `prompt_tokens` / `completion_tokens`.
+        digest (dict): Optional in-database digest of the full result when `rows` was truncated.
 
     Returns:
-        str: A natural language response generated by GPT.
+        str: A natural language response generated by GPT, or a generator of its tokens when streaming.
     """
+    loop_thread, pipeline = _pipeline()
+    if stream:
+        return loop_thread.iterate(pipeline.stream_analysis(user_query, columns, rows, prev_context, digest, metrics))
     try:
-        
-        # Default context values
-        context = {
-            "previous_question": None,
-            "previous_field": None
-        }
-        
-        # Update context if provided
-        if prev_context:
-            context.update(prev_context)
-        
-        previous_field = prev_context["previous_field"] if prev_context else None
-        
-        # Prepare the prompt for GPT
-        data_summary = f"Query results:\nColumns: {columns}\nRows:\n" + "\n".join(str(row) for row in rows[:10])  # Limit to first 10 rows
-        
-        prompt = (
-            f"You are an AI assistant specializing in real estate analysis.\n"
-            "Format your response following these rules:\n"
-            "1. For currency values:\n"
-            "   - Always include $ symbol\n"
-            "   - Use commas for thousands\n"
-            "   - Show cents for precision (.00)\n"
-            "2. For rankings or comparisons:\n"
-            "   - Use numbered list format\n"
-            "   - Include building ID and address in parentheses\n"
-            "   - Show relevant metrics with proper units (sqft, USD, etc.)\n"
-            "   - Indent details with bullet points\n"
-            "3. For occupancy/utilization:\n"
-            "   - Occupancy should be shown as number of people (e.g., '45 people')\n"
-            "   - Utilization should be shown as percentage (e.g., '45.2%')\n"
-            "   - Always specify the time period being analyzed\n"
-            "       -- 3.1. Time periods must be explicitly stated:"
-            "           --- Specify if showing current occupancy\n"
-            "           --- Specify if showing averages (daily, weekly, monthly, yearly)\n"
-            "           --- Include the exact date range being analyzed\n"
-            "       -- 3.2. Missing data:\n"
-            "           --- List ALL floors from floor_occupancy\n"
-            "           --- Explicitly note any floors without utilization data\n"
-            "           --- Explain any gaps in the data\n"
-            "       -- 3.3. Metrics must be clear:\n"
-            "           --- Occupancy = actual number of people\n"
-            "           --- Utilization = percentage of maximum capacity\n"
-            "           --- Always include both metrics for completeness\n"
-            "4. For trends and patterns:\n"
-            "   - Explicitly answer any questions about patterns or trends\n"
-            "   - Identify notable variations or anomalies\n"
-            "   - Compare against relevant benchmarks\n"
-            "5. Time periods:\n"
-            "   - Always specify the time frame for any analysis\n"
-            "   - Use clear date ranges (e.g., 'During 2023', 'From March to April 2023')\n"            
-            "6. If values are identical, explicitly mention this\n"
-            "7. For large numbers:\n"
-            "   - Be specific with units (USD, sqft, etc.)\n"
-            "   - Use commas for readability (e.g., 1,000,000)\n"
-            "   - Round decimal numbers to 2 places\n"
-            "8. Context Rules:\n"
-            f"   - Previous answer used field: {previous_field}\n"
-            f"   - Previous field used: {previous_field if previous_field else 'None'}\n"
-            "   - For follow-up questions using 'and', maintain EXACT same analysis as previous question\n"
-            "   - NEVER switch metrics between questions unless explicitly requested\n"
-            "   - If user asks 'and the lowest?', use the SAME metric as 'highest'\n"
-            "Additional Rules:\n"
-                "1. Only use data that exists in the query results\n"
-                "2. Never make up or infer numbers that aren't in the results\n"
-                "3. Maintain consistency with previous questions in the conversation\n"
-                "4. If the same field was used in a previous question (e.g., employee_capacity), "
-                "5. use the same field for follow-up questions unless explicitly asked otherwise\n"
-                "6. Always maintain context from previous question\n"
-                "7. If previous question was about time patterns, maintain time analysis\n"
-                "8. For 'and in [building]' questions, use same analysis as previous question\n"
-                "9. Format occupancy consistently:\n"
-                "   - Building details on first line\n"
-                "   - Time-based metrics on subsequent lines with consistent indentation\n"
-                "   - Show occupancy as whole numbers with 'people' unit\n"
-                "   - Sort by time for time-based analysis\n"
-            f"Question: {user_query}\n"
-            f"{data_summary}\n"            
-            f"Provide a well-formatted response following the above rules.\n"
-            "Provide comprehensive answers that address all parts of the question.\n"
-            ". No explanations or interpretations.\n"
-        )
-
-        # Use OpenAI's API to generate the response
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[{"role": "system", "content": "You are Sage, a data analyst. Provide only direct, factual answers without explanation."}, 
-                      {"role": "user", "content": prompt}],
-        )
-
-        return response.choices[0].message.content
+        return loop_thread.run(pipeline.analyze(user_query, columns, rows, prev_context, digest, metrics))
     except Exception as e:
         logging.error(f"Error analyzing data with GPT: {e}")
         raise
 
-def fetch_db_schema(connection):
+def fetch_db_schema(connection=None):
+    """
+    Fetch (table, column) pairs for the public schema.
+
+    Borrows a connection from the pool unless one is passed in.
+    """
+    if connection is None:
+        try:
+            with get_pool().connection() as conn:
+                return fetch_db_schema(conn)
+        except Exception as e:
+            logging.error(f"Error fetching database schema: {e}")
+            return []
+
     try:
         cursor = connection.cursor()
         query = """
@@ -426,45 +491,74 @@ def validate_query(sql_query):
     # Return errors if found, otherwise return True
     return errors if errors else False
 
-def execute_validated_query(query, connection=None):
+def prepare_query(query):
     """
-    Validate the query and execute it if valid.
-
-    Args:
-        query (str): The SQL query to validate and execute.
-        connection: The database connection object.
+    Validate generated SQL and route it to the occupancy rollups where possible.
 
     Returns:
-        dict: Query results or validation error details.
+        tuple: (query to execute, validation errors or False)
     """
     errors = validate_query(query)
     if errors:
         logging.error(f"Query validation failed: {errors}")
-        return {"error": "Query validation failed", "details": errors}
+        return query, errors
+    if Config.ENABLE_ROLLUP_REWRITE:
+        query = rewrite_to_rollup(query)
+    return query, False
 
-    # If valid, execute the query
+
+def record_rejected_plan(query, rejection, question=None):
+    """Keep a cost-guard rejection for threshold tuning; never fails the request."""
+    if rejected_plans is None:
+        return
     try:
-        return execute_query(query)
+        rejected_plans.record(query, rejection, Config.MAX_QUERY_COST, Config.MAX_QUERY_ROWS, question=question)
     except Exception as e:
-        logging.error(f"Query execution failed: {e}")
-        return {"error": "Query execution failed", "details": str(e)}
+        logging.error(f"Error recording rejected plan: {e}")
 
 
-def calculate_success_rate(log_file="query_analytics.log"):
-    try:
-        with open(log_file, "r") as f:
-            logs = f.readlines()
-        total_queries = len(logs)
-        successful_queries = sum(1 for log in logs if "Success" in log)
-        return (successful_queries / total_queries) * 100 if total_queries else 0
-    except FileNotFoundError:
-        return 0
+def rejection_hint(query, reason):
+    """Regeneration hint telling the model why its last query was refused."""
+    return (f"The previous query was rejected before running: {reason}.\n"
+            f"Rejected query: {query}\n"
+            "Write a cheaper query: filter by building and time period, aggregate in the database "
+            "(prefer the occupancy rollups), and never join a table to itself without a join condition.")
+
+
+def execute_validated_query(query, connection=None, question=None, prev_context=None, metrics=None):
+    """
+    Validate the query and execute it if valid (AsyncQuestionPipeline.execute_validated on the shared loop).
+
+    When the EXPLAIN cost guard rejects the plan and `question` is given, the SQL is
+    regenerated with the rejection as a hint (Config.QUERY_GUARD_REGENERATE_ATTEMPTS times).
+    SQL that fails for `question` is evicted from the question/SQL cache.
+
+    Args:
+        query (str): The SQL query to validate and execute.
+        connection: Unused; queries run on the configured execution backend.
+        question (str): The user's question, enables regeneration of rejected SQL.
+        prev_context (dict): Follow-up context passed to regeneration.
+        metrics (dict): Receives `result_cache_hit`, and token usage of any regeneration.
 
+    Returns:
+        dict: Query results or validation error details. Contains `sql_query` when the
+        SQL that ran differs from `query` because it was regenerated.
+    """
+    loop_thread, pipeline = _pipeline()
+    return loop_thread.run(pipeline.execute_validated(query, question, prev_context, metrics))
+
+
+def record_question_metrics(record):
+    """Store one question's pipeline metrics; never fails the request."""
+    try:
+        get_metrics_store().record(record)
+    except Exception as e:
+        logging.error(f"Error recording question metrics: {e}")
 
-def log_query_analytics(query, outcome, log_file="query_analytics.log"):
-    with open(log_file, "a") as f:
-        f.write(f"{datetime.now()} | Query: {query} | Outcome: {outcome}\n")
 
+def get_question_metrics_summary():
+    """Success rate, outcome counts and per-stage latency percentiles for the analytics sidebar."""
+    return get_metrics_store().summary()
 
 
 # Main Function
@@ -477,13 +571,27 @@ def main():
             print("Goodbye!")
             logging.info("GPT-SQL Assistant exited.")
             break
+        trace = QuestionTrace(user_input)
+        result = None
+        sql_metrics = {}
         try:
-            sql_query = generate_sql_query(user_input)
-            result = execute_validated_query(sql_query)
+            with trace.stage("sql_generation"):
+                sql_query = generate_sql_query(user_input, metrics=sql_metrics)
+            with trace.stage("db_execution"):
+                result = execute_validated_query(sql_query, question=user_input, metrics=sql_metrics)
+            sql_query = result.get("sql_query", sql_query)
+            if "error" not in result:
+                remember_validated_sql(user_input, sql_query)
             print("Query Results:")
-            print(json.dumps(result, indent=2))
+            print(json.dumps(result, indent=2, default=str))
         except Exception as e:
             print(f"An error occurred: {e}")
+        finally:
+            trace.add_tokens(sql_metrics)
+            record_question_metrics(trace.finish(
+                outcome_of(result), row_count=len(result.get("rows", [])) if result else None,
+                sql_cache_hit=bool(sql_metrics.get("sql_cache_hit")),
+                result_cache_hit=bool(sql_metrics.get("result_cache_hit"))))
 
 if __name__ == "__main__":
     main()
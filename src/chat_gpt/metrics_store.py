@@ -0,0 +1,279 @@
+import logging
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from src.utils.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Pipeline stages timed per question; each gets a <stage>_ms column
+STAGES = ("sql_generation", "db_execution", "narrative")
+PERCENTILES = (50, 95, 99)
+# Outcomes counted as answered questions by success_rate()
+SUCCESS_OUTCOMES = ("success", "no_data")
+
+_COLUMNS = ["created_at", "question", "outcome", "sql_cache_hit", "result_cache_hit", "row_count",
+            "prompt_tokens", "completion_tokens", "total_ms"] + [f"{stage}_ms" for stage in STAGES]
+
+
+class QuestionTrace:
+    def __init__(self, question: str):
+        """
+        Timings and counts collected while one question moves through the pipeline
+
+        :param question: The user's question
+        """
+        self.question = question
+        self._started = time.perf_counter()
+        self.values: Dict[str, Any] = {"prompt_tokens": 0, "completion_tokens": 0}
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a pipeline stage; the duration is kept even if the stage raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.set_stage_ms(name, (time.perf_counter() - started) * 1000)
+
+    def set_stage_ms(self, name: str, milliseconds: float):
+        self.values[f"{name}_ms"] = milliseconds
+
+    def add_tokens(self, usage: Optional[Dict[str, int]]):
+        """Accumulate prompt/completion token counts from a stage's usage dict."""
+        if not usage:
+            return
+        self.values["prompt_tokens"] += usage.get("prompt_tokens") or 0
+        self.values["completion_tokens"] += usage.get("completion_tokens") or 0
+
+    def finish(self, outcome: str, row_count: Optional[int] = None, **flags) -> Dict[str, Any]:
+        """
+        Close the trace
+
+        :param outcome: "success", "no_data", "validation_error", "rejected", "error", ...
+        :param row_count: Rows returned by the query
+        :param flags: sql_cache_hit / result_cache_hit
+        :return: Row for MetricsStore.record
+        """
+        record = dict(self.values)
+        record.update(flags)
+        record.update({
+            "created_at": datetime.now().isoformat(),
+            "question": self.question,
+            "outcome": outcome,
+            "row_count": row_count,
+            "total_ms": (time.perf_counter() - self._started) * 1000,
+        })
+        return record
+
+
+def outcome_of(result: Optional[Dict[str, Any]]) -> str:
+    """Classify an execute_validated_query result for the outcome counters."""
+    if result is None:
+        return "error"
+    if result.get("rejected"):
+        return "rejected"
+    if result.get("error") == "Query validation failed":
+        return "validation_error"
+    if result.get("error") == "Query timed out":
+        return "timeout"
+    if "error" in result:
+        return "error"
+    if result.get("columns") and not result.get("rows"):
+        return "no_data"
+    return "success"
+
+
+class MetricsStore:
+    def __init__(self, db_path: str = "question_metrics.db", buffer_size: int = 1000,
+                 flush_interval_seconds: float = 5.0, max_rows: int = 10_000):
+        """
+        Per-question pipeline metrics: an in-memory ring buffer flushed to SQLite
+
+        Outcome counters are kept in memory (seeded from SQLite on start), so the
+        success rate is O(1). Only the newest max_rows question records are kept, so
+        latency percentiles describe recent questions and their index walks stay bounded.
+
+        :param db_path: SQLite database file
+        :param buffer_size: Records kept in memory before the oldest unflushed ones are dropped
+        :param flush_interval_seconds: A record() older than this since the last flush triggers a flush
+        :param max_rows: Question records kept in SQLite; older ones are pruned on flush
+        """
+        self.db_path = db_path
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_rows = max_rows
+        self._buffer = deque(maxlen=buffer_size)
+        self._pending_counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self.dropped = 0
+        self._init_db()
+        self._counters = self._load_counters()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    def _init_db(self):
+        conn = self._connect()
+        c = conn.cursor()
+        stage_columns = "".join(f", {stage}_ms REAL" for stage in STAGES)
+        c.execute(f'''CREATE TABLE IF NOT EXISTS question_metrics
+                      (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                       created_at TEXT,
+                       question TEXT,
+                       outcome TEXT,
+                       sql_cache_hit INTEGER,
+                       result_cache_hit INTEGER,
+                       row_count INTEGER,
+                       prompt_tokens INTEGER,
+                       completion_tokens INTEGER,
+                       total_ms REAL{stage_columns})''')
+        for column in ["total"] + list(STAGES):
+            c.execute(f"CREATE INDEX IF NOT EXISTS idx_question_metrics_{column}_ms "
+                      f"ON question_metrics ({column}_ms)")
+        c.execute('''CREATE TABLE IF NOT EXISTS question_metrics_counters
+                     (outcome TEXT PRIMARY KEY,
+                      count INTEGER NOT NULL)''')
+        conn.commit()
+        conn.close()
+
+    def _load_counters(self) -> Dict[str, int]:
+        conn = self._connect()
+        try:
+            return dict(conn.execute("SELECT outcome, count FROM question_metrics_counters").fetchall())
+        finally:
+            conn.close()
+
+    def record(self, record: Dict[str, Any]):
+        """Buffer one question's metrics (see QuestionTrace.finish); flushes when the interval has passed."""
+        with self._lock:
+            if len(self._buffer) == self._buffer.maxlen:
+                self.dropped += 1
+            self._buffer.append(record)
+            outcome = record.get("outcome", "unknown")
+            self._counters[outcome] = self._counters.get(outcome, 0) + 1
+            self._pending_counts[outcome] = self._pending_counts.get(outcome, 0) + 1
+            due = time.monotonic() - self._last_flush >= self.flush_interval_seconds
+        if due:
+            self.flush()
+
+    def flush(self):
+        """
+        Write buffered records and the outcome counters to SQLite, pruning records past max_rows
+
+        When the write fails, the records and counter deltas go back into the buffer for the next flush.
+        """
+        with self._lock:
+            records = list(self._buffer)
+            self._buffer.clear()
+            counts, self._pending_counts = self._pending_counts, {}
+            self._last_flush = time.monotonic()
+        if not records and not counts:
+            return
+        try:
+            conn = self._connect()
+            try:
+                conn.executemany(
+                    f"INSERT INTO question_metrics ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+                    [tuple(record.get(column) for column in _COLUMNS) for record in records])
+                # Add deltas so several app processes can share one database
+                conn.executemany("INSERT INTO question_metrics_counters (outcome, count) VALUES (?, ?) "
+                                 "ON CONFLICT (outcome) DO UPDATE SET count = count + excluded.count",
+                                 counts.items())
+                conn.execute("DELETE FROM question_metrics WHERE id <= (SELECT MAX(id) FROM question_metrics) - ?",
+                             (self.max_rows,))
+                conn.commit()
+            finally:
+                conn.close()
+        except Exception as e:
+            logger.error(f"Error flushing question metrics, keeping {len(records)} records for the next flush: {e}")
+            self._requeue(records, counts)
+
+    def _requeue(self, records: List[Dict[str, Any]], counts: Dict[str, int]):
+        """Put unwritten records back ahead of newer ones; the buffer limit still applies."""
+        with self._lock:
+            merged = records + list(self._buffer)
+            self.dropped += max(0, len(merged) - self._buffer.maxlen)
+            self._buffer = deque(merged, maxlen=self._buffer.maxlen)
+            for outcome, count in counts.items():
+                self._pending_counts[outcome] = self._pending_counts.get(outcome, 0) + count
+
+    def success_rate(self) -> float:
+        """Percentage of questions whose query ran successfully, O(1)."""
+        with self._lock:
+            total = sum(self._counters.values())
+            succeeded = sum(self._counters.get(outcome, 0) for outcome in SUCCESS_OUTCOMES)
+            return (succeeded / total * 100) if total else 0.0
+
+    def latency_percentiles(self, stage: str = "total") -> Dict[int, Optional[float]]:
+        """
+        p50/p95/p99 latency in ms for a stage ("total" or one of STAGES)
+
+        Each percentile is one ORDER BY ... LIMIT 1 OFFSET k query on the stage's index, over at most
+        max_rows recent questions.
+        """
+        if stage != "total" and stage not in STAGES:
+            raise ValueError(f"Unknown stage: {stage}")
+        self.flush()
+        column = f"{stage}_ms"
+        conn = self._connect()
+        try:
+            count = conn.execute(f"SELECT COUNT({column}) FROM question_metrics "
+                                 f"WHERE {column} IS NOT NULL").fetchone()[0]
+            percentiles = {}
+            for p in PERCENTILES:
+                if not count:
+                    percentiles[p] = None
+                    continue
+                offset = min(count - 1, int(p / 100 * count))
+                percentiles[p] = conn.execute(
+                    f"SELECT {column} FROM question_metrics WHERE {column} IS NOT NULL "
+                    f"ORDER BY {column} LIMIT 1 OFFSET ?", (offset,)).fetchone()[0]
+            return percentiles
+        finally:
+            conn.close()
+
+    def summary(self) -> Dict[str, Any]:
+        """Everything the analytics sidebar shows"""
+        with self._lock:
+            counters = dict(self._counters)
+        return {
+            "questions": sum(counters.values()),
+            "outcomes": counters,
+            "success_rate": self.success_rate(),
+            "latency_ms": {stage: self.latency_percentiles(stage) for stage in ("total",) + STAGES},
+        }
+
+    def recent(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Most recent question records, newest first"""
+        self.flush()
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        try:
+            rows = conn.execute("SELECT * FROM question_metrics ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        finally:
+            conn.close()
+        return [dict(row) for row in rows]
+
+
+_store: Optional[MetricsStore] = None
+_store_lock = threading.Lock()
+
+
+def get_metrics_store() -> MetricsStore:
+    """Return the process-wide metrics store, creating it from Config on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = MetricsStore(
+                db_path=Config.METRICS_DB_PATH,
+                buffer_size=Config.METRICS_BUFFER_SIZE,
+                flush_interval_seconds=Config.METRICS_FLUSH_SECONDS,
+                max_rows=Config.METRICS_MAX_ROWS,
+            )
+        return _store
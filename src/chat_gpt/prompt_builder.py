@@ -0,0 +1,317 @@
+import hashlib
+import json
+import logging
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import tiktoken
+except ImportError:  # Optional: fall back to a character-based estimate
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Question words that point at a table or column without naming it
+SYNONYMS = {
+    "cost": ["financials"], "costs": ["financials"], "expense": ["financials", "total_operating_expense"],
+    "spend": ["financials"], "spending": ["financials"], "opex": ["total_operating_expense"],
+    "rent": ["lease_cost"], "lease": ["lease_cost", "ownership"], "leased": ["ownership"], "owned": ["ownership"],
+    "money": ["financials"], "budget": ["financials"], "profit": ["financials"], "price": ["market_rate"],
+    "electricity": ["energy_costs"], "power": ["energy_costs"], "water": ["utilities_costs"],
+    "repair": ["maintenance_costs"], "food": ["catering_costs"], "janitorial": ["cleaning_costs"],
+    "trash": ["waste_disposal_costs"], "garbage": ["waste_disposal_costs"], "waste": ["waste_disposal_costs"],
+    "people": ["floor_utilization"], "occupant": ["floor_utilization"], "headcount": ["floor_utilization"],
+    "busy": ["floor_utilization"], "busiest": ["floor_utilization"], "crowded": ["floor_utilization"],
+    "empty": ["floor_utilization"], "usage": ["floor_utilization"], "occupied": ["floor_utilization"],
+    "utilization": ["floor_utilization", "floor_occupancy"], "utilized": ["floor_utilization", "floor_occupancy"],
+    "capacity": ["floor_occupancy", "employee_capacity"], "seat": ["floor_occupancy", "employee_capacity"],
+    "employee": ["employee_capacity"], "staff": ["employee_capacity"], "headquarter": ["buildings"],
+    "location": ["city", "country", "region", "address"], "where": ["city", "address"],
+    "old": ["year_built"], "oldest": ["year_built"], "newest": ["year_built"], "age": ["year_built"],
+    "built": ["year_built"], "big": ["size"], "biggest": ["size"], "largest": ["size"], "smallest": ["size"],
+    "area": ["size"], "sqft": ["size"], "footage": ["size"], "green": ["leed_certified"], "leed": ["leed_certified"],
+    "sustainable": ["leed_certified", "energy_target"], "type": ["purpose"], "usecase": ["purpose"],
+    "storey": ["floors", "floor"], "story": ["floors", "floor"], "level": ["floor"],
+    "hourly": ["floor_utilization_hourly"], "hour": ["floor_utilization_hourly"],
+    "daily": ["floor_utilization_daily"], "day": ["floor_utilization_daily"],
+    "weekday": ["floor_utilization_daily"], "week": ["floor_utilization_daily"], "weekly": ["floor_utilization_daily"],
+    "monthly": ["floor_utilization_monthly"], "month": ["floor_utilization_monthly"],
+    "trend": ["floor_utilization_monthly", "date"], "year": ["date", "floor_utilization_monthly"],
+    "quarter": ["date"], "annual": ["date"], "yearly": ["date"],
+}
+
+# Words too common in descriptions to say anything about relevance
+STOPWORDS = {
+    "a", "an", "the", "of", "in", "on", "for", "to", "and", "or", "by", "at", "is", "are", "was", "be", "with",
+    "what", "which", "who", "how", "many", "much", "me", "show", "list", "give", "all", "each", "every", "per",
+    "it", "its", "their", "this", "that", "these", "those", "than", "from", "as", "do", "does", "we", "our",
+    "usd", "specified", "period", "number", "unique", "identifier", "reference", "given", "total", "record",
+}
+
+_TYPE_DDL = {
+    "string": "text", "integer": "integer", "float": "numeric", "date": "date",
+    "datetime": "timestamp", "boolean": "boolean",
+}
+
+_RANKING_WORDS = {"highest", "lowest", "top", "bottom", "most", "least", "max", "min", "maximum", "minimum",
+                  "rank", "ranking", "best", "worst", "largest", "smallest", "biggest", "oldest", "newest",
+                  "busiest", "first", "last"}
+
+_OCCUPANCY_TABLES = {"floor_utilization", "floor_occupancy"}
+
+BASE_RULES = """You are Synoptik Real Estate Assistant AI. Write one PostgreSQL query answering the question.
+Rules: return ONLY the SQL (no explanations, markdown or code blocks); tables and columns are lowercase; use only the tables and columns below."""
+
+CONTEXT_RULES = """Follow-up rules:
+- Previous question: "{previous_question}" used field "{previous_field}".
+- For follow-ups (e.g. "and the lowest"), keep the previous question's table and field unless told otherwise."""
+
+OCCUPANCY_RULES = """Occupancy/utilization:
+- occupancy = people on a floor (floor_utilization.occupancy); utilization = occupancy / floor_occupancy.max_capacity.
+- Join floor_utilization and floor_occupancy on building_id AND floor; LEFT JOIN from floor_occupancy to keep all floors.
+- Group by building when aggregating floors; include the time period; order logically (e.g. by floor)."""
+
+ROLLUP_RULES = """- Prefer {rollups} for aggregates at that grain or coarser; average = SUM(occupancy_sum) / SUM(reading_count)."""
+
+RANKING_RULES = """Ranking/highest/lowest:
+- Show actual values and identifying details (building_id, address); include ties.
+- With MAX()/MIN() and other columns, GROUP BY every non-aggregated column or use a subquery, e.g.
+  SELECT b.building_id, b.address, b.employee_capacity FROM buildings b
+  WHERE b.employee_capacity = (SELECT MAX(employee_capacity) FROM buildings)"""
+
+
+def prompt_version() -> str:
+    """Hash of the rule texts and synonyms; a change alters the SQL generated for the same question"""
+    parts = [BASE_RULES, CONTEXT_RULES, OCCUPANCY_RULES, ROLLUP_RULES, RANKING_RULES,
+             json.dumps(SYNONYMS, sort_keys=True)]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def count_tokens(text: str, model: str = "gpt-4") -> int:
+    """Prompt token count; tiktoken when installed, otherwise ~4 characters per token."""
+    if tiktoken is not None:
+        try:
+            return len(tiktoken.encoding_for_model(model).encode(text))
+        except KeyError:
+            return len(tiktoken.get_encoding("cl100k_base").encode(text))
+    return (len(text) + 3) // 4
+
+
+def _stem(word: str) -> str:
+    for suffix, replacement in (("ies", "y"), ("ly", ""), ("s", "")):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[: -len(suffix)] + replacement
+    return word
+
+
+def _words(text: str) -> List[str]:
+    return [word for word in re.findall(r"[a-z]+", (text or "").lower()) if word not in STOPWORDS]
+
+
+def render_table_ddl(table_metadata: Dict[str, Any], columns: Optional[List[str]] = None,
+                     comment_columns: Optional[set] = None) -> str:
+    """
+    Render one table as compact DDL
+
+    :param table_metadata: Entry of metadata_info
+    :param columns: Columns to include (default all, in metadata order)
+    :param comment_columns: Columns whose description is appended as a comment
+    :return: e.g. "floor_occupancy(building_id text REFERENCES buildings, floor integer, max_capacity integer)"
+    """
+    comment_columns = comment_columns or set()
+    parts = []
+    for name, column in table_metadata["columns"].items():
+        if columns is not None and name not in columns:
+            continue
+        part = f"{name} {_TYPE_DDL.get(column.get('type'), column.get('type', 'text'))}"
+        if column.get("primary_key"):
+            part += " PRIMARY KEY"
+        elif column.get("foreign_key"):
+            part += f" REFERENCES {column['foreign_key'].split('.')[0]}"
+        if name in comment_columns and column.get("description"):
+            part += f" /* {column['description'].rstrip('.')} */"
+        parts.append(part)
+    return f"{table_metadata['table_name']}({', '.join(parts)})"
+
+
+class PromptBuilder:
+    def __init__(self, metadata: Dict[str, Dict[str, Any]], token_budget: int = 1200,
+                 synonyms: Optional[Dict[str, List[str]]] = None, model: str = "gpt-4"):
+        """
+        Builds the SQL-generation prompt from the schema parts relevant to a question
+
+        Tables and columns are scored against the question with a keyword index built
+        from table/column names, their descriptions and a synonym list. The selected
+        schema is rendered as compact DDL and trimmed until the prompt fits the budget.
+
+        :param metadata: metadata_info-style dict of table name -> table metadata
+        :param token_budget: Maximum prompt tokens
+        :param synonyms: Question word -> table or column names it refers to
+        :param model: Model name used for token counting
+        """
+        self.metadata = metadata
+        self.token_budget = token_budget
+        self.model = model
+        self.index = self._build_index(synonyms if synonyms is not None else SYNONYMS)
+
+    def _build_index(self, synonyms: Dict[str, List[str]]) -> Dict[str, List[Tuple[str, Optional[str], int]]]:
+        """Stemmed keyword -> [(table, column or None, weight)]"""
+        index: Dict[str, List[Tuple[str, Optional[str], int]]] = {}
+
+        def add(word, table, column, weight):
+            index.setdefault(_stem(word), []).append((table, column, weight))
+
+        columns_by_name: Dict[str, List[str]] = {}
+        for table, table_metadata in self.metadata.items():
+            for word in _words(table.replace("_", " ")):
+                add(word, table, None, 3)
+            for column, column_metadata in table_metadata["columns"].items():
+                columns_by_name.setdefault(column, []).append(table)
+                # Join keys like building_id appear everywhere and say little about the table
+                is_key = column_metadata.get("primary_key") or column_metadata.get("foreign_key")
+                for word in _words(column.replace("_", " ")):
+                    add(word, table, None if is_key else column, 1 if is_key else 2)
+                for word in set(_words(column_metadata.get("description", ""))):
+                    add(word, table, None, 1)
+
+        for word, targets in synonyms.items():
+            for target in targets:
+                if target in self.metadata:
+                    add(word, target, None, 3)
+                for table in columns_by_name.get(target, []):
+                    add(word, table, target, 3)
+        return index
+
+    def select_schema(self, question: str, prev_context=None) -> List[Tuple[str, int, set]]:
+        """
+        Score tables and columns against the question (and the previous question for follow-ups)
+
+        :return: [(table, score, matched columns)] for relevant tables, best first;
+                 every table when nothing matches
+        """
+        text = question or ""
+        if isinstance(prev_context, dict):
+            text += " " + " ".join(str(prev_context.get(key) or "") for key in ("previous_question", "previous_field"))
+
+        scores: Dict[str, int] = {}
+        matched: Dict[str, set] = {}
+        for word in set(_stem(word) for word in _words(text.replace("_", " "))):
+            best: Dict[str, int] = {}
+            for table, column, weight in self.index.get(word, []):
+                best[table] = max(best.get(table, 0), weight)
+                if column:
+                    matched.setdefault(table, set()).add(column)
+            for table, weight in best.items():
+                scores[table] = scores.get(table, 0) + weight
+        # An exact column name (e.g. previous_field) is always relevant
+        for table, table_metadata in self.metadata.items():
+            for column in table_metadata["columns"]:
+                if re.search(rf"\b{column}\b", text.lower()):
+                    scores[table] = scores.get(table, 0) + 3
+                    matched.setdefault(table, set()).add(column)
+
+        if scores:
+            top = max(scores.values())
+            selected = {table for table, score in scores.items() if score * 2 >= top}
+        else:
+            selected = set(self.metadata)
+        selected = self._pick_among_alternatives(selected, scores)
+        # Occupancy questions keep the raw table next to any rollup, for filters the rollup cannot express
+        if "floor_utilization" in self.metadata and any(table.startswith("floor_utilization") for table in selected):
+            selected.add("floor_utilization")
+        ranked = sorted(selected, key=lambda table: (-scores.get(table, 0), table))
+        return [(table, scores.get(table, 0), matched.get(table, set())) for table in ranked]
+
+    def _pick_among_alternatives(self, selected: set, scores: Dict[str, int]) -> set:
+        """
+        Tables with identical columns (the occupancy rollups) are the same data at different
+        grains: keep the one the question points at, or none when no grain stands out.
+        """
+        groups: Dict[frozenset, List[str]] = {}
+        for table in selected:
+            groups.setdefault(frozenset(self.metadata[table]["columns"]), []).append(table)
+        for tables in groups.values():
+            if len(tables) < 2:
+                continue
+            ranked = sorted(tables, key=lambda table: -scores.get(table, 0))
+            keep = ranked[0] if scores.get(ranked[0], 0) > scores.get(ranked[1], 0) else None
+            selected -= {table for table in tables if table != keep}
+        return selected
+
+    def _key_columns(self, table: str) -> set:
+        columns = self.metadata[table]["columns"]
+        return {name for name, column in columns.items()
+                if column.get("primary_key") or column.get("foreign_key") or name in ("floor", "time", "date", "period_start")}
+
+    def render_schema(self, selection: List[Tuple[str, int, set]], level: int = 0) -> str:
+        """
+        Compact DDL for the selected tables
+
+        level 0: all columns, descriptions on matched columns
+        level 1: all columns, no descriptions
+        level 2: key and matched columns only
+        """
+        lines = []
+        for table, _, matched_columns in selection:
+            table_metadata = self.metadata[table]
+            if level >= 2 and matched_columns:
+                columns = list(self._key_columns(table) | matched_columns)
+            else:
+                columns = None
+            comments = matched_columns if level == 0 else set()
+            lines.append(render_table_ddl(table_metadata, columns, comments))
+        return "\n".join(lines)
+
+    def _sections(self, question: str, prev_context, tables: List[str], schema: str,
+                  hint: Optional[str] = None) -> List[str]:
+        sections = [BASE_RULES, "Schema:\n" + schema]
+        if isinstance(prev_context, dict) and prev_context.get("previous_question"):
+            sections.append(CONTEXT_RULES.format(previous_question=prev_context.get("previous_question"),
+                                                 previous_field=prev_context.get("previous_field")))
+        if any(table in _OCCUPANCY_TABLES or table.startswith("floor_utilization") for table in tables):
+            rollups = [table for table in tables if table.startswith("floor_utilization_")]
+            sections.append(OCCUPANCY_RULES + ("\n" + ROLLUP_RULES.format(rollups=", ".join(rollups)) if rollups else ""))
+        if set(re.findall(r"[a-z]+", (question or "").lower())) & _RANKING_WORDS:
+            sections.append(RANKING_RULES)
+        if hint:
+            sections.append(hint)
+        sections.append(f'Question: "{question}"\nSQL:')
+        return sections
+
+    def build(self, question: str, prev_context=None, hint: Optional[str] = None) -> Tuple[str, Dict[str, Any]]:
+        """
+        Build the prompt for one question
+
+        Trims in order until the budget is met: column descriptions, non-key
+        unmatched columns, then the lowest-scoring tables.
+
+        :param question: The user's question
+        :param prev_context: Follow-up context dict (previous_question, previous_field)
+        :param hint: Extra instruction, e.g. why the previous attempt was rejected
+        :return: (prompt, stats) where stats has tables, prompt_tokens, schema_tokens and level
+        """
+        selection = self.select_schema(question, prev_context)
+        level = 0
+        while True:
+            tables = [table for table, _, _ in selection]
+            schema = self.render_schema(selection, level)
+            prompt = "\n\n".join(self._sections(question, prev_context, tables, schema, hint))
+            tokens = count_tokens(prompt, self.model)
+            if tokens <= self.token_budget:
+                break
+            if level < 2:
+                level += 1
+            elif len(selection) > 1:
+                selection = selection[:-1]
+            else:
+                logger.warning(f"SQL prompt is {tokens} tokens, over the {self.token_budget} token budget")
+                break
+
+        stats = {
+            "tables": tables,
+            "prompt_tokens": tokens,
+            "schema_tokens": count_tokens(schema, self.model),
+            "level": level,
+        }
+        logger.info(f"SQL prompt: {tokens} tokens, tables={tables}, level={level}")
+        return prompt, stats
@@ -0,0 +1,131 @@
+import json
+import logging
+import sqlite3
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class QueryRejected(Exception):
+    def __init__(self, reason: str, total_cost: float, plan_rows: float, plan: Optional[Dict[str, Any]] = None):
+        """
+        The planner's estimate for a generated query is over the configured limits
+
+        :param reason: Human-readable reason, also used as a regeneration hint
+        :param total_cost: Estimated total cost of the plan root
+        :param plan_rows: Largest estimated row count of any plan node that runs to completion
+        :param plan: The EXPLAIN (FORMAT JSON) plan
+        """
+        super().__init__(reason)
+        self.reason = reason
+        self.total_cost = total_cost
+        self.plan_rows = plan_rows
+        self.plan = plan
+
+
+def _root_plan(explain_output) -> Dict[str, Any]:
+    """psycopg2 decodes the json column; asyncpg returns text."""
+    if isinstance(explain_output, str):
+        explain_output = json.loads(explain_output)
+    return explain_output[0]["Plan"]
+
+
+def explain_plan(connection, sql_query: str) -> Dict[str, Any]:
+    """
+    Planner estimate for a query without running it
+
+    :param connection: Open DB-API connection
+    :param sql_query: SQL as it will be executed
+    :return: Root node of EXPLAIN (FORMAT JSON)
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql_query}")
+        return _root_plan(cursor.fetchone()[0])
+
+
+async def explain_plan_async(connection, sql_query: str) -> Dict[str, Any]:
+    """explain_plan for an asyncpg connection"""
+    return _root_plan(await connection.fetchval(f"EXPLAIN (FORMAT JSON) {sql_query}"))
+
+
+def peak_plan_rows(node: Dict[str, Any], limited: bool = False) -> float:
+    """
+    Largest estimated row count of any node that would run to completion
+
+    Nodes under a Limit stop early, so their (possibly huge) estimates do not count.
+    """
+    rows = 0.0 if limited else float(node.get("Plan Rows", 0))
+    limited = limited or node.get("Node Type") == "Limit"
+    for child in node.get("Plans", []):
+        rows = max(rows, peak_plan_rows(child, limited))
+    return rows
+
+
+def check_plan(plan: Dict[str, Any], max_cost: float, max_rows: float):
+    """
+    Raise QueryRejected when a plan is over the cost or row limits
+
+    :param plan: Root node of EXPLAIN (FORMAT JSON)
+    :param max_cost: Largest allowed estimated total cost
+    :param max_rows: Largest allowed estimated row count of any completed node
+    """
+    total_cost = float(plan.get("Total Cost", 0))
+    plan_rows = peak_plan_rows(plan)
+    if total_cost > max_cost:
+        raise QueryRejected(
+            f"Estimated cost {total_cost:,.0f} exceeds the limit of {max_cost:,.0f}",
+            total_cost, plan_rows, plan)
+    if plan_rows > max_rows:
+        raise QueryRejected(
+            f"Plan produces an estimated {plan_rows:,.0f} intermediate rows, over the limit of {max_rows:,.0f}",
+            total_cost, plan_rows, plan)
+
+
+class RejectedPlanLog:
+    def __init__(self, db_path: str = "rejected_plans.db"):
+        """
+        SQLite record of generated queries the cost guard refused, for tuning the thresholds
+
+        :param db_path: SQLite database file
+        """
+        self.db_path = db_path
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        conn.execute('''CREATE TABLE IF NOT EXISTS rejected_plans
+                        (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                         created_at TEXT,
+                         question TEXT,
+                         sql_query TEXT,
+                         total_cost REAL,
+                         plan_rows REAL,
+                         max_cost REAL,
+                         max_rows REAL,
+                         reason TEXT,
+                         plan TEXT)''')
+        conn.commit()
+        conn.close()
+
+    def record(self, sql_query: str, rejection: QueryRejected, max_cost: float, max_rows: float,
+               question: Optional[str] = None):
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        try:
+            conn.execute('''INSERT INTO rejected_plans
+                            (created_at, question, sql_query, total_cost, plan_rows, max_cost, max_rows, reason, plan)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                         (datetime.now().isoformat(), question, sql_query, rejection.total_cost, rejection.plan_rows,
+                          max_cost, max_rows, rejection.reason, json.dumps(rejection.plan, default=str)))
+            conn.commit()
+        finally:
+            conn.close()
+        logger.warning(f"Rejected generated SQL: {rejection.reason}")
+
+    def recent(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Most recent rejections, newest first"""
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        conn.row_factory = sqlite3.Row
+        try:
+            rows = conn.execute('''SELECT created_at, question, sql_query, total_cost, plan_rows, reason
+                                   FROM rejected_plans ORDER BY id DESC LIMIT ?''', (limit,)).fetchall()
+        finally:
+            conn.close()
+        return [dict(row) for row in rows]
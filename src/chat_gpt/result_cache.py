@@ -0,0 +1,203 @@
+import hashlib
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Optional
+
+from src.utils.config import Config
+from src.chat_gpt.sql_text import normalize_sql, referenced_tables
+
+logger = logging.getLogger(__name__)
+
+def _estimate_size(result: Dict[str, Any]) -> int:
+    """Rough in-memory footprint of a query result in bytes."""
+    size = sys.getsizeof(result)
+    for column in result.get('columns', []):
+        size += sys.getsizeof(column)
+    for row in result.get('rows', []):
+        size += sys.getsizeof(row)
+        for value in row:
+            size += sys.getsizeof(value)
+    return size
+
+
+class _CacheEntry:
+    __slots__ = ("result", "tables", "expires_at", "size")
+
+    def __init__(self, result, tables, expires_at, size):
+        self.result = result
+        self.tables = tables
+        self.expires_at = expires_at
+        self.size = size
+
+
+class ResultCache:
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 300.0,
+                 max_bytes: int = 64 * 1024 * 1024, known_tables: Iterable[str] = ()):
+        """
+        LRU + TTL cache of generated-SQL results with a memory cap
+
+        :param max_entries: Maximum number of cached results
+        :param ttl_seconds: Lifetime of a cached result
+        :param max_bytes: Approximate memory budget across all entries
+        :param known_tables: Tables whose data versions entries depend on (in addition to versioned ones)
+        """
+        self.known_tables = frozenset(known_tables)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'invalidations': 0,
+            'rejected_too_large': 0,
+        }
+
+    @staticmethod
+    def _key(normalized_sql: str, tables: FrozenSet[str], versions: Dict[str, int]) -> str:
+        version_part = ','.join(f"{table}={versions.get(table, 0)}" for table in sorted(tables))
+        return hashlib.sha256(f"{normalized_sql}|{version_part}".encode('utf-8')).hexdigest()
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def sync_versions(self, versions: Dict[str, int]):
+        """
+        Drop every entry that depends on a table whose data version changed
+
+        :param versions: Current mapping of table name to data version
+        """
+        with self._lock:
+            changed = {
+                table for table, version in versions.items()
+                if self._versions.get(table, 0) != version
+            }
+            self._versions = dict(versions)
+            if not changed:
+                return
+            stale = [key for key, entry in self._entries.items() if entry.tables & changed]
+            for key in stale:
+                self._drop(key)
+            self._stats['invalidations'] += len(stale)
+        if stale:
+            logger.info(f"Invalidated {len(stale)} cached results for changed tables: {sorted(changed)}")
+
+    def get(self, sql_query: str, versions: Dict[str, int]) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached result
+
+        :param sql_query: SQL as generated (normalized internally)
+        :param versions: Current table data versions
+        :return: Cached result or None
+        """
+        self.sync_versions(versions)
+        normalized = normalize_sql(sql_query)
+        tables = referenced_tables(normalized, self.known_tables | set(versions))
+        key = self._key(normalized, tables, versions)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            if entry.expires_at <= time.monotonic():
+                self._drop(key)
+                self._stats['expirations'] += 1
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry.result
+
+    def put(self, sql_query: str, versions: Dict[str, int], result: Dict[str, Any]):
+        """
+        Store a successful query result
+
+        :param sql_query: SQL as generated (normalized internally)
+        :param versions: Table data versions the result was read at
+        :param result: Result dict with `columns` and `rows`
+        """
+        self.sync_versions(versions)
+        normalized = normalize_sql(sql_query)
+        tables = referenced_tables(normalized, self.known_tables | set(versions))
+        key = self._key(normalized, tables, versions)
+        size = _estimate_size(result)
+
+        with self._lock:
+            if size > self.max_bytes:
+                self._stats['rejected_too_large'] += 1
+                return
+            if key in self._entries:
+                self._drop(key)
+
+            self._entries[key] = _CacheEntry(result, tables, time.monotonic() + self.ttl_seconds, size)
+            self._bytes += size
+
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self._stats['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = self._bytes
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = (stats['hits'] / lookups * 100) if lookups else 0.0
+        return stats
+
+
+class DataVersionTracker:
+    def __init__(self, fetch: Callable[[], Dict[str, int]], refresh_seconds: float = 2.0):
+        """
+        Caches table data versions so the result cache does not add a round trip per lookup
+
+        :param fetch: Callable returning the current versions from the database
+        :param refresh_seconds: How long a fetched snapshot stays valid
+        """
+        self._fetch = fetch
+        self.refresh_seconds = refresh_seconds
+        self._versions: Dict[str, int] = {}
+        self._fetched_at = float('-inf')
+        self._lock = threading.Lock()
+
+    def current(self) -> Dict[str, int]:
+        with self._lock:
+            if time.monotonic() - self._fetched_at >= self.refresh_seconds:
+                self._versions = self._fetch()
+                self._fetched_at = time.monotonic()
+            return self._versions
+
+
+_result_cache: Optional[ResultCache] = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache(known_tables: Iterable[str] = ()) -> ResultCache:
+    """Return the process-wide result cache, creating it from Config on first use."""
+    global _result_cache
+    with _result_cache_lock:
+        if _result_cache is None:
+            _result_cache = ResultCache(
+                max_entries=Config.RESULT_CACHE_MAX_ENTRIES,
+                ttl_seconds=Config.RESULT_CACHE_TTL_SECONDS,
+                max_bytes=Config.RESULT_CACHE_MAX_BYTES,
+                known_tables=known_tables,
+            )
+        return _result_cache
@@ -0,0 +1,158 @@
+import json
+import math
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from src.chat_gpt.prompt_builder import count_tokens
+
+# (top/bottom k, series points) tried in turn until a digest fits its token budget
+DIGEST_LEVELS = [(10, 24), (5, 12), (3, 6), (1, 3)]
+
+
+def _plain(value: Any) -> Any:
+    """JSON-compatible scalar: numpy and Decimal numbers, dates and timestamps"""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, Decimal):
+        value = float(value)
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _default(value: Any) -> Any:
+    plain = _plain(value)
+    return plain if plain is not value else str(value)
+
+
+def compact_json(value: Any) -> str:
+    """JSON without indentation or spaces after separators"""
+    return json.dumps(value, separators=(",", ":"), default=_default)
+
+
+def _is_number(value: Any) -> bool:
+    value = _plain(value)
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def sample_indices(length: int, points: int) -> List[int]:
+    """Evenly spaced positions over a sequence, always keeping its first and last"""
+    if length <= points:
+        return list(range(length))
+    return sorted(set(np.linspace(0, length - 1, max(points, 2)).round().astype(int).tolist()))
+
+
+def _stats(values: Sequence[Any]) -> Dict[str, Any]:
+    numbers = [_plain(value) for value in values if value is not None]
+    total = sum(numbers)
+    return {"count": len(values), "min": min(numbers), "max": max(numbers), "sum": total,
+            "mean": total / len(numbers)} if numbers else {"count": len(values)}
+
+
+def summarize(value: Any, top_k: int, points: int) -> Any:
+    """
+    Compact stand-in for a nested result
+
+    Numbers and short containers are kept exactly. A long mapping of numbers becomes its aggregates and
+    its top/bottom k entries, a long list of numbers its aggregates and an evenly spaced sample, and any
+    other long list an evenly spaced sample of its items.
+    """
+    if isinstance(value, dict):
+        if len(value) > 2 * top_k and all(_is_number(item) or item is None for item in value.values()):
+            ranked = sorted(((key, _plain(item)) for key, item in value.items() if item is not None),
+                            key=lambda pair: pair[1], reverse=True)
+            return {**_stats(list(value.values())),
+                    "top": {str(key): item for key, item in ranked[:top_k]},
+                    "bottom": {str(key): item for key, item in ranked[-top_k:]}}
+        return {str(key): summarize(item, top_k, points) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        if len(value) <= points:
+            return [summarize(item, top_k, points) for item in value]
+        sample = [summarize(value[index], top_k, points) for index in sample_indices(len(value), points)]
+        if all(_is_number(item) or item is None for item in value):
+            return {**_stats(value), "sample": sample}
+        return {"count": len(value), "sample": sample}
+    return _plain(value)
+
+
+def _fit(candidates, token_budget: int, model: str) -> str:
+    text = ""
+    for text in candidates:
+        if count_tokens(text, model) <= token_budget:
+            return text
+    # Even the smallest digest is over budget: cut it rather than overflow the prompt
+    return text[:token_budget * 4]
+
+
+def digest_result(result: Any, token_budget: int, model: str = "gpt-4") -> str:
+    """
+    A calculation result as compact JSON within a token budget
+
+    The result is sent exactly when it fits; otherwise it is summarized, coarser at each DIGEST_LEVELS step.
+    """
+    def candidates():
+        yield compact_json(result)
+        for top_k, points in DIGEST_LEVELS:
+            yield compact_json(summarize(result, top_k, points))
+
+    return _fit(candidates(), token_budget, model)
+
+
+def digest_rows(columns: List[str], rows: Sequence[Sequence[Any]], token_budget: int,
+                digest: Optional[Dict[str, Any]] = None, model: str = "gpt-4") -> str:
+    """
+    Query result rows as prompt text within a token budget
+
+    Every row is listed when they fit. Otherwise the text gives per-column aggregates of the numeric
+    columns, the top and bottom rows by the last numeric column, and an evenly spaced sample of rows in
+    result order, so trends stay visible.
+
+    :param columns: Result column names
+    :param rows: Fetched rows
+    :param token_budget: Maximum prompt tokens for the text
+    :param digest: In-database digest of the full result when rows was truncated (row_count, per-column min/max/sum)
+    """
+    rows = [list(row) for row in rows]
+    row_count = digest["row_count"] if digest else len(rows)
+    header = f"Query results ({row_count} rows):\nColumns: {compact_json(columns)}"
+    numeric = [index for index in range(len(columns))
+               if any(row[index] is not None for row in rows)
+               and all(row[index] is None or _is_number(row[index]) for row in rows)]
+
+    aggregates = {columns[index]: _stats([row[index] for row in rows]) for index in numeric}
+    for column, totals in ((digest or {}).get("columns") or {}).items():
+        aggregates[column] = {"count": row_count, **{key: _plain(value) for key, value in totals.items()}}
+
+    def ranked(top_k: int) -> str:
+        if not numeric:
+            return ""
+        key = numeric[-1]
+        ordered = sorted((row for row in rows if row[key] is not None), key=lambda row: _plain(row[key]),
+                         reverse=True)
+        lines = [f"Top {min(top_k, len(ordered))} by {columns[key]}:"]
+        lines += [compact_json(row) for row in ordered[:top_k]]
+        lines += [f"Bottom {min(top_k, len(ordered))} by {columns[key]}:"]
+        lines += [compact_json(row) for row in ordered[-top_k:][::-1]]
+        return "\n".join(lines) + "\n"
+
+    def candidates():
+        if not digest:
+            yield header + "\nRows:\n" + "\n".join(compact_json(row) for row in rows)
+        for top_k, points in DIGEST_LEVELS:
+            sample = [rows[index] for index in sample_indices(len(rows), points)]
+            yield (
+                f"{header}\n"
+                f"Only a digest of the rows is shown{'; the fetched rows were truncated' if digest else ''}.\n"
+                + (f"Numeric column aggregates{' (full result)' if digest else ''}: {compact_json(aggregates)}\n"
+                   if aggregates else "")
+                + ranked(top_k)
+                + f"Sample of {len(sample)} rows, evenly spaced in result order:\n"
+                + "\n".join(compact_json(row) for row in sample)
+            )
+
+    return _fit(candidates(), token_budget, model)
@@ -0,0 +1,148 @@
+import logging
+import re
+from typing import Optional
+
+from src.data_manager.occupancy_rollups import ROLLUP_VIEWS
+
+logger = logging.getLogger(__name__)
+
+# Finest to coarsest; a rollup can answer any question at its grain or coarser
+GRAIN_ORDER = ["hour", "day", "month"]
+
+_TRUNC_GRAINS = {
+    "hour": "hour", "day": "day", "week": "day",
+    "month": "month", "quarter": "month", "year": "month",
+}
+_EXTRACT_GRAINS = {
+    "hour": "hour",
+    "day": "day", "dow": "day", "isodow": "day", "doy": "day", "week": "day",
+    "month": "month", "quarter": "month", "year": "month",
+}
+
+_AGGREGATE_REWRITES = {
+    "sum": "SUM({ref}occupancy_sum)",
+    "max": "MAX({ref}occupancy_max)",
+    "min": "MIN({ref}occupancy_min)",
+    "count": "SUM({ref}reading_count)",
+    "avg": "(SUM({ref}occupancy_sum)::numeric / NULLIF(SUM({ref}reading_count), 0))",
+}
+
+_ALIAS_STOPWORDS = {"on", "where", "group", "order", "left", "right", "inner", "full", "cross",
+                    "join", "limit", "having", "union", "natural", "using"}
+_TABLE_REF = re.compile(r"\b(from|join)(\s+)floor_utilization\b(?:\s+(?:as\s+)?([a-z_][a-z0-9_]*))?", re.IGNORECASE)
+_TIMESTAMP_LITERAL = re.compile(
+    r"(?:(?:timestamp|date)\s+)?'(\d{4})-(\d{2})-(\d{2})(?:[ t](\d{2}):(\d{2})(?::(\d{2}))?)?'"
+    r"(?:\s*::\s*(?:timestamp|date))?",
+    re.IGNORECASE,
+)
+_ROW_WEIGHTED_AGGREGATE = re.compile(
+    r"\b(?:(?:sum|avg|count)\s*\(\s*(?!distinct\b)"
+    r"|(?:stddev\w*|var_pop|var_samp|variance|percentile_\w+|mode|\w+_agg|every|bool_and|bool_or|corr|covar_\w+|regr_\w+)\s*\()",
+    re.IGNORECASE,
+)
+_VIEW_PLACEHOLDER = "\x01rollup_view\x01"
+
+
+def _literal_grain(year, month, day, hour, minute, second) -> Optional[str]:
+    """Coarsest grain a timestamp literal is aligned to, or None if it falls inside an hour."""
+    if (minute and minute != "00") or (second and second != "00"):
+        return None
+    if hour and hour != "00":
+        return "hour"
+    if day != "01":
+        return "day"
+    return "month"
+
+
+def rewrite_to_rollup(sql_query: str) -> str:
+    """
+    Redirect an aggregation over raw floor_utilization readings to the matching rollup
+
+    Only rewrites when the result is unchanged: floor_utilization is read once,
+    every occupancy reference is inside SUM/AVG/MAX/MIN/COUNT, and every time
+    reference is a date_trunc/EXTRACT/::date bucket or a >= / < bound on a literal
+    aligned to the chosen grain. Anything else is returned untouched.
+
+    :param sql_query: Generated SQL
+    :return: SQL against floor_utilization_{hourly,daily,monthly}, or the input
+    """
+    refs = list(_TABLE_REF.finditer(sql_query))
+    if len(refs) != 1:
+        return sql_query
+    # Window functions, row-level stars and time zone conversions change per-row semantics
+    if re.search(r"\bover\s*\(|\bat\s+time\s+zone\b|\.\s*\*|\bcount\s*\(\s*\*\s*\)", sql_query, re.IGNORECASE):
+        return sql_query
+
+    ref = refs[0]
+    alias = ref.group(3)
+    if alias and alias.lower() in _ALIAS_STOPWORDS:
+        alias = None
+
+    # Keep the original name visible as an alias so qualified references stay valid
+    replacement = _VIEW_PLACEHOLDER if alias else f"{_VIEW_PLACEHOLDER} AS floor_utilization"
+    alias = alias or "floor_utilization"
+    table_sql = re.sub(r"floor_utilization", replacement, ref.group(0), count=1, flags=re.IGNORECASE)
+    rewritten = sql_query[:ref.start()] + table_sql + sql_query[ref.end():]
+
+    qualifier = rf"(?:{re.escape(alias)}\s*\.\s*)?"
+    prefix = f"{alias}."
+    grains = []
+    placeholders = {}
+
+    def stash(text: str) -> str:
+        key = f"\x00{len(placeholders)}\x00"
+        placeholders[key] = text
+        return key
+
+    aggregate = re.compile(rf"\b(sum|avg|max|min|count)\s*\(\s*{qualifier}occupancy\s*\)", re.IGNORECASE)
+    if not aggregate.search(rewritten):
+        return sql_query
+    rewritten = aggregate.sub(lambda m: stash(_AGGREGATE_REWRITES[m.group(1).lower()].format(ref=prefix)), rewritten)
+    # Other row-weighted aggregates (e.g. AVG(fo.max_capacity) over readings) would change with fewer rows
+    if _ROW_WEIGHTED_AGGREGATE.search(rewritten):
+        return sql_query
+
+    def bucket(grain_map, template):
+        def replace(m):
+            grain = grain_map.get(m.group(1).lower())
+            if grain is None:
+                return m.group(0)
+            grains.append(grain)
+            return stash(template.format(unit=m.group(1), ref=prefix))
+        return replace
+
+    rewritten = re.sub(rf"\bdate_trunc\s*\(\s*'(\w+)'\s*,\s*{qualifier}time\s*\)",
+                       bucket(_TRUNC_GRAINS, "date_trunc('{unit}', {ref}period_start)"), rewritten, flags=re.IGNORECASE)
+    rewritten = re.sub(rf"\bextract\s*\(\s*(\w+)\s+from\s+{qualifier}time\s*\)",
+                       bucket(_EXTRACT_GRAINS, "EXTRACT({unit} FROM {ref}period_start)"), rewritten, flags=re.IGNORECASE)
+
+    def to_date(m):
+        grains.append("day")
+        return stash(f"{prefix}period_start::date")
+
+    rewritten = re.sub(rf"\b{qualifier}time\s*::\s*date\b", to_date, rewritten, flags=re.IGNORECASE)
+    rewritten = re.sub(rf"\bdate\s*\(\s*{qualifier}time\s*\)", to_date, rewritten, flags=re.IGNORECASE)
+
+    # Half-open bounds only: `time >= lit` and `time < lit` keep whole buckets in or out
+    def bound(m):
+        literal = _TIMESTAMP_LITERAL.fullmatch(m.group(2))
+        grain = _literal_grain(*literal.groups())
+        if grain is None:
+            return m.group(0)
+        grains.append(grain)
+        return stash(f"{prefix}period_start {m.group(1)} {m.group(2)}")
+
+    rewritten = re.sub(rf"\b{qualifier}time\s*(>=|<)\s*({_TIMESTAMP_LITERAL.pattern})", bound, rewritten, flags=re.IGNORECASE)
+
+    # Any remaining raw reference means the rollup cannot answer the query
+    if re.search(rf"\b{qualifier}(occupancy|time)\b", rewritten, re.IGNORECASE):
+        return sql_query
+
+    grain = min(grains, key=GRAIN_ORDER.index) if grains else "month"
+    view_name = ROLLUP_VIEWS[grain]
+    for key, text in placeholders.items():
+        rewritten = rewritten.replace(key, text)
+    rewritten = rewritten.replace(_VIEW_PLACEHOLDER, view_name)
+
+    logger.info(f"Rewrote floor_utilization aggregation to {view_name}")
+    return rewritten
@@ -0,0 +1,210 @@
+import hashlib
+import logging
+import re
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_question(question: Optional[str]) -> str:
+    """
+    Canonical form of a user question
+
+    Lower-cases, drops punctuation that does not change meaning and collapses whitespace,
+    so "How many buildings are in lease vs. owned?" and "how many buildings are in lease vs owned"
+    share a cache entry. Building IDs, numbers and words are kept as-is.
+    """
+    if not question:
+        return ""
+    text = question.lower()
+    text = re.sub(r"[^\w\s&$%./-]", " ", text)
+    text = re.sub(r"(?<!\d)[./](?!\d)", " ", text)
+    return " ".join(text.split())
+
+
+def _context_fields(prev_context) -> Dict[str, Optional[str]]:
+    """Follow-up context as used by generate_sql_query; anything but a dict means no context."""
+    if isinstance(prev_context, dict):
+        return {
+            "previous_question": prev_context.get("previous_question"),
+            "previous_field": prev_context.get("previous_field"),
+        }
+    return {"previous_question": None, "previous_field": None}
+
+
+class QuestionSQLCache:
+    def __init__(self, db_path: str = "sql_cache.db", schema_version: str = "", max_age_days: Optional[float] = None):
+        """
+        Persistent mapping of (question, follow-up context) to validated SQL
+
+        :param db_path: SQLite database file
+        :param schema_version: Fingerprint of the schema/prompt; entries from other versions are ignored
+        :param max_age_days: Entries older than this are treated as misses
+        """
+        self.db_path = db_path
+        self.schema_version = schema_version
+        self.max_age_days = max_age_days
+        self._init_db()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    def _init_db(self):
+        conn = self._connect()
+        c = conn.cursor()
+        c.execute('''CREATE TABLE IF NOT EXISTS question_sql_cache
+                     (cache_key TEXT PRIMARY KEY,
+                      question TEXT,
+                      previous_question TEXT,
+                      previous_field TEXT,
+                      schema_version TEXT,
+                      sql_query TEXT NOT NULL,
+                      created_at TEXT,
+                      last_hit_at TEXT,
+                      hit_count INTEGER DEFAULT 0)''')
+        c.execute('''CREATE TABLE IF NOT EXISTS question_sql_cache_stats
+                     (name TEXT PRIMARY KEY,
+                      value INTEGER NOT NULL)''')
+        c.execute("INSERT OR IGNORE INTO question_sql_cache_stats (name, value) VALUES ('hits', 0), ('misses', 0)")
+        conn.commit()
+        conn.close()
+
+    def _key(self, question: str, prev_context) -> str:
+        context = _context_fields(prev_context)
+        parts = [
+            self.schema_version,
+            normalize_question(question),
+            normalize_question(context["previous_question"]),
+            (context["previous_field"] or "").strip().lower(),
+        ]
+        return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+    def get(self, question: str, prev_context=None) -> Optional[str]:
+        """
+        Look up validated SQL for a question
+
+        :param question: The user's question
+        :param prev_context: Follow-up context dict (previous_question, previous_field)
+        :return: Cached SQL or None
+        """
+        key = self._key(question, prev_context)
+        now = datetime.now()
+        conn = self._connect()
+        try:
+            c = conn.cursor()
+            c.execute("SELECT sql_query, created_at FROM question_sql_cache WHERE cache_key = ?", (key,))
+            row = c.fetchone()
+            if row and self.max_age_days is not None:
+                if now - datetime.fromisoformat(row[1]) > timedelta(days=self.max_age_days):
+                    row = None
+
+            if row:
+                c.execute("UPDATE question_sql_cache SET hit_count = hit_count + 1, last_hit_at = ? WHERE cache_key = ?",
+                          (now.isoformat(), key))
+                c.execute("UPDATE question_sql_cache_stats SET value = value + 1 WHERE name = 'hits'")
+            else:
+                c.execute("UPDATE question_sql_cache_stats SET value = value + 1 WHERE name = 'misses'")
+            conn.commit()
+            return row[0] if row else None
+        finally:
+            conn.close()
+
+    def put(self, question: str, sql_query: str, prev_context=None):
+        """
+        Store SQL that passed validation and executed successfully
+
+        :param question: The user's question
+        :param sql_query: The validated SQL
+        :param prev_context: Follow-up context dict (previous_question, previous_field)
+        """
+        context = _context_fields(prev_context)
+        conn = self._connect()
+        try:
+            c = conn.cursor()
+            c.execute('''INSERT OR REPLACE INTO question_sql_cache
+                         (cache_key, question, previous_question, previous_field, schema_version,
+                          sql_query, created_at, last_hit_at, hit_count)
+                         VALUES (?, ?, ?, ?, ?, ?, ?, NULL, 0)''',
+                      (self._key(question, prev_context), question, context["previous_question"],
+                       context["previous_field"], self.schema_version, sql_query, datetime.now().isoformat()))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def evict(self, question: str, prev_context=None, sql_query: Optional[str] = None) -> bool:
+        """
+        Delete the entry for a question whose SQL failed or was rejected at execution
+
+        :param question: The user's question
+        :param prev_context: Follow-up context dict (previous_question, previous_field)
+        :param sql_query: Only delete the entry if it still holds this SQL
+        :return: Whether an entry was deleted
+        """
+        sql = "DELETE FROM question_sql_cache WHERE cache_key = ?"
+        params = [self._key(question, prev_context)]
+        if sql_query is not None:
+            sql += " AND sql_query = ?"
+            params.append(sql_query)
+        conn = self._connect()
+        try:
+            c = conn.cursor()
+            c.execute(sql, params)
+            deleted = c.rowcount > 0
+            conn.commit()
+        finally:
+            conn.close()
+        if deleted:
+            logger.info(f"Evicted cached SQL for question: {question}")
+        return deleted
+
+    def purge(self, older_than_days: Optional[float] = None, question: Optional[str] = None) -> int:
+        """
+        Delete cached entries (admin operation)
+
+        :param older_than_days: Only delete entries created before this many days ago
+        :param question: Only delete entries for this (normalized) question
+        :return: Number of deleted entries
+        """
+        clauses, params = [], []
+        if older_than_days is not None:
+            clauses.append("created_at < ?")
+            params.append((datetime.now() - timedelta(days=older_than_days)).isoformat())
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        conn = self._connect()
+        try:
+            c = conn.cursor()
+            if question is None:
+                c.execute(f"DELETE FROM question_sql_cache{where}", params)
+                deleted = c.rowcount
+            else:
+                target = normalize_question(question)
+                c.execute(f"SELECT cache_key, question FROM question_sql_cache{where}", params)
+                keys = [(key,) for key, cached_question in c.fetchall()
+                        if normalize_question(cached_question) == target]
+                c.executemany("DELETE FROM question_sql_cache WHERE cache_key = ?", keys)
+                deleted = len(keys)
+            if not clauses and question is None:
+                c.execute("UPDATE question_sql_cache_stats SET value = 0")
+            conn.commit()
+        finally:
+            conn.close()
+        logger.info(f"Purged {deleted} cached question/SQL entries")
+        return deleted
+
+    def metrics(self) -> Dict[str, Any]:
+        """Hit/miss counters and entry count"""
+        conn = self._connect()
+        try:
+            c = conn.cursor()
+            c.execute("SELECT name, value FROM question_sql_cache_stats")
+            stats = dict(c.fetchall())
+            c.execute("SELECT COUNT(*) FROM question_sql_cache")
+            stats['entries'] = c.fetchone()[0]
+        finally:
+            conn.close()
+        lookups = stats.get('hits', 0) + stats.get('misses', 0)
+        stats['hit_rate'] = (stats.get('hits', 0) / lookups * 100) if lookups else 0.0
+        return stats
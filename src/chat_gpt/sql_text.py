@@ -0,0 +1,98 @@
+import re
+from decimal import Decimal, InvalidOperation
+from typing import FrozenSet, Iterable, Iterator, List, Optional, Tuple
+
+_SQL_TOKEN = re.compile(
+    r"""
+    (?P<comment>--[^\n]*|/\*.*?\*/)
+    | (?P<string>'(?:[^']|'')*')
+    | (?P<ident>"(?:[^"]|"")*")
+    | (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+    | (?P<word>[A-Za-z_][A-Za-z0-9_$]*)
+    | (?P<op>::|<=|>=|<>|!=|\|\||\S)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+
+def _normalize_number(literal: str) -> str:
+    """Canonical numeric literal that keeps the integer/decimal distinction Postgres cares about."""
+    try:
+        value = Decimal(literal)
+    except InvalidOperation:
+        return literal
+    is_decimal = any(ch in literal for ch in '.eE')
+    text = format(value.normalize(), 'f')
+    if is_decimal and '.' not in text:
+        text += '.0'
+    return text
+
+
+def normalize_sql(sql_query: str) -> str:
+    """
+    Canonical form of a SQL statement used as a cache key
+
+    Comments are dropped, whitespace is collapsed, unquoted keywords and identifiers
+    are lower-cased and numeric literals are rewritten canonically (``01.50`` -> ``1.5``).
+    String literals and quoted identifiers keep their exact contents.
+    """
+    tokens = []
+    for match in _SQL_TOKEN.finditer(sql_query):
+        kind = match.lastgroup
+        token = match.group(kind)
+        if kind == 'comment':
+            continue
+        if kind == 'word':
+            token = token.lower()
+        elif kind == 'number':
+            token = _normalize_number(token)
+        tokens.append(token)
+
+    while tokens and tokens[-1] == ';':
+        tokens.pop()
+    return ' '.join(tokens)
+
+
+def referenced_tables(normalized_sql: str, known_tables: Iterable[str]) -> FrozenSet[str]:
+    """Known table names that appear as whole words in a normalized statement."""
+    return frozenset(
+        table for table in known_tables
+        if re.search(rf'\b{re.escape(table.lower())}\b', normalized_sql)
+    )
+
+
+def tokenize_sql(sql_query: str, keep_comments: bool = False) -> Iterator[Tuple[str, str]]:
+    """Yield (kind, text) tokens; kinds are comment, string, ident, number, word and op."""
+    for match in _SQL_TOKEN.finditer(sql_query):
+        kind = match.lastgroup
+        if kind == 'comment' and not keep_comments:
+            continue
+        yield kind, match.group(kind)
+
+
+def top_level_words(sql_query: str) -> List[str]:
+    """Lower-cased unquoted words that are not nested inside parentheses."""
+    depth = 0
+    words = []
+    for kind, token in tokenize_sql(sql_query):
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth -= 1
+        elif kind == 'word' and depth == 0:
+            words.append(token.lower())
+    return words
+
+
+def statement_kind(sql_query: str) -> Optional[str]:
+    """First keyword of the statement (select, with, insert, ...), or None for empty input."""
+    for kind, token in tokenize_sql(sql_query):
+        if kind == 'word':
+            return token.lower()
+        if token != '(':
+            return None
+    return None
+
+
+def strip_trailing_semicolons(sql_query: str) -> str:
+    return sql_query.strip().rstrip(';').rstrip()
@@ -0,0 +1,321 @@
+import math
+import re
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from src.chat_gpt.sql_text import tokenize_sql
+
+# PostgreSQL cast target -> SQLite expression template
+_CAST_TEMPLATES = {
+    "numeric": "CAST({} AS REAL)", "decimal": "CAST({} AS REAL)", "float": "CAST({} AS REAL)",
+    "float4": "CAST({} AS REAL)", "float8": "CAST({} AS REAL)", "real": "CAST({} AS REAL)",
+    "double": "CAST({} AS REAL)", "money": "CAST({} AS REAL)",
+    "int": "CAST({} AS INTEGER)", "integer": "CAST({} AS INTEGER)", "bigint": "CAST({} AS INTEGER)",
+    "smallint": "CAST({} AS INTEGER)", "int2": "CAST({} AS INTEGER)", "int4": "CAST({} AS INTEGER)",
+    "int8": "CAST({} AS INTEGER)",
+    "text": "CAST({} AS TEXT)", "varchar": "CAST({} AS TEXT)", "char": "CAST({} AS TEXT)",
+    "date": "date({})", "timestamp": "datetime({})", "timestamptz": "datetime({})",
+}
+_TYPED_LITERALS = {"date", "timestamp"}
+_INTERVAL_UNITS = {
+    "year": "years", "years": "years", "mon": "months", "month": "months", "months": "months",
+    "week": "weeks", "weeks": "weeks", "day": "days", "days": "days",
+    "hour": "hours", "hours": "hours", "minute": "minutes", "minutes": "minutes", "min": "minutes",
+    "second": "seconds", "seconds": "seconds", "sec": "seconds",
+}
+_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _atom_start(pieces: List[str], end: int) -> int:
+    """Index of the first piece of the operand ending at `end`: a literal, a (qualified) name, or a call/group."""
+    start = end
+    if pieces[end] == ")":
+        depth = 0
+        for start in range(end, -1, -1):
+            if pieces[start] == ")":
+                depth += 1
+            elif pieces[start] == "(":
+                depth -= 1
+                if depth == 0:
+                    break
+        if start > 0 and re.fullmatch(r"[A-Za-z_][A-Za-z0-9_$]*", pieces[start - 1]):
+            start -= 1
+    while start >= 2 and pieces[start - 1] == ".":
+        start -= 2
+    return start
+
+
+def _call_end(pieces: List[str], open_index: int) -> int:
+    """Index of the ')' closing the '(' at open_index"""
+    depth = 0
+    for index in range(open_index, len(pieces)):
+        if pieces[index] == "(":
+            depth += 1
+        elif pieces[index] == ")":
+            depth -= 1
+            if depth == 0:
+                return index
+    raise ValueError("Unbalanced parentheses in SQL")
+
+
+def _interval_modifiers(spec: str) -> Optional[List[str]]:
+    """'1 year 2 mons' -> ['1 years', '2 months']; None when the interval is not understood"""
+    parts = spec.strip("'").split()
+    if len(parts) % 2:
+        return None
+    modifiers = []
+    for amount, unit in zip(parts[::2], parts[1::2]):
+        unit = _INTERVAL_UNITS.get(unit.lower())
+        try:
+            value = float(amount)
+        except ValueError:
+            return None
+        if unit is None:
+            return None
+        if unit == "weeks":
+            value, unit = value * 7, "days"
+        modifiers.append(f"{value:g} {unit}")
+    return modifiers
+
+
+def _negate(modifier: str) -> str:
+    return modifier[1:] if modifier.startswith("-") else f"-{modifier}"
+
+
+def _split(sql_query: str) -> Tuple[List[str], List[str], str]:
+    """Tokens of a query, the original whitespace and comments before each, and the text after the last"""
+    pieces, gaps, position, pending = [], [], 0, ""
+    for kind, token in tokenize_sql(sql_query, keep_comments=True):
+        start = sql_query.index(token, position)
+        gap, position = sql_query[position:start], start + len(token)
+        if kind == "comment":
+            pending += gap + token
+            continue
+        pieces.append(token)
+        gaps.append(pending + gap)
+        pending = ""
+    return pieces, gaps, pending + sql_query[position:]
+
+
+def _text(pieces: List[str], gaps: List[str], start: int, end: int) -> str:
+    """Original text of pieces[start:end]"""
+    return pieces[start] + "".join(gap + piece for gap, piece in zip(gaps[start + 1:end], pieces[start + 1:end]))
+
+
+def _splice(pieces: List[str], gaps: List[str], start: int, end: int, text: str):
+    """Replace pieces[start:end] with one piece, keeping the whitespace before the first"""
+    pieces[start:end] = [text]
+    gaps[start:end] = [gaps[start]]
+
+
+def _needs_rewrite(pieces: List[str]) -> bool:
+    for index, piece in enumerate(pieces):
+        word = piece.lower()
+        following = pieces[index + 1] if index + 1 < len(pieces) else ""
+        if piece == "::" or word == "ilike":
+            return True
+        if word in ("extract", "cast") and following == "(":
+            return True
+        if word in ("date", "timestamp", "interval") and following.startswith("'"):
+            return True
+    return False
+
+
+def to_sqlite(sql_query: str) -> str:
+    """
+    Rewrite PostgreSQL-only syntax the SQL model emits into SQLite
+
+    Handles ``expr::type`` and ``CAST(expr AS date|timestamp)`` casts, ``EXTRACT(field FROM expr)``,
+    ``DATE '...'`` / ``TIMESTAMP '...'`` literals, ``expr +/- INTERVAL '...'`` and ``ILIKE``. Functions
+    such as date_trunc, date_part, to_char, greatest and stddev are provided by register_functions().
+    Only the rewritten spans change; the rest of the text, and with it the column labels SQLite derives
+    from it, is kept as written.
+    """
+    pieces, gaps, tail = _split(sql_query)
+    if not _needs_rewrite(pieces):
+        return sql_query
+
+    # EXTRACT(field FROM expr) -> date_part('field', expr); CAST(expr AS date) -> date(expr)
+    index = 0
+    while index < len(pieces):
+        word = pieces[index].lower()
+        if (word == "extract" and index + 3 < len(pieces) and pieces[index + 1] == "("
+                and pieces[index + 3].lower() == "from"):
+            end = _call_end(pieces, index + 1)
+            inner = _text(pieces, gaps, index + 4, end)
+            _splice(pieces, gaps, index, end + 1, f"date_part('{pieces[index + 2].lower()}', {inner})")
+        elif word == "cast" and index + 1 < len(pieces) and pieces[index + 1] == "(":
+            end = _call_end(pieces, index + 1)
+            depth, as_index = 0, None
+            for position in range(index + 2, end):
+                if pieces[position] == "(":
+                    depth += 1
+                elif pieces[position] == ")":
+                    depth -= 1
+                elif depth == 0 and pieces[position].lower() == "as":
+                    as_index = position
+            type_name = pieces[as_index + 1].lower() if as_index is not None and as_index + 1 < end else None
+            if type_name in ("date", "timestamp", "timestamptz"):
+                operand = _text(pieces, gaps, index + 2, as_index)
+                _splice(pieces, gaps, index, end + 1, _CAST_TEMPLATES[type_name].format(operand))
+        index += 1
+
+    index = 0
+    while index < len(pieces):
+        word = pieces[index].lower()
+        if word == "ilike":
+            pieces[index] = "LIKE"
+        elif word in _TYPED_LITERALS and index + 1 < len(pieces) and pieces[index + 1].startswith("'"):
+            _splice(pieces, gaps, index, index + 2, _CAST_TEMPLATES[word].format(pieces[index + 1]))
+        elif pieces[index] == "::" and index > 0 and index + 1 < len(pieces):
+            start = _atom_start(pieces, index - 1)
+            type_end = index + 1
+            type_name = pieces[type_end].lower()
+            if type_name == "double" and type_end + 1 < len(pieces) and pieces[type_end + 1].lower() == "precision":
+                type_end += 1
+            if type_end + 1 < len(pieces) and pieces[type_end + 1] == "(":
+                type_end = _call_end(pieces, type_end + 1)
+            template = _CAST_TEMPLATES.get(type_name, "{}")
+            _splice(pieces, gaps, start, type_end + 1, template.format(_text(pieces, gaps, start, index)))
+            index = start
+        elif (word == "interval" and index + 1 < len(pieces) and pieces[index + 1].startswith("'")
+              and index >= 2 and pieces[index - 1] in ("+", "-")):
+            modifiers = _interval_modifiers(pieces[index + 1])
+            if modifiers is not None:
+                if pieces[index - 1] == "-":
+                    modifiers = [_negate(modifier) for modifier in modifiers]
+                start = _atom_start(pieces, index - 2)
+                operand = _text(pieces, gaps, start, index - 1)
+                arguments = ", ".join(f"'{modifier}'" for modifier in modifiers)
+                function = "date" if operand.lower() == "current_date" else "datetime"
+                _splice(pieces, gaps, start, index + 2, f"{function}({operand}, {arguments})")
+                index = start
+        index += 1
+
+    return "".join(gap + piece for gap, piece in zip(gaps, pieces)) + tail
+
+
+def _parse_timestamp(value) -> Optional[datetime]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+
+def date_trunc(unit, value) -> Optional[str]:
+    moment = _parse_timestamp(value)
+    if moment is None:
+        return None
+    unit = str(unit).lower()
+    if unit == "year":
+        moment = moment.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+    elif unit == "quarter":
+        moment = moment.replace(month=(moment.month - 1) // 3 * 3 + 1, day=1, hour=0, minute=0, second=0,
+                                microsecond=0)
+    elif unit == "month":
+        moment = moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    elif unit == "week":
+        moment = (moment - timedelta(days=moment.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+    elif unit == "day":
+        moment = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    elif unit == "hour":
+        moment = moment.replace(minute=0, second=0, microsecond=0)
+    elif unit == "minute":
+        moment = moment.replace(second=0, microsecond=0)
+    return moment.strftime(_TIMESTAMP_FORMAT)
+
+
+def date_part(field, value):
+    moment = _parse_timestamp(value)
+    if moment is None:
+        return None
+    field = str(field).lower()
+    if field == "epoch":
+        return moment.timestamp()
+    parts = {
+        "year": moment.year, "month": moment.month, "day": moment.day, "hour": moment.hour,
+        "minute": moment.minute, "second": moment.second, "quarter": (moment.month - 1) // 3 + 1,
+        "dow": moment.isoweekday() % 7, "isodow": moment.isoweekday(), "doy": moment.timetuple().tm_yday,
+        "week": moment.isocalendar()[1],
+    }
+    return parts.get(field)
+
+
+# to_char pattern -> strftime directive, longest first
+_TO_CHAR_PATTERNS = [("YYYY", "%Y"), ("Month", "%B"), ("Mon", "%b"), ("HH24", "%H"), ("MM", "%m"),
+                     ("DD", "%d"), ("MI", "%M"), ("SS", "%S"), ("Day", "%A"), ("Dy", "%a")]
+
+
+def to_char(value, pattern) -> Optional[str]:
+    moment = _parse_timestamp(value)
+    if moment is None or pattern is None:
+        return None
+    directive = re.sub("|".join(re.escape(p) for p, _ in _TO_CHAR_PATTERNS),
+                       lambda match: dict(_TO_CHAR_PATTERNS)[match.group(0)], str(pattern))
+    return moment.strftime(directive)
+
+
+def greatest(*values):
+    values = [value for value in values if value is not None]
+    return max(values) if values else None
+
+
+def least(*values):
+    values = [value for value in values if value is not None]
+    return min(values) if values else None
+
+
+class _Variance:
+    """Welford running variance; sample by default"""
+    population = False
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def step(self, value):
+        if value is None:
+            return
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def variance(self):
+        denominator = self.count if self.population else self.count - 1
+        return self.m2 / denominator if denominator > 0 else None
+
+    def finalize(self):
+        return self.variance()
+
+
+class _VariancePop(_Variance):
+    population = True
+
+
+class _Stddev(_Variance):
+    def finalize(self):
+        variance = self.variance()
+        return math.sqrt(variance) if variance is not None else None
+
+
+class _StddevPop(_Stddev):
+    population = True
+
+
+def register_functions(connection):
+    """Add the PostgreSQL functions generated SQL relies on to a sqlite3 connection."""
+    connection.create_function("date_trunc", 2, date_trunc, deterministic=True)
+    connection.create_function("date_part", 2, date_part, deterministic=True)
+    connection.create_function("to_char", 2, to_char, deterministic=True)
+    connection.create_function("greatest", -1, greatest, deterministic=True)
+    connection.create_function("least", -1, least, deterministic=True)
+    connection.create_function("now", 0, lambda: datetime.now().strftime(_TIMESTAMP_FORMAT))
+    for name, aggregate in (("stddev", _Stddev), ("stddev_samp", _Stddev), ("stddev_pop", _StddevPop),
+                            ("variance", _Variance), ("var_samp", _Variance), ("var_pop", _VariancePop)):
+        connection.create_aggregate(name, 1, aggregate)
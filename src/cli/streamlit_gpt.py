@@ -9,11 +9,19 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')
 print(f"Path: {sys.path}")
 
 from src.utils.config import Config
+from src.chat_gpt.metrics_store import QuestionTrace, outcome_of
 from src.chat_gpt.gpt_sql import (
     analyze_data_with_gpt,
     generate_sql_query,
     execute_validated_query,
-    calculate_success_rate
+    get_question_metrics_summary,
+    record_question_metrics,
+    get_db_pool_metrics,
+    get_result_cache_metrics,
+    get_sql_cache_metrics,
+    purge_sql_cache,
+    remember_validated_sql,
+    fetch_result_page
 )
 
 QUESTION_COLOR = "#0056D6"  # A shade of blue
@@ -82,13 +90,14 @@ def download_database():
         st.sidebar.error(f"Error downloading database: {e}")
 
     
-def add_to_chat_history(question, sql_query, answer):
+def add_to_chat_history(question, sql_query, answer, truncated=False):
     """Add a Q&A pair to chat history"""
     st.session_state.chat_history.append({
         "timestamp": datetime.now(),
         "question": question,
         "sql_query": sql_query,
-        "answer": answer
+        "answer": answer,
+        "truncated": truncated
     })
     
     st.session_state.chat_history = [
@@ -130,10 +139,6 @@ def update_total_requests():
     except Exception as e:
         logging.error(f"Error updating total requests: {e}")
 
-def log_query_analytics(query, outcome):
-    with open("query_analytics.log", "a") as f:
-        f.write(f"{datetime.now()} | Query: {query} | Outcome: {outcome}\n")
-
 def display_history(history):
     st.markdown("### Chat History")
     for item in history:
@@ -210,6 +215,15 @@ if st.session_state.chat_history:
         f"<p style='color:{ANSWER_COLOR}; font-weight:bold; '>A: {latest['answer']}</p>",
         unsafe_allow_html=True
     )
+    # Large results are capped at fetch time; read further pages only on demand
+    if latest.get("truncated"):
+        with st.expander("Browse full result"):
+            page = st.number_input("Page", min_value=1, value=1, step=1, key="result_page") - 1
+            page_result = fetch_result_page(latest["sql_query"], int(page))
+            if "error" in page_result:
+                st.error(f"Could not load page: {page_result['error']}")
+            else:
+                st.dataframe([dict(zip(page_result["columns"], row)) for row in page_result["rows"]])
 
 # Initialize session state
 if "conversation_context" not in st.session_state:
@@ -226,6 +240,9 @@ with query_container:
         submit_button = st.form_submit_button("Run Query")        
 
     if submit_button and user_query.strip():
+        trace = QuestionTrace(user_query)
+        sql_metrics = {}
+        result = None
         try:
             with st.spinner("Processing your query..."):
                 
@@ -234,32 +251,67 @@ with query_container:
                 )
 
                 # Generate and execute SQL query silently
-                sql_query = generate_sql_query(user_query,
-                                               prev_context=st.session_state.conversation_context)                
-                
-                result = execute_validated_query(sql_query)
+                with trace.stage("sql_generation"):
+                    sql_query = generate_sql_query(user_query,
+                                                   prev_context=st.session_state.conversation_context,
+                                                   metrics=sql_metrics)
                 
-                log_query_analytics(sql_query, "Success")
+                with trace.stage("db_execution"):
+                    result = execute_validated_query(sql_query, question=user_query,
+                                                     prev_context=st.session_state.conversation_context,
+                                                     metrics=sql_metrics)
+                # The cost guard may have regenerated the SQL
+                sql_query = result.get("sql_query", sql_query)
+
+                if "error" not in result:
+                    remember_validated_sql(user_query, sql_query,
+                                           prev_context=st.session_state.conversation_context)
 
                 if "error" in result:
-                    st.error(f"Query Failed: {result['details']}")
+                    st.error(f"Query Failed: {result.get('details', result['error'])}")
                     answer = f"Error: {result['error']}"
                 elif not result["rows"]:
                     st.warning("No data found for your query.")
                     answer = "No data found"
                 else:
-                    answer = analyze_data_with_gpt(
-                        user_query,
-                        result["columns"],
-                        result["rows"],
-                        prev_context=st.session_state.conversation_context
-                    )
-                    st.success(answer)                    
+                    narrative_metrics = {}
+                    if Config.STREAM_NARRATIVE:
+                        # Render tokens as they arrive; write_stream returns the full text
+                        token_stream = analyze_data_with_gpt(
+                            user_query,
+                            result["columns"],
+                            result["rows"],
+                            prev_context=st.session_state.conversation_context,
+                            stream=True,
+                            metrics=narrative_metrics,
+                            digest=result.get("digest")
+                        )
+                        answer = st.write_stream(token_stream)
+                    else:
+                        answer = analyze_data_with_gpt(
+                            user_query,
+                            result["columns"],
+                            result["rows"],
+                            prev_context=st.session_state.conversation_context,
+                            metrics=narrative_metrics,
+                            digest=result.get("digest")
+                        )
+                        st.success(answer)
+                    st.session_state["last_narrative_metrics"] = narrative_metrics
+                    trace.set_stage_ms("narrative", narrative_metrics.get("total_time", 0) * 1000)
+                    trace.add_tokens(narrative_metrics)
 
                 # Update counter and history
                 save_interaction(user_query,answer)    
                 #update_total_requests()
-                add_to_chat_history(user_query, sql_query, answer)
+                add_to_chat_history(user_query, sql_query, answer,
+                                    truncated=bool(result.get("truncated")))
+
+                trace.add_tokens(sql_metrics)
+                record_question_metrics(trace.finish(
+                    outcome_of(result), row_count=len(result.get("rows", [])),
+                    sql_cache_hit=bool(sql_metrics.get("sql_cache_hit")),
+                    result_cache_hit=bool(sql_metrics.get("result_cache_hit"))))
                 
                 # Reset form
                 st.session_state.form_counter += 1
@@ -268,14 +320,65 @@ with query_container:
         except Exception as e:
             st.error("An error occurred. Please try a different question.")
             logging.error(f"Error in Streamlit app: {e}")
+            trace.add_tokens(sql_metrics)
+            record_question_metrics(trace.finish("error", sql_cache_hit=bool(sql_metrics.get("sql_cache_hit"))))
 
 with st.sidebar:
     st.title("Analytics")
-    success_rate = calculate_success_rate()
-    st.markdown(f"### Query Success Rate: {success_rate:.2f}%")
+    try:
+        question_metrics = get_question_metrics_summary()
+        st.markdown(f"### Query Success Rate: {question_metrics['success_rate']:.2f}%")
+        latency_lines = []
+        for stage, label in (("total", "Total"), ("sql_generation", "SQL generation"),
+                             ("db_execution", "DB execution"), ("narrative", "Narrative")):
+            percentiles = question_metrics["latency_ms"][stage]
+            if percentiles[50] is not None:
+                latency_lines.append(f"{label}: p50 {percentiles[50]:.0f} · p95 {percentiles[95]:.0f} · "
+                                     f"p99 {percentiles[99]:.0f} ms")
+        st.markdown(f"{question_metrics['questions']} questions  \n" + "  \n".join(latency_lines))
+    except Exception as e:
+        logging.error(f"Error reading question metrics: {e}")
+    try:
+        pool_metrics = get_db_pool_metrics()
+        if pool_metrics["backend"] == "sqlite":
+            st.markdown(
+                f"Embedded SQLite: {pool_metrics['queries']} queries · {pool_metrics['timeouts']} timeouts  \n"
+                f"Loaded in {pool_metrics['load_seconds']:.1f}s (generation {pool_metrics['generation']})"
+            )
+        else:
+            st.markdown(
+                f"DB pool: {pool_metrics['in_use']} in use / {pool_metrics['open']} open "
+                f"(max {pool_metrics['max_size']})  \n"
+                f"Avg wait: {pool_metrics['avg_wait_ms']:.1f} ms · "
+                f"Connections created: {pool_metrics['connections_created']} "
+                f"(avg {pool_metrics['avg_create_ms']:.1f} ms)"
+            )
+    except Exception as e:
+        logging.error(f"Error reading DB pool metrics: {e}")
+    cache_metrics = get_result_cache_metrics()
+    st.markdown(
+        f"Result cache: {cache_metrics['hit_rate']:.1f}% hit rate "
+        f"({cache_metrics['entries']} entries, {cache_metrics['bytes'] / 1024:.0f} KB)"
+    )
+    last_narrative = st.session_state.get("last_narrative_metrics")
+    if last_narrative and "time_to_first_token" in last_narrative:
+        st.markdown(
+            f"Last answer: first token after {last_narrative['time_to_first_token']:.2f}s, "
+            f"complete after {last_narrative.get('total_time', 0):.2f}s"
+        )
+    sql_cache_metrics = get_sql_cache_metrics()
+    if sql_cache_metrics:
+        st.markdown(
+            f"SQL cache: {sql_cache_metrics['hit_rate']:.1f}% hit rate "
+            f"({sql_cache_metrics['hits']} hits / {sql_cache_metrics['misses']} misses, "
+            f"{sql_cache_metrics['entries']} questions)"
+        )
 
 # Sidebar Admin Login
 with st.sidebar:
     st.title("Admin Panel")
     if authenticate_admin():
         download_database()
+        if st.sidebar.button("Purge SQL Cache"):
+            purged = purge_sql_cache()
+            st.sidebar.success(f"Purged {purged} cached questions.")
@@ -3,6 +3,8 @@ import pandas as pd
 import json
 from datetime import datetime
 
+from src.utils.columnar_cache import load_table
+
 class DataManager:
     def __init__(self):
         self.data_sources = {}
@@ -20,7 +22,7 @@ class DataManager:
         try:
             # Load data based on type
             if data_type == 'csv':
-                data = pd.read_csv(path)
+                data = load_table(path)
             elif data_type == 'excel':
                 data = pd.read_excel(path)
             else:
@@ -0,0 +1,232 @@
+import csv
+import io
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Sequence
+
+from src.data_manager.partitions import PARTITIONED_TABLES, ensure_partitions_for_staging
+
+logger = logging.getLogger(__name__)
+
+# Natural key of each table: re-loading a file updates these rows instead of duplicating them
+NATURAL_KEYS = {
+    "buildings": ("building_id",),
+    "financials": ("building_id", "date"),
+    "floor_occupancy": ("building_id", "floor"),
+    "floor_utilization": ("building_id", "floor", "time"),
+    "energy_consumption": ("building_id", "floor", "time"),
+}
+
+# Tables whose natural key is already their primary key need no extra unique index
+PRIMARY_KEY_TABLES = {"buildings"}
+
+# Tables referenced by foreign keys load first; each later group loads in parallel
+LOAD_ORDER = [
+    ["buildings"],
+    ["financials", "floor_occupancy", "floor_utilization", "energy_consumption"],
+]
+
+# The repo's CSVs write dates day-first (dd/mm/yyyy); ISO timestamps parse the same either way
+DEFAULT_DATE_STYLE = "ISO, DMY"
+
+
+def normalize_column(name: str) -> str:
+    """'\\ufeffBuilding ID' -> 'building_id', 'Energy Costs (USD)' -> 'energy_costs'"""
+    name = name.replace("﻿", "").strip().lower()
+    name = re.sub(r"\(.*?\)", "", name).strip()
+    return re.sub(r"[^a-z0-9]+", "_", name).strip("_")
+
+
+def read_csv_header(file_obj) -> List[str]:
+    """Read the header line and return normalized column names."""
+    return [normalize_column(column) for column in next(csv.reader([file_obj.readline()]))]
+
+
+def _record_chunks(file_obj, chunk_rows: int) -> Iterable[str]:
+    """
+    Yield blocks of up to chunk_rows CSV records, so memory stays flat for any file size
+
+    A quoted field may hold newlines, so a record ends only at a line break outside quotes: where
+    the record's double quotes so far are balanced (an escaped "" counts twice). The text is passed
+    through unchanged.
+    """
+    chunk, records, quotes = [], 0, 0
+    for line in file_obj:
+        chunk.append(line)
+        quotes += line.count('"')
+        if quotes % 2:
+            continue
+        quotes = 0
+        records += 1
+        if records >= chunk_rows:
+            yield "".join(chunk)
+            chunk, records = [], 0
+    if chunk:
+        yield "".join(chunk)
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def delete_duplicate_keys(cursor, table_name: str) -> int:
+    """
+    Delete all but the newest row (highest id) of each natural key
+
+    Databases loaded by the old to_sql path hold one copy of every row per re-run, which
+    the natural key's unique index cannot be created over.
+
+    :return: Number of rows deleted
+    """
+    keys = ", ".join(_quote(key) for key in NATURAL_KEYS[table_name])
+    cursor.execute(
+        f"DELETE FROM {_quote(table_name)} WHERE id IN ("
+        f"SELECT id FROM (SELECT id, row_number() OVER (PARTITION BY {keys} ORDER BY id DESC) AS copy "
+        f"FROM {_quote(table_name)}) ranked WHERE copy > 1)"
+    )
+    return cursor.rowcount
+
+
+def ensure_natural_key(cursor, table_name: str):
+    """
+    Create the unique index ON CONFLICT needs, for databases set up before it existed
+
+    Duplicate keys left by earlier loads are deleted first, keeping the newest row of each.
+    """
+    if table_name in PRIMARY_KEY_TABLES:
+        return
+    index_name = f"{table_name}_natural_key"
+    cursor.execute("SELECT to_regclass(%s)", (index_name,))
+    if cursor.fetchone()[0] is not None:
+        return
+    removed = delete_duplicate_keys(cursor, table_name)
+    if removed:
+        logger.info(f"Deleted {removed} duplicate rows from {table_name} before creating {index_name}")
+    keys = ", ".join(_quote(key) for key in NATURAL_KEYS[table_name])
+    cursor.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {index_name} ON {_quote(table_name)} ({keys})")
+
+
+def copy_into_staging(cursor, table_name: str, columns: Sequence[str], file_obj, chunk_rows: int) -> str:
+    """
+    COPY a CSV body into a temp table shaped like the target's columns
+
+    :param cursor: psycopg2 cursor
+    :param table_name: Target table
+    :param columns: Target columns in file order
+    :param file_obj: Text file positioned after the header line
+    :param chunk_rows: Records per COPY round trip
+    :return: Staging table name (dropped at commit)
+    """
+    staging = f"staging_{table_name}"
+    column_list = ", ".join(_quote(column) for column in columns)
+    cursor.execute(f"CREATE TEMP TABLE {staging} ON COMMIT DROP AS "
+                   f"SELECT {column_list} FROM {_quote(table_name)} WITH NO DATA")
+    copy_sql = f"COPY {staging} ({column_list}) FROM STDIN WITH (FORMAT csv)"
+    for chunk in _record_chunks(file_obj, chunk_rows):
+        cursor.copy_expert(copy_sql, io.StringIO(chunk))
+    return staging
+
+
+def upsert_from_staging(cursor, table_name: str, staging: str, columns: Sequence[str]) -> int:
+    """
+    Merge staged rows into the target on its natural key
+
+    Duplicate keys inside the file keep their last occurrence; rows whose values
+    did not change are not rewritten.
+
+    :return: Number of rows inserted or updated
+    """
+    keys = NATURAL_KEYS[table_name]
+    column_list = ", ".join(_quote(column) for column in columns)
+    key_list = ", ".join(_quote(key) for key in keys)
+    updates = [column for column in columns if column not in keys]
+
+    if updates:
+        assignments = ", ".join(f"{_quote(column)} = EXCLUDED.{_quote(column)}" for column in updates)
+        changed = " OR ".join(f"{_quote(table_name)}.{_quote(column)} IS DISTINCT FROM EXCLUDED.{_quote(column)}"
+                              for column in updates)
+        conflict = f"DO UPDATE SET {assignments} WHERE {changed}"
+    else:
+        conflict = "DO NOTHING"
+
+    cursor.execute(
+        f"INSERT INTO {_quote(table_name)} ({column_list}) "
+        f"SELECT DISTINCT ON ({key_list}) {column_list} FROM "
+        f"(SELECT *, ctid AS staging_row FROM {staging}) staged "
+        f"ORDER BY {key_list}, staging_row DESC "
+        f"ON CONFLICT ({key_list}) {conflict}"
+    )
+    return cursor.rowcount
+
+
+def bulk_load_csv(connection, file_path: str, table_name: str, chunk_rows: int = 50_000,
+                  date_style: str = DEFAULT_DATE_STYLE) -> Dict[str, float]:
+    """
+    Load one CSV into a table with COPY and an upsert, in a single transaction
+
+    :param connection: psycopg2 connection (or SQLAlchemy raw_connection)
+    :param file_path: CSV with a header row; headers are matched to columns by normalize_column
+    :param table_name: Target table, a key of NATURAL_KEYS
+    :param chunk_rows: Records per COPY round trip
+    :param date_style: PostgreSQL DateStyle used to parse the file's dates
+    :return: {'rows': rows upserted, 'seconds': elapsed}
+    """
+    started = time.perf_counter()
+    cursor = connection.cursor()
+    try:
+        with open(file_path, "r", encoding="utf-8-sig", newline="") as file_obj:
+            columns = read_csv_header(file_obj)
+            cursor.execute("SET LOCAL DateStyle = %s", (date_style,))
+            ensure_natural_key(cursor, table_name)
+            staging = copy_into_staging(cursor, table_name, columns, file_obj, chunk_rows)
+        if table_name in PARTITIONED_TABLES:
+            # PostgreSQL routes each row to its month's partition; make sure those partitions exist
+            ensure_partitions_for_staging(cursor, table_name, staging)
+        rows = upsert_from_staging(cursor, table_name, staging, columns)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"Loaded {file_path} into {table_name}: {rows} rows upserted in {elapsed:.1f}s")
+    return {"rows": rows, "seconds": elapsed}
+
+
+def bulk_load_tables(connect: Callable[[], object], file_paths: Dict[str, str], max_workers: int = 4,
+                     **load_options) -> Dict[str, Dict[str, float]]:
+    """
+    Load several tables, independent tables in parallel
+
+    Follows LOAD_ORDER so referenced tables exist before the rows that point at them.
+    Each worker uses its own connection.
+
+    :param connect: Callable returning a new DB-API connection
+    :param file_paths: Table name -> CSV path
+    :param max_workers: Parallel loads within a group
+    :param load_options: Passed to bulk_load_csv
+    :return: Table name -> stats from bulk_load_csv, or {'error': message}
+    """
+    def load(table_name):
+        connection = connect()
+        try:
+            return bulk_load_csv(connection, file_paths[table_name], table_name, **load_options)
+        except Exception as e:
+            logger.error(f"Error loading data into {table_name}: {e}")
+            return {"error": str(e)}
+        finally:
+            connection.close()
+
+    ordered = [[table for table in group if table in file_paths] for group in LOAD_ORDER]
+    ordered.append([table for table in file_paths if not any(table in group for group in LOAD_ORDER)])
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for group in ordered:
+            for table_name, stats in zip(group, executor.map(load, group)):
+                results[table_name] = stats
+    return results
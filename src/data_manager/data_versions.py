@@ -0,0 +1,65 @@
+import logging
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+# One row per table; loaders bump `version` after every successful load so
+# readers (e.g. the generated-SQL result cache) can tell when data changed.
+CREATE_DATA_VERSIONS_SQL = """
+CREATE TABLE IF NOT EXISTS data_versions (
+    table_name VARCHAR(64) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT now()
+)
+"""
+
+BUMP_DATA_VERSION_SQL = """
+INSERT INTO data_versions (table_name, version, updated_at)
+VALUES (%(table_name)s, 1, now())
+ON CONFLICT (table_name)
+DO UPDATE SET version = data_versions.version + 1, updated_at = now()
+"""
+
+FETCH_DATA_VERSIONS_SQL = "SELECT table_name, version FROM data_versions"
+
+
+def bump_data_version(engine, table_name: str):
+    """
+    Increment the data version of a table
+
+    :param engine: SQLAlchemy engine for the target database
+    :param table_name: Table whose contents changed
+    """
+    with engine.begin() as conn:
+        conn.exec_driver_sql(CREATE_DATA_VERSIONS_SQL)
+        conn.exec_driver_sql(BUMP_DATA_VERSION_SQL, {"table_name": table_name})
+    logger.info(f"Bumped data version for table: {table_name}")
+
+
+def fetch_data_versions(connection) -> Dict[str, int]:
+    """
+    Read all table versions over a DB-API (psycopg2) connection
+
+    :param connection: Open DB-API connection
+    :return: Mapping of table name to version; empty if the table does not exist yet
+    """
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(FETCH_DATA_VERSIONS_SQL)
+            versions = {table: int(version) for table, version in cursor.fetchall()}
+        connection.rollback()
+        return versions
+    except Exception as e:
+        logger.warning(f"Could not read data versions: {e}")
+        connection.rollback()
+        return {}
+
+
+async def fetch_data_versions_async(connection) -> Dict[str, int]:
+    """fetch_data_versions for an asyncpg connection"""
+    try:
+        records = await connection.fetch(FETCH_DATA_VERSIONS_SQL)
+        return {record["table_name"]: int(record["version"]) for record in records}
+    except Exception as e:
+        logger.warning(f"Could not read data versions: {e}")
+        return {}
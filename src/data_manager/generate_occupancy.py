@@ -1,17 +1,31 @@
-import pandas as pd
-import numpy as np
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 
-# Read floor capacities
-floor_capacities_df = pd.read_csv('data/floors_occupancy.csv')
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Optional: only needed for --format parquet
+    pa = None
+    pq = None
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from src.data_manager.bulk_loader import normalize_column
 
 # Common parameters
-start_date = datetime(2024, 1, 1)
-end_date = datetime(2025, 1, 21)
-time_interval = timedelta(minutes=30)
+START_DATE = datetime(2024, 1, 1)
+END_DATE = datetime(2025, 1, 21)
+TIME_INTERVAL = timedelta(minutes=30)
+DEFAULT_SEED = 2024
 
 # Holidays for USA 2024-2025
-holidays = [
+HOLIDAYS = [
     # 2024 Holidays
     datetime(2024, 1, 1),   # New Year's Day
     datetime(2024, 1, 15),  # Martin Luther King Jr. Day
@@ -23,116 +37,192 @@ holidays = [
     datetime(2024, 11, 11), # Veterans Day
     datetime(2024, 11, 28), # Thanksgiving Day
     datetime(2024, 12, 25), # Christmas Day
-    
+
     # 2025 Holidays
     datetime(2025, 1, 1),   # New Year's Day
     datetime(2025, 1, 20),  # Martin Luther King Jr. Day
 ]
 
-def generate_realistic_occupancy(building_id, building_floors, start_date, end_date, 
-                               time_interval, holidays, occupancy_rate):
-    data = []
-    floor_max_capacities = dict(zip(building_floors['Floor'], building_floors['Max Capacity']))
-    
-    current_date = start_date
-    while current_date <= end_date:
-        # Skip weekends and holidays
-        if current_date.weekday() < 5 and current_date not in holidays:
-            # For each floor
-            for floor in building_floors['Floor'].sort_values():
-                # Get all times for this floor
-                for time in pd.date_range(
-                    start=current_date.replace(hour=7, minute=0),
-                    end=current_date.replace(hour=20, minute=0),
-                    freq=time_interval
-                ):
-                    floor_max_cap = floor_max_capacities[floor]
-                    
-                    # Base occupancy calculation
-                    if 6 <= time.hour < 9:  # Morning arrival
-                        base_rate = (time.hour - 6) / 3
-                    elif 9 <= time.hour < 12:  # Peak morning
-                        base_rate = 0.8
-                    elif 12 <= time.hour < 13:  # Lunchtime dip
-                        base_rate = 0.6
-                    elif 13 <= time.hour < 17:  # Afternoon peak
-                        base_rate = 0.9
-                    elif 17 <= time.hour < 20:  # Evening departure
-                        base_rate = (20 - time.hour) / 3
-                    else:  # Late evening
-                        base_rate = 0.05
-
-                    # Calculate floor occupancy
-                    max_floor_occupancy = floor_max_cap * occupancy_rate[floor]
-                    floor_occupancy = int(max_floor_occupancy * base_rate + 
-                                       np.random.randint(-3, 4))
-                    
-                    # Ensure floor occupancy is within bounds
-                    floor_occupancy = max(0, min(floor_occupancy, floor_max_cap))
-
-                    # Format datetime as string
-                    time_str = time.strftime('%d/%m/%Y %H:%M')
-                    
-                    data.append([building_id, floor, time_str, floor_occupancy])
-
-        current_date += timedelta(days=1)
-
-    # Create DataFrame with specific column names
-    return pd.DataFrame(data, columns=["Building ID", "Floor", "Time", "Occupancy"])
-
-# Define building groups (11 buildings per file, except the last one which will have 10)
-building_groups = {
-    1: range(1, 12),    # Buildings 1-11
-    2: range(12, 23),   # Buildings 12-22
-    3: range(23, 34),   # Buildings 23-33
-    4: range(34, 44)    # Buildings 34-43
-}
-
-# Process each group
-for group_num, building_range in building_groups.items():
-    print(f"\nProcessing Group {group_num}...")
-    all_group_data = []
-    
-    for building_number in building_range:
-        building_id = f"B{str(building_number).zfill(3)}"
-        print(f"Processing {building_id}...")
-        
-        # Filter capacities for specific building
-        building_floors = floor_capacities_df[floor_capacities_df['Building ID'] == building_id]
-        
-        if len(building_floors) == 0:
-            print(f"No floor data found for {building_id}, skipping...")
-            continue
-            
-        floors = len(building_floors)
-        employee_capacity = building_floors['Max Capacity'].sum()
-
-        # Generate random occupancy rates for each floor (10% to 100%)
-        occupancy_rate = {floor: np.random.randint(10, 100) / 100 
-                         for floor in building_floors['Floor'].values}
-
-        # Print building details
-        print(f"Number of Floors: {floors}")
-        print(f"Total Building Capacity: {employee_capacity}")
-
-        # Generate data
-        building_data = generate_realistic_occupancy(
-            building_id, building_floors, start_date, end_date, 
-            time_interval, holidays, occupancy_rate
-        )
-        
-        all_group_data.append(building_data)
-    
-    # Combine all buildings in the group and save to a single file
-    if all_group_data:
-        group_data = pd.concat(all_group_data, ignore_index=True)
-        output_filename = f"Building_Group_{group_num}_Occupancy_2024.csv"
-        group_data.to_csv(output_filename, index=False)
-        
-        print(f"\nGroup {group_num} Statistics:")
-        print(f"Total number of records: {len(group_data)}")
-        print(f"Date range: from {group_data['Time'].min()} to {group_data['Time'].max()}")
-        print(f"Number of buildings: {len(group_data['Building ID'].unique())}")
-        print(f"File saved as: {output_filename}")
-
-print("\nAll building groups processed successfully!")
\ No newline at end of file
+# Readings are taken from 7:00 to 20:00 on working days
+FIRST_HOUR = 7
+LAST_HOUR = 20
+
+OUTPUT_COLUMNS = ["Building ID", "Floor", "Time", "Occupancy"]
+
+
+def _base_rate(hour: int) -> float:
+    if 6 <= hour < 9:  # Morning arrival
+        return (hour - 6) / 3
+    elif 9 <= hour < 12:  # Peak morning
+        return 0.8
+    elif 12 <= hour < 13:  # Lunchtime dip
+        return 0.6
+    elif 13 <= hour < 17:  # Afternoon peak
+        return 0.9
+    elif 17 <= hour < 20:  # Evening departure
+        return (20 - hour) / 3
+    else:  # Late evening
+        return 0.05
+
+
+# Share of a floor's occupancy rate present at each hour of the day
+BASE_RATE_BY_HOUR = np.array([_base_rate(hour) for hour in range(24)])
+
+
+def time_grid(start_date, end_date, time_interval, holidays) -> pd.DatetimeIndex:
+    """Reading timestamps: every interval from FIRST_HOUR to LAST_HOUR on weekdays that are not holidays"""
+    days = pd.date_range(start_date, end_date, freq="D")
+    days = days[(days.weekday < 5) & ~days.isin(pd.DatetimeIndex(holidays))]
+    offsets = pd.timedelta_range(timedelta(hours=FIRST_HOUR), timedelta(hours=LAST_HOUR), freq=time_interval)
+    return pd.DatetimeIndex((days.values[:, None] + offsets.values[None, :]).ravel())
+
+
+def generate_realistic_occupancy(building_id, building_floors, times, occupancy_rate, rng, time_labels=None):
+    """
+    Occupancy readings for every floor of a building at every time in the grid
+
+    :param building_id: e.g. "B001"
+    :param building_floors: Rows of floors_occupancy for this building (floor, max_capacity)
+    :param times: DatetimeIndex from time_grid()
+    :param occupancy_rate: Floor -> share of capacity used at peak
+    :param rng: numpy Generator supplying the noise
+    :param time_labels: times formatted as '%d/%m/%Y %H:%M', to format once per group instead of per building
+    :return: DataFrame with OUTPUT_COLUMNS, floor by floor
+    """
+    building_floors = building_floors.sort_values("floor")
+    floors = building_floors["floor"].to_numpy()
+    capacities = building_floors["max_capacity"].to_numpy()
+    rates = np.array([occupancy_rate[floor] for floor in floors])
+    if time_labels is None:
+        time_labels = times.strftime('%d/%m/%Y %H:%M').to_numpy()
+
+    # floors x times: peak occupancy of the floor scaled by the hour's curve, plus integer noise
+    base = BASE_RATE_BY_HOUR[times.hour.to_numpy()]
+    noise = rng.integers(-3, 4, size=(len(floors), len(times)))
+    occupancy = np.trunc(np.outer(capacities * rates, base) + noise).astype(np.int64)
+    occupancy = np.clip(occupancy, 0, capacities[:, None])
+
+    return pd.DataFrame({
+        "Building ID": building_id,
+        "Floor": np.repeat(floors, len(times)),
+        "Time": np.tile(time_labels, len(floors)),
+        "Occupancy": occupancy.ravel(),
+    }, columns=OUTPUT_COLUMNS)
+
+
+class ChunkWriter:
+    def __init__(self, path: str, file_format: str = "csv"):
+        """
+        Append DataFrame chunks to one CSV or Parquet file without holding the whole dataset
+
+        :param path: Output file
+        :param file_format: "csv" or "parquet" (needs pyarrow)
+        """
+        if file_format == "parquet" and pq is None:
+            raise ImportError("pyarrow is required for Parquet output")
+        self.path = path
+        self.file_format = file_format
+        self.rows = 0
+        self._parquet_writer = None
+
+    def write(self, chunk: pd.DataFrame):
+        if self.file_format == "parquet":
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.path, table.schema)
+            self._parquet_writer.write_table(table)
+        else:
+            chunk.to_csv(self.path, mode="w" if self.rows == 0 else "a", header=self.rows == 0, index=False)
+        self.rows += len(chunk)
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_floor_capacities(path: str) -> pd.DataFrame:
+    """floors_occupancy.csv with snake_case columns, whichever header style the file uses"""
+    floor_capacities_df = pd.read_csv(path, encoding="utf-8-sig")
+    return floor_capacities_df.rename(columns=normalize_column)
+
+
+def generate_group(group_num, building_ids, floor_capacities_df, times, output_path, file_format, seed):
+    """
+    Generate one building group's file, writing each building as it is produced
+
+    Each building draws from its own generator seeded with (seed, building number), so
+    its readings do not depend on how buildings are grouped or which process runs them.
+
+    :return: Group statistics
+    """
+    time_labels = times.strftime('%d/%m/%Y %H:%M').to_numpy()
+    buildings = 0
+    with ChunkWriter(output_path, file_format) as writer:
+        for building_id in building_ids:
+            building_floors = floor_capacities_df[floor_capacities_df["building_id"] == building_id]
+            if len(building_floors) == 0:
+                print(f"No floor data found for {building_id}, skipping...")
+                continue
+
+            rng = np.random.default_rng([seed, int(building_id.lstrip("B"))])
+            # Generate random occupancy rates for each floor (10% to 100%)
+            occupancy_rate = {floor: rng.integers(10, 100) / 100 for floor in building_floors["floor"].values}
+            writer.write(generate_realistic_occupancy(building_id, building_floors, times, occupancy_rate, rng,
+                                                      time_labels))
+            buildings += 1
+
+    return {"group": group_num, "path": output_path, "rows": writer.rows, "buildings": buildings}
+
+
+def building_groups(building_ids, group_size):
+    """Split building ids into consecutive groups of group_size, numbered from 1"""
+    return {index // group_size + 1: building_ids[index:index + group_size]
+            for index in range(0, len(building_ids), group_size)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic floor occupancy readings")
+    parser.add_argument("--capacities", default="data/floors_occupancy.csv")
+    parser.add_argument("--output-dir", default=".")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--group-size", type=int, default=11, help="Buildings per output file")
+    parser.add_argument("--start", type=datetime.fromisoformat, default=START_DATE)
+    parser.add_argument("--end", type=datetime.fromisoformat, default=END_DATE)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    # Read floor capacities
+    floor_capacities_df = read_floor_capacities(args.capacities)
+    building_ids = sorted(floor_capacities_df["building_id"].unique())
+    times = time_grid(args.start, args.end, TIME_INTERVAL, HOLIDAYS)
+    extension = "parquet" if args.format == "parquet" else "csv"
+
+    # Process each group in its own worker
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = [
+            executor.submit(generate_group, group_num, list(ids), floor_capacities_df, times,
+                            os.path.join(args.output_dir, f"Building_Group_{group_num}_Occupancy_{args.start.year}.{extension}"),
+                            args.format, args.seed)
+            for group_num, ids in building_groups(building_ids, args.group_size).items()
+        ]
+        for future in futures:
+            stats = future.result()
+            print(f"\nGroup {stats['group']} Statistics:")
+            print(f"Total number of records: {stats['rows']}")
+            print(f"Number of buildings: {stats['buildings']}")
+            print(f"File saved as: {stats['path']}")
+
+    print(f"\nDate range: from {times.min()} to {times.max()}")
+    print("\nAll building groups processed successfully!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from src.data_manager.generate_occupancy import (BASE_RATE_BY_HOUR, DEFAULT_SEED, END_DATE, HOLIDAYS, START_DATE,
+                                                 TIME_INTERVAL, ChunkWriter, building_groups,
+                                                 generate_realistic_occupancy, time_grid)
+
+# The real portfolio; scale factor 1 reproduces it, larger factors add perturbed copies
+TEMPLATE_DIR = "data"
+BUILDINGS_FILE = "Buildings.csv"
+FINANCIALS_FILE = "Financial_Data.csv"
+FLOORS_FILE = "floors_occupancy.csv"
+
+FINANCIAL_COST_COLUMNS = ["lease_cost", "total_operating_expense", "energy_costs", "utilities_costs",
+                          "maintenance_costs", "catering_costs", "cleaning_costs", "security_costs",
+                          "insurance_costs", "waste_disposal_costs", "other_costs"]
+
+ENERGY_COLUMNS = ["Building ID", "Floor", "Time", "Energy"]
+
+# Energy per reading interval (kWh per sq ft): always-on load, load that follows the working day, and per person
+BASE_KWH_PER_SQFT = 0.0004
+DAYTIME_KWH_PER_SQFT = 0.0006
+KWH_PER_OCCUPANT = 0.02
+
+
+def read_templates(template_dir: str = TEMPLATE_DIR):
+    """Buildings, financials and floor capacities of the real portfolio"""
+    # keep_default_na: region "NA" (North America) is a value, not a missing one
+    buildings = pd.read_csv(os.path.join(template_dir, BUILDINGS_FILE), encoding="utf-8-sig", keep_default_na=False)
+    financials = pd.read_csv(os.path.join(template_dir, FINANCIALS_FILE), encoding="utf-8-sig")
+    floors = pd.read_csv(os.path.join(template_dir, FLOORS_FILE), encoding="utf-8-sig")
+    return buildings, financials, floors
+
+
+def building_id_for(number: int) -> str:
+    return f"B{number:03d}"
+
+
+def scale_portfolio(buildings, financials, floors, scale_factor: float, seed: int = DEFAULT_SEED):
+    """
+    Portfolio of round(scale_factor * len(buildings)) buildings
+
+    Building n is a copy of template (n - 1) % len(buildings). The first copy of each template is the
+    template itself; later copies get a perturbed size, which scales their floor capacities, employee
+    capacity and costs, and noise on every monthly cost.
+
+    :return: (buildings, financials, floors) DataFrames with the template files' columns
+    """
+    count = max(1, round(scale_factor * len(buildings)))
+    rng = np.random.default_rng([seed, 0])
+    financials_by_building = dict(tuple(financials.groupby("building_id", sort=False)))
+    floors_by_building = dict(tuple(floors.groupby("building_id", sort=False)))
+
+    new_buildings, new_financials, new_floors = [], [], []
+    for index in range(count):
+        template = buildings.iloc[index % len(buildings)]
+        replica = index // len(buildings)
+        building_id = building_id_for(index + 1)
+        ratio = 1.0 if replica == 0 else rng.uniform(0.6, 1.6)
+
+        building = template.copy()
+        building["building_id"] = building_id
+        if replica:
+            building["address"] = f"{template['address']} #{replica + 1}"
+            building["size"] = round(template["size"] * ratio)
+            building["employee_capacity"] = round(template["employee_capacity"] * ratio)
+            building["market_rate"] = round(template["market_rate"] * rng.uniform(0.85, 1.15))
+        new_buildings.append(building)
+
+        building_floors = floors_by_building.get(template["building_id"])
+        if building_floors is not None:
+            building_floors = building_floors.assign(building_id=building_id)
+            if replica:
+                building_floors["max_capacity"] = np.maximum(1, np.round(building_floors["max_capacity"] * ratio)
+                                                             ).astype(int)
+            new_floors.append(building_floors)
+
+        building_financials = financials_by_building.get(template["building_id"])
+        if building_financials is not None:
+            building_financials = building_financials.assign(building_id=building_id)
+            if replica:
+                noise = rng.lognormal(0, 0.05, size=(len(building_financials), len(FINANCIAL_COST_COLUMNS)))
+                costs = building_financials[FINANCIAL_COST_COLUMNS].to_numpy() * ratio * noise
+                building_financials[FINANCIAL_COST_COLUMNS] = np.round(costs).astype(int)
+            new_financials.append(building_financials)
+
+    return (pd.DataFrame(new_buildings, columns=buildings.columns),
+            pd.concat(new_financials, ignore_index=True) if new_financials else financials.iloc[0:0],
+            pd.concat(new_floors, ignore_index=True) if new_floors else floors.iloc[0:0])
+
+
+def generate_energy(occupancy: pd.DataFrame, times: pd.DatetimeIndex, floor_area: float, rng) -> pd.DataFrame:
+    """
+    Energy readings (kWh per interval) matching a building's occupancy readings
+
+    :param occupancy: generate_realistic_occupancy output for one building
+    :param times: The time grid the occupancy was generated on
+    :param floor_area: Sq ft per floor
+    :param rng: numpy Generator supplying the noise
+    """
+    daytime = np.tile(BASE_RATE_BY_HOUR[times.hour.to_numpy()], len(occupancy) // len(times))
+    energy = (floor_area * (BASE_KWH_PER_SQFT + DAYTIME_KWH_PER_SQFT * daytime)
+              + KWH_PER_OCCUPANT * occupancy["Occupancy"].to_numpy())
+    energy *= rng.normal(1.0, 0.05, size=len(energy))
+    return pd.DataFrame({"Building ID": occupancy["Building ID"], "Floor": occupancy["Floor"],
+                         "Time": occupancy["Time"], "Energy": np.round(np.maximum(energy, 0), 2)},
+                        columns=ENERGY_COLUMNS)
+
+
+def generate_readings_group(group_num, building_ids, floors, floor_areas, times, output_dir, file_format, seed):
+    """
+    Write one group's occupancy and energy files, building by building
+
+    :return: Group statistics
+    """
+    time_labels = times.strftime('%d/%m/%Y %H:%M').to_numpy()
+    extension = "parquet" if file_format == "parquet" else "csv"
+    year = times[0].year if len(times) else START_DATE.year
+    occupancy_path = os.path.join(output_dir, f"Building_Group_{group_num}_Occupancy_{year}.{extension}")
+    energy_path = os.path.join(output_dir, f"Building_Group_{group_num}_Energy_{year}.{extension}")
+
+    with ChunkWriter(occupancy_path, file_format) as occupancy_writer, \
+            ChunkWriter(energy_path, file_format) as energy_writer:
+        for building_id in building_ids:
+            building_floors = floors[floors["building_id"] == building_id]
+            if len(building_floors) == 0:
+                continue
+            number = int(building_id.lstrip("B"))
+            rng = np.random.default_rng([seed, number])
+            occupancy_rate = {floor: rng.integers(10, 100) / 100 for floor in building_floors["floor"].values}
+            occupancy = generate_realistic_occupancy(building_id, building_floors, times, occupancy_rate, rng,
+                                                     time_labels)
+            occupancy_writer.write(occupancy)
+            energy_writer.write(generate_energy(occupancy, times, floor_areas[building_id],
+                                                np.random.default_rng([seed, 2, number])))
+
+    return {"group": group_num, "rows": occupancy_writer.rows, "paths": [occupancy_path, energy_path]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic portfolio at a scale factor of the real one")
+    parser.add_argument("--scale-factor", type=float, default=1.0,
+                        help="Portfolio size relative to data/Buildings.csv (100 -> 4,300 buildings)")
+    parser.add_argument("--output-dir", required=True)
+    parser.add_argument("--template-dir", default=TEMPLATE_DIR)
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv",
+                        help="Format of the occupancy/energy readings")
+    parser.add_argument("--group-size", type=int, default=50, help="Buildings per readings file")
+    parser.add_argument("--start", type=datetime.fromisoformat, default=START_DATE)
+    parser.add_argument("--end", type=datetime.fromisoformat, default=END_DATE)
+    parser.add_argument("--no-readings", action="store_true", help="Only write buildings, financials and floors")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    buildings, financials, floors = scale_portfolio(*read_templates(args.template_dir), args.scale_factor, args.seed)
+
+    # Same file names and headers as the real data, so the loaders take either directory
+    buildings.to_csv(os.path.join(args.output_dir, BUILDINGS_FILE), index=False)
+    financials.to_csv(os.path.join(args.output_dir, FINANCIALS_FILE), index=False)
+    floors.to_csv(os.path.join(args.output_dir, FLOORS_FILE), index=False)
+    print(f"Buildings: {len(buildings)}, financial rows: {len(financials)}, floors: {len(floors)}")
+
+    if args.no_readings:
+        return
+
+    times = time_grid(args.start, args.end, TIME_INTERVAL, HOLIDAYS)
+    floor_counts = floors.groupby("building_id").size()
+    floor_areas = (buildings.set_index("building_id")["size"] / floor_counts).fillna(0).to_dict()
+    groups = building_groups(list(buildings["building_id"]), args.group_size)
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = [
+            executor.submit(generate_readings_group, group_num, ids,
+                            floors[floors["building_id"].isin(ids)], floor_areas, times,
+                            args.output_dir, args.format, args.seed)
+            for group_num, ids in groups.items()
+        ]
+        total_rows = 0
+        for future in futures:
+            stats = future.result()
+            total_rows += stats["rows"]
+            print(f"Group {stats['group']}: {stats['rows']} readings -> {', '.join(stats['paths'])}")
+
+    print(f"Occupancy and energy readings: {total_rows} each, from {times.min()} to {times.max()}")
+
+
+if __name__ == "__main__":
+    main()
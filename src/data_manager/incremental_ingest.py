@@ -0,0 +1,198 @@
+import hashlib
+import logging
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.data_manager.bulk_loader import (DEFAULT_DATE_STYLE, copy_into_staging, ensure_natural_key,
+                                          read_csv_header, upsert_from_staging)
+from src.data_manager.partitions import PARTITIONED_TABLES, ensure_partitions
+
+logger = logging.getLogger(__name__)
+
+# Time-series tables appended past a per-(building, floor) watermark; everything else is upserted
+WATERMARKED_TABLES = {"floor_utilization", "energy_consumption"}
+
+# Bookkeeping: newest reading loaded per (table, building, floor), and the last loaded hash of each file
+CREATE_BOOKKEEPING_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS ingest_watermarks (
+        table_name VARCHAR(64) NOT NULL,
+        building_id VARCHAR(10) NOT NULL,
+        floor INTEGER NOT NULL,
+        max_time TIMESTAMP NOT NULL,
+        updated_at TIMESTAMP NOT NULL DEFAULT now(),
+        PRIMARY KEY (table_name, building_id, floor)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS ingested_files (
+        file_path TEXT PRIMARY KEY,
+        table_name VARCHAR(64) NOT NULL,
+        content_hash CHAR(64) NOT NULL,
+        rows_loaded BIGINT NOT NULL,
+        loaded_at TIMESTAMP NOT NULL DEFAULT now()
+    )
+    """,
+]
+
+
+def file_hash(file_path: str, block_size: int = 1 << 20) -> str:
+    """SHA-256 of a file's contents, read in blocks"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file_obj:
+        for block in iter(lambda: file_obj.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def ensure_bookkeeping(cursor):
+    for statement in CREATE_BOOKKEEPING_SQL:
+        cursor.execute(statement)
+
+
+def loaded_hash(cursor, file_path: str) -> Optional[str]:
+    cursor.execute("SELECT content_hash FROM ingested_files WHERE file_path = %s", (file_path,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def append_past_watermarks(cursor, table_name: str, staging: str, columns: List[str]) -> int:
+    """
+    Insert only staged readings newer than their (building, floor) watermark, then advance the watermarks
+
+    Readings at or before the watermark are treated as already loaded, so corrections to
+    old readings need a full (non-incremental) load.
+
+    :return: Number of rows inserted
+    """
+    target_columns = ", ".join(f'"{column}"' for column in columns)
+    column_list = ", ".join(f's."{column}"' for column in columns)
+    newer = (f"FROM {staging} s LEFT JOIN ingest_watermarks w "
+             f"ON w.table_name = %(table_name)s AND w.building_id = s.building_id AND w.floor = s.floor "
+             f"WHERE w.max_time IS NULL OR s.time > w.max_time")
+
+    if table_name in PARTITIONED_TABLES:
+        cursor.execute(f"SELECT MIN(s.time), MAX(s.time) {newer}", {"table_name": table_name})
+        start, end = cursor.fetchone()
+        if start is None:
+            return 0
+        ensure_partitions(cursor, table_name, start, end)
+
+    cursor.execute(
+        f"INSERT INTO {table_name} ({target_columns}) SELECT {column_list} {newer} "
+        f"ON CONFLICT (building_id, floor, time) DO NOTHING",
+        {"table_name": table_name})
+    rows = cursor.rowcount
+
+    cursor.execute(
+        f"""INSERT INTO ingest_watermarks (table_name, building_id, floor, max_time, updated_at)
+            SELECT %(table_name)s, building_id, floor, MAX(time), now() FROM {staging}
+            GROUP BY building_id, floor
+            ON CONFLICT (table_name, building_id, floor)
+            DO UPDATE SET max_time = GREATEST(ingest_watermarks.max_time, EXCLUDED.max_time),
+                          updated_at = now()""",
+        {"table_name": table_name})
+    return rows
+
+
+def incremental_load_csv(connection, file_path: str, table_name: str, chunk_rows: int = 50_000,
+                         date_style: str = DEFAULT_DATE_STYLE) -> Dict[str, float]:
+    """
+    Load one CSV unless it is unchanged since its last successful load
+
+    Watermarked tables only receive readings newer than what is already loaded; other
+    tables are upserted on their natural key. The data, watermarks and file hash are
+    committed together, so a failed load is retried in full next run.
+
+    :param connection: psycopg2 connection (or SQLAlchemy raw_connection)
+    :param file_path: CSV with a header row
+    :param table_name: Target table
+    :param chunk_rows: Lines per COPY round trip
+    :param date_style: PostgreSQL DateStyle used to parse the file's dates
+    :return: {'rows': rows added or changed, 'skipped': True if the file was unchanged, 'seconds': elapsed}
+    """
+    started = time.perf_counter()
+    content_hash = file_hash(file_path)
+    key = os.path.abspath(file_path)
+    cursor = connection.cursor()
+    try:
+        ensure_bookkeeping(cursor)
+        if loaded_hash(cursor, key) == content_hash:
+            connection.commit()
+            logger.info(f"Skipped unchanged file {file_path}")
+            return {"rows": 0, "skipped": True, "seconds": time.perf_counter() - started}
+
+        with open(file_path, "r", encoding="utf-8-sig", newline="") as file_obj:
+            columns = read_csv_header(file_obj)
+            cursor.execute("SET LOCAL DateStyle = %s", (date_style,))
+            ensure_natural_key(cursor, table_name)
+            staging = copy_into_staging(cursor, table_name, columns, file_obj, chunk_rows)
+
+        if table_name in WATERMARKED_TABLES:
+            rows = append_past_watermarks(cursor, table_name, staging, columns)
+        else:
+            rows = upsert_from_staging(cursor, table_name, staging, columns)
+
+        cursor.execute(
+            """INSERT INTO ingested_files (file_path, table_name, content_hash, rows_loaded, loaded_at)
+               VALUES (%s, %s, %s, %s, now())
+               ON CONFLICT (file_path) DO UPDATE SET table_name = EXCLUDED.table_name,
+                   content_hash = EXCLUDED.content_hash, rows_loaded = EXCLUDED.rows_loaded, loaded_at = now()""",
+            (key, table_name, content_hash, rows))
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"Incrementally loaded {file_path} into {table_name}: {rows} rows in {elapsed:.1f}s")
+    return {"rows": rows, "skipped": False, "seconds": elapsed}
+
+
+def incremental_load_files(connect: Callable[[], object], files: List[Tuple[str, str]], max_workers: int = 4,
+                           **load_options) -> Dict[str, Dict[str, float]]:
+    """
+    Incrementally load (table, path) pairs
+
+    Files for the same table load one after another so their watermarks and partitions
+    never race; different tables load in parallel. Buildings load first since the
+    other tables reference them.
+
+    :param connect: Callable returning a new DB-API connection
+    :param files: (table name, CSV path) pairs, in load order per table
+    :param max_workers: Tables loaded at once
+    :param load_options: Passed to incremental_load_csv
+    :return: CSV path -> stats from incremental_load_csv (plus 'table'), or {'table', 'error'}
+    """
+    by_table = defaultdict(list)
+    for table_name, file_path in files:
+        by_table[table_name].append(file_path)
+
+    def load(table_name):
+        results = {}
+        connection = connect()
+        try:
+            for file_path in by_table[table_name]:
+                try:
+                    stats = incremental_load_csv(connection, file_path, table_name, **load_options)
+                except Exception as e:
+                    logger.error(f"Error loading {file_path} into {table_name}: {e}")
+                    stats = {"error": str(e)}
+                results[file_path] = dict(stats, table=table_name)
+        finally:
+            connection.close()
+        return results
+
+    groups = [[table for table in by_table if table == "buildings"],
+              [table for table in by_table if table != "buildings"]]
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for group in groups:
+            for table_results in executor.map(load, group):
+                results.update(table_results)
+    return results
@@ -0,0 +1,91 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Grain -> materialized view. Each level is built from the one before it, so
+# they must be created and refreshed in this order.
+ROLLUP_VIEWS = {
+    "hour": "floor_utilization_hourly",
+    "day": "floor_utilization_daily",
+    "month": "floor_utilization_monthly",
+}
+
+_CAPACITY_SQL = """
+    SELECT building_id, floor, MAX(max_capacity) AS max_capacity
+    FROM floor_occupancy
+    GROUP BY building_id, floor
+"""
+
+_HOURLY_SQL = f"""
+SELECT fu.building_id,
+       fu.floor,
+       date_trunc('hour', fu.time) AS period_start,
+       SUM(fu.occupancy) AS occupancy_sum,
+       AVG(fu.occupancy) AS occupancy_avg,
+       MAX(fu.occupancy) AS occupancy_max,
+       MIN(fu.occupancy) AS occupancy_min,
+       COUNT(*) AS reading_count,
+       cap.max_capacity,
+       AVG(fu.occupancy) * 100.0 / NULLIF(cap.max_capacity, 0) AS utilization_avg_pct
+FROM floor_utilization fu
+LEFT JOIN ({_CAPACITY_SQL}) cap ON cap.building_id = fu.building_id AND cap.floor = fu.floor
+GROUP BY fu.building_id, fu.floor, date_trunc('hour', fu.time), cap.max_capacity
+"""
+
+
+def _coarser_rollup_sql(grain: str, source_view: str) -> str:
+    """Roll a finer view up to `grain` by re-aggregating its sums and counts."""
+    return f"""
+SELECT building_id,
+       floor,
+       date_trunc('{grain}', period_start) AS period_start,
+       SUM(occupancy_sum) AS occupancy_sum,
+       SUM(occupancy_sum)::numeric / NULLIF(SUM(reading_count), 0) AS occupancy_avg,
+       MAX(occupancy_max) AS occupancy_max,
+       MIN(occupancy_min) AS occupancy_min,
+       SUM(reading_count) AS reading_count,
+       max_capacity,
+       SUM(occupancy_sum) * 100.0 / NULLIF(SUM(reading_count) * max_capacity, 0) AS utilization_avg_pct
+FROM {source_view}
+GROUP BY building_id, floor, date_trunc('{grain}', period_start), max_capacity
+"""
+
+
+ROLLUP_DEFINITIONS = {
+    ROLLUP_VIEWS["hour"]: _HOURLY_SQL,
+    ROLLUP_VIEWS["day"]: _coarser_rollup_sql("day", ROLLUP_VIEWS["hour"]),
+    ROLLUP_VIEWS["month"]: _coarser_rollup_sql("month", ROLLUP_VIEWS["day"]),
+}
+
+
+def create_rollups(engine):
+    """
+    Create the occupancy rollup materialized views and their unique indexes
+
+    The unique (building_id, floor, period_start) index is what allows
+    REFRESH MATERIALIZED VIEW CONCURRENTLY.
+
+    :param engine: SQLAlchemy engine for the target database
+    """
+    with engine.begin() as conn:
+        for view_name, definition in ROLLUP_DEFINITIONS.items():
+            conn.exec_driver_sql(f"CREATE MATERIALIZED VIEW IF NOT EXISTS {view_name} AS {definition} WITH DATA")
+            conn.exec_driver_sql(
+                f"CREATE UNIQUE INDEX IF NOT EXISTS {view_name}_key "
+                f"ON {view_name} (building_id, floor, period_start)"
+            )
+    logger.info(f"Occupancy rollups ready: {list(ROLLUP_DEFINITIONS)}")
+
+
+def refresh_rollups(engine, concurrently: bool = True):
+    """
+    Refresh every rollup, finest grain first
+
+    :param engine: SQLAlchemy engine for the target database
+    :param concurrently: Keep the views readable while refreshing
+    """
+    mode = "CONCURRENTLY " if concurrently else ""
+    with engine.begin() as conn:
+        for view_name in ROLLUP_DEFINITIONS:
+            conn.exec_driver_sql(f"REFRESH MATERIALIZED VIEW {mode}{view_name}")
+    logger.info("Occupancy rollups refreshed")
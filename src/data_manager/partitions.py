@@ -0,0 +1,98 @@
+import logging
+from datetime import date, datetime
+from typing import Iterator, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# Tables range-partitioned by month -> partition key column
+PARTITIONED_TABLES = {
+    "floor_utilization": "time",
+    "energy_consumption": "time",
+}
+
+# Months of empty partitions kept ahead of today by the maintenance routine
+DEFAULT_MONTHS_AHEAD = 3
+
+
+def month_start(value: Union[date, datetime]) -> date:
+    return date(value.year, value.month, 1)
+
+
+def next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def iter_months(start: Union[date, datetime], end: Union[date, datetime]) -> Iterator[date]:
+    """First day of every month from start's month through end's month, inclusive"""
+    month = month_start(start)
+    while month <= month_start(end):
+        yield month
+        month = next_month(month)
+
+
+def partition_name(table_name: str, month: date) -> str:
+    """floor_utilization, 2024-03-01 -> floor_utilization_y2024m03"""
+    return f"{table_name}_y{month.year}m{month.month:02d}"
+
+
+def partition_statements(table_name: str, start: Union[date, datetime], end: Union[date, datetime]) -> List[str]:
+    """
+    DDL creating the monthly partitions of a table that cover start..end
+
+    Indexes declared on the parent are created on each new partition automatically.
+
+    :param table_name: A key of PARTITIONED_TABLES
+    :param start: Earliest timestamp to cover
+    :param end: Latest timestamp to cover
+    :return: CREATE TABLE IF NOT EXISTS ... PARTITION OF statements
+    """
+    if table_name not in PARTITIONED_TABLES:
+        raise ValueError(f"Table is not partitioned: {table_name}")
+    return [
+        f"CREATE TABLE IF NOT EXISTS {partition_name(table_name, month)} PARTITION OF {table_name} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month(month).isoformat()}')"
+        for month in iter_months(start, end)
+    ]
+
+
+def ensure_partitions(cursor, table_name: str, start: Union[date, datetime], end: Union[date, datetime]):
+    """
+    Create any missing monthly partitions of a table for start..end
+
+    :param cursor: DB-API cursor; runs inside the caller's transaction
+    :param table_name: A key of PARTITIONED_TABLES
+    :param start: Earliest timestamp to cover
+    :param end: Latest timestamp to cover
+    """
+    for statement in partition_statements(table_name, start, end):
+        cursor.execute(statement)
+
+
+def ensure_partitions_for_staging(cursor, table_name: str, staging: str):
+    """Create the partitions needed for the rows staged for a table, so the upsert never finds no partition."""
+    column = PARTITIONED_TABLES[table_name]
+    cursor.execute(f'SELECT MIN("{column}"), MAX("{column}") FROM {staging}')
+    start, end = cursor.fetchone()
+    if start is not None:
+        ensure_partitions(cursor, table_name, start, end)
+
+
+def create_future_partitions(engine, months_ahead: int = DEFAULT_MONTHS_AHEAD, start: Optional[date] = None):
+    """
+    Maintenance: make sure every partitioned table has partitions from `start` through `months_ahead` months out
+
+    Safe to run repeatedly (e.g. from a monthly cron job).
+
+    :param engine: SQLAlchemy engine for the target database
+    :param months_ahead: Months after the current one to pre-create
+    :param start: First month to cover, default the current month
+    """
+    start = month_start(start or date.today())
+    end = start
+    for _ in range(months_ahead):
+        end = next_month(end)
+    with engine.begin() as conn:
+        for table_name in PARTITIONED_TABLES:
+            for statement in partition_statements(table_name, start, end):
+                conn.exec_driver_sql(statement)
+    logger.info(f"Partitions ready for {list(PARTITIONED_TABLES)} through {end.isoformat()}")
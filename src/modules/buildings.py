@@ -1,8 +1,14 @@
 import pandas as pd
 import numpy as np
 import re
+from collections import OrderedDict
 from typing import Dict, Any, List, Optional
 
+# Columns find_buildings filters by value, each kept as categorical codes with a bitmap per queried value
+INDEXED_COLUMNS = ['Location', 'Purpose', 'Ownership Type', 'LEED Certified']
+# find_buildings results kept per criteria
+SEARCH_CACHE_SIZE = 256
+
 class BuildingsModule:
     def __init__(self, dataframe: pd.DataFrame):
         """
@@ -13,6 +19,7 @@ class BuildingsModule:
         self._validate_dataframe(dataframe)
         self.data = dataframe
         self._preprocess_data()
+        self._build_indexes()
     
     def _validate_dataframe(self, dataframe: pd.DataFrame):
         """
@@ -61,6 +68,53 @@ class BuildingsModule:
         
         # Ownership type standardization
         self.data['Ownership Type'] = self.data['Ownership'].apply(self._categorize_ownership)
+
+        # LEED certification as a boolean ('Checked' in the source data)
+        if not pd.api.types.is_bool_dtype(self.data['LEED Certified']):
+            self.data['LEED Certified'] = self.data['LEED Certified'].fillna('').astype(str).str.lower() == 'checked'
+
+    def _build_indexes(self):
+        """
+        Row position of each Building ID, and categorical codes of the INDEXED_COLUMNS
+
+        Criteria are answered by intersecting boolean bitmaps of the matching rows. A value's bitmap is
+        built from the codes the first time it is asked for; substring criteria only scan the distinct values.
+        """
+        self._row_by_id = {}
+        for position, building_id in enumerate(self.data['Building ID']):
+            self._row_by_id.setdefault(building_id, position)
+
+        self._codes = {}
+        self._categories = {}
+        self._bitmaps = {}
+        for column in INDEXED_COLUMNS:
+            codes, categories = pd.factorize(self.data[column])
+            self._codes[column] = codes
+            self._categories[column] = pd.Series(categories)
+
+        self._sizes = self.data['Size'].to_numpy()
+        self._avg_size = self.data['Size'].mean()
+        self._avg_age = self.data['Building Age'].mean()
+        self._search_cache = OrderedDict()
+
+    def _codes_bitmap(self, column: str, codes: np.ndarray) -> np.ndarray:
+        """Rows whose column has one of the category codes"""
+        if len(codes) == 1:
+            key = (column, int(codes[0]))
+            if key not in self._bitmaps:
+                self._bitmaps[key] = self._codes[column] == codes[0]
+            return self._bitmaps[key]
+        return np.isin(self._codes[column], codes)
+
+    def _value_bitmap(self, column: str, value: Any) -> np.ndarray:
+        """Rows whose column equals value"""
+        return self._codes_bitmap(column, np.flatnonzero(self._categories[column] == value))
+
+    def _contains_bitmap(self, column: str, pattern: str) -> np.ndarray:
+        """Rows whose column contains pattern, ignoring case, as Series.str.contains matches it"""
+        categories = self._categories[column]
+        matches = categories.astype(str).str.contains(pattern, case=False) & categories.notna()
+        return self._codes_bitmap(column, np.flatnonzero(matches))
     
     def _categorize_ownership(self, ownership: str) -> str:
         """
@@ -91,10 +145,6 @@ class BuildingsModule:
         :return: Dictionary of portfolio-wide insights
         """
         
-       # Convert 'LEED Certified' to boolean
-        self.data['LEED Certified'] = self.data['LEED Certified'].fillna('').astype(str).str.lower() == 'checked'
-    
-
         return {
             'total_buildings': len(self.data),
             'total_portfolio_size': self.data['Size'].sum(),
@@ -117,40 +167,48 @@ class BuildingsModule:
         :param criteria: Dictionary of search criteria
         :return: Filtered DataFrame of matching buildings
         """
-        filtered_data = self.data.copy()
-        
+        try:
+            key = tuple(sorted(criteria.items()))
+            positions = self._search_cache.get(key)
+        except TypeError:  # Unhashable criteria values are searched without caching
+            key, positions = None, None
+
+        if positions is None:
+            positions = self._search(criteria)
+            if key is not None:
+                self._search_cache[key] = positions
+                if len(self._search_cache) > SEARCH_CACHE_SIZE:
+                    self._search_cache.popitem(last=False)
+        elif key is not None:
+            self._search_cache.move_to_end(key)
+
+        return self.data.iloc[positions]
+
+    def _search(self, criteria: Dict[str, Any]) -> np.ndarray:
+        """Row positions matching every criterion, from the intersection of their bitmaps"""
+        mask = np.ones(len(self.data), dtype=bool)
+
         # Location filtering
         if 'location' in criteria:
-            filtered_data = filtered_data[
-                filtered_data['Location'].str.contains(criteria['location'], case=False)
-            ]
-        
+            mask &= self._contains_bitmap('Location', criteria['location'])
+
         # Size range filtering
         if 'min_size' in criteria and 'max_size' in criteria:
-            filtered_data = filtered_data[
-                (filtered_data['Size'] >= criteria['min_size']) & 
-                (filtered_data['Size'] <= criteria['max_size'])
-            ]
-        
+            mask &= (self._sizes >= criteria['min_size']) & (self._sizes <= criteria['max_size'])
+
         # Ownership type filtering
         if 'ownership_type' in criteria:
-            filtered_data = filtered_data[
-                filtered_data['Ownership Type'] == criteria['ownership_type']
-            ]
-        
+            mask &= self._value_bitmap('Ownership Type', criteria['ownership_type'])
+
         # Purpose filtering
         if 'purpose' in criteria:
-            filtered_data = filtered_data[
-                filtered_data['Purpose'].str.contains(criteria['purpose'], case=False)
-            ]
-        
+            mask &= self._contains_bitmap('Purpose', criteria['purpose'])
+
         # LEED certification filtering
         if 'leed_certified' in criteria:
-            filtered_data = filtered_data[
-                filtered_data['LEED Certified'] == criteria['leed_certified']
-            ]
-        
-        return filtered_data
+            mask &= self._value_bitmap('LEED Certified', criteria['leed_certified'])
+
+        return np.flatnonzero(mask)
     
     def generate_building_profile(self, building_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -159,12 +217,12 @@ class BuildingsModule:
         :param building_id: Unique identifier for the building
         :return: Comprehensive building profile or None
         """
-        building = self.data[self.data['Building ID'] == building_id]
-        
-        if building.empty:
+        position = self._row_by_id.get(building_id)
+
+        if position is None:
             return None
         
-        building_row = building.iloc[0]
+        building_row = self.data.iloc[position]
         
         return {
             'id': building_row['Building ID'],
@@ -196,14 +254,14 @@ class BuildingsModule:
         insights = {}
         
         # Size context
-        avg_size = self.data['Size'].mean()
+        avg_size = self._avg_size
         if building_row['Size'] > avg_size * 1.5:
             insights['size_note'] = "Significantly larger than portfolio average"
         elif building_row['Size'] < avg_size * 0.5:
             insights['size_note'] = "Considerably smaller than portfolio average"
         
         # Age context
-        avg_age = self.data['Building Age'].mean()
+        avg_age = self._avg_age
         if building_row['Building Age'] > avg_age * 1.5:
             insights['age_note'] = "Older than typical portfolio building"
         elif building_row['Building Age'] < avg_age * 0.5:
@@ -3,6 +3,110 @@ import numpy as np
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 
+ANOMALY_COLUMNS = ['building_id', 'date', 'cost_type', 'amount', 'z_score']
+# Columns of get_detailed_financial_summary, in its order
+SUMMARY_COLUMNS = ['Energy Costs (USD)', 'Cleaning Costs (USD)', 'Utilities Costs (USD)',
+                   'Maintenance Costs (USD)', 'Total Operating Expense (USD)']
+
+
+def _anomaly_frame(data: pd.DataFrame, cost_columns: List[str], z_scores: np.ndarray,
+                   threshold: float) -> pd.DataFrame:
+    """Long-format rows for every |z| > threshold, cost column by cost column as identify_cost_anomalies lists them"""
+    columns, rows = np.nonzero(np.abs(z_scores.T) > threshold)
+    return pd.DataFrame({
+        'building_id': data['Building ID'].to_numpy()[rows],
+        'date': data['Date'].to_numpy()[rows],
+        'cost_type': np.array([col.replace(' Costs (USD)', '') for col in cost_columns], dtype=object)[columns],
+        'amount': data[cost_columns].to_numpy()[rows, columns],
+        'z_score': np.abs(z_scores[rows, columns]),
+    }, columns=ANOMALY_COLUMNS)
+
+
+class CostAnomalyTracker:
+    def __init__(self, cost_columns: List[str], seasonal: bool = False):
+        """
+        Running mean and variance of each cost column per building (and month when seasonal)
+
+        Batches are merged with the parallel form of Welford's update, so appended months are
+        scored against the history without rescanning it.
+
+        :param cost_columns: Columns to track
+        :param seasonal: Keep separate statistics per calendar month
+        """
+        self.cost_columns = cost_columns
+        self.seasonal = seasonal
+        self._group_index: Dict[tuple, int] = {}
+        self.count = np.zeros((0, len(cost_columns)))
+        self.mean = np.zeros((0, len(cost_columns)))
+        self.m2 = np.zeros((0, len(cost_columns)))
+
+    def _rows_for(self, data: pd.DataFrame, create: bool) -> np.ndarray:
+        """State row of each data row; -1 for groups not seen yet unless create"""
+        keys = [data['Building ID'].astype(str)]
+        if self.seasonal:
+            keys.append(pd.to_datetime(data['Date']).dt.month)
+        codes, groups = pd.MultiIndex.from_arrays(keys).factorize()
+        group_rows = np.empty(len(groups), dtype=np.int64)
+        for position, key in enumerate(groups):
+            row = self._group_index.get(key)
+            if row is None and create:
+                row = self._group_index[key] = len(self._group_index)
+            group_rows[position] = -1 if row is None else row
+        rows = group_rows[codes]
+        if create and len(self._group_index) > len(self.count):
+            grow = len(self._group_index) - len(self.count)
+            self.count, self.mean, self.m2 = (np.vstack([state, np.zeros((grow, len(self.cost_columns)))])
+                                              for state in (self.count, self.mean, self.m2))
+        return rows
+
+    def update(self, data: pd.DataFrame):
+        """Merge a batch of rows into the running statistics"""
+        if data.empty:
+            return
+        rows = self._rows_for(data, create=True)
+        grouped = data[self.cost_columns].groupby(rows)
+        stats = grouped.agg(['count', 'mean', 'var'])
+        targets = stats.index.to_numpy()
+        batch_count = stats.xs('count', axis=1, level=1).to_numpy(dtype=float)
+        batch_mean = stats.xs('mean', axis=1, level=1).to_numpy(dtype=float)
+        batch_var = np.nan_to_num(stats.xs('var', axis=1, level=1).to_numpy(dtype=float))
+        batch_m2 = batch_var * np.maximum(batch_count - 1, 0)
+
+        count, mean = self.count[targets], self.mean[targets]
+        total = count + batch_count
+        with np.errstate(divide='ignore', invalid='ignore'):
+            delta = batch_mean - mean
+            share = np.where(total > 0, batch_count / total, 0)
+            self.mean[targets] = np.where(batch_count > 0, mean + delta * share, mean)
+            self.m2[targets] += np.where(batch_count > 0, batch_m2 + delta ** 2 * count * share, 0)
+        self.count[targets] = total
+
+    def z_scores(self, data: pd.DataFrame) -> np.ndarray:
+        """Rows x cost columns z-scores against the current statistics; NaN without two prior values"""
+        rows = self._rows_for(data, create=False)
+        known = rows >= 0
+        z_scores = np.full((len(data), len(self.cost_columns)), np.nan)
+        count, mean, m2 = self.count[rows[known]], self.mean[rows[known]], self.m2[rows[known]]
+        values = data[self.cost_columns].to_numpy(dtype=float)[known]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z_scores[known] = np.where(count > 1, (values - mean) / np.sqrt(m2 / (count - 1)), np.nan)
+        return z_scores
+
+    def score(self, data: pd.DataFrame, threshold: float = 2.5, update: bool = True) -> pd.DataFrame:
+        """
+        Anomalies among new rows, scored against the history before them
+
+        :param data: New rows (Building ID, Date and the cost columns)
+        :param threshold: |z| above which a value is reported
+        :param update: Merge the rows into the statistics after scoring
+        :return: DataFrame with ANOMALY_COLUMNS
+        """
+        anomalies = _anomaly_frame(data, self.cost_columns, self.z_scores(data), threshold)
+        if update:
+            self.update(data)
+        return anomalies
+
+
 class FinancialModule:
     def __init__(self, dataframe: pd.DataFrame):
         """
@@ -12,7 +116,10 @@ class FinancialModule:
         """
         self._validate_dataframe(dataframe)
         self.data = dataframe
+        self.data_version = 0
+        self._summary = None
         self._preprocess_data()
+        self._build_cube()
     
     def _validate_dataframe(self, dataframe: pd.DataFrame):
         """
@@ -65,29 +172,115 @@ class FinancialModule:
         calculated_total = self.data[cost_columns].sum(axis=1)
         if not np.allclose(calculated_total, self.data[total_expense_col]):
             print("Warning: Calculated total expenses do not match the provided Total Operating Expense")
-    
+
+    def _build_cube(self):
+        """
+        Dense (building, year, month, category) cube of the cost columns, with prefix sums along time
+
+        Years span first to last year of the data without gaps, so month t of the cube is
+        year_index * 12 + month - 1 and any window of months is a difference of two prefix sums.
+        Annual totals and row counts are summed from the cube once, so per-call lookups are indexing.
+        """
+        total_expense_col = 'Total Operating Expense (USD)'
+        self.cost_columns = [col for col in self.data.columns if col.endswith('Costs (USD)')]
+        self.cube_columns = self.cost_columns + [total_expense_col]
+        self._column_index = {col: index for index, col in enumerate(self.cube_columns)}
+
+        building_codes, building_ids = pd.factorize(self.data['Building ID'], sort=True)
+        self.building_ids = list(building_ids)
+        self._building_index = {building_id: index for index, building_id in enumerate(self.building_ids)}
+        self.first_year = int(self.data['Year'].min()) if len(self.data) else 0
+        year_count = int(self.data['Year'].max()) - self.first_year + 1 if len(self.data) else 0
+        self.years = list(range(self.first_year, self.first_year + year_count))
+
+        year_codes = self.data['Year'].to_numpy() - self.first_year
+        month_codes = self.data['Month'].to_numpy() - 1
+        values = self.data[self.cube_columns]
+        dtype = np.result_type(*values.dtypes)
+        index = (building_codes, year_codes, month_codes)
+
+        # Summing rather than assigning keeps duplicate (building, month) rows, as the groupbys did
+        self.cube = np.zeros((len(self.building_ids), year_count, 12, len(self.cube_columns)), dtype=dtype)
+        np.add.at(self.cube, index, values.fillna(0).to_numpy(dtype=dtype))
+        self.row_counts = np.zeros((len(self.building_ids), year_count, 12), dtype=np.int64)
+        np.add.at(self.row_counts, index, 1)
+
+        # prefix[b, t] is the total of building b's months before month t
+        by_month = self.cube.reshape(len(self.building_ids), year_count * 12, len(self.cube_columns))
+        self.prefix = np.zeros((len(self.building_ids), year_count * 12 + 1, len(self.cube_columns)), dtype=dtype)
+        np.cumsum(by_month, axis=1, out=self.prefix[:, 1:])
+        self.portfolio_prefix = self.prefix.sum(axis=0)
+
+        self.annual = self.cube.sum(axis=2)
+        self.annual_counts = self.row_counts.sum(axis=2)
+        self.portfolio_annual = self.annual.sum(axis=0)
+        self.portfolio_annual_counts = self.annual_counts.sum(axis=0)
+        self.date_range = {'start': self.data['Date'].min(), 'end': self.data['Date'].max()}
+        self._z_scores: Dict[bool, np.ndarray] = {}
+
+    def _year_index(self, year: int) -> Optional[int]:
+        """Cube position of a year, or None for a missing, non-numeric or out-of-range year"""
+        try:
+            index = int(year) - self.first_year
+        except (TypeError, ValueError):
+            return None
+        return index if 0 <= index < len(self.years) else None
+
+    def _month_index(self, date) -> int:
+        """Cube month of a date, clamped to [0, number of months]"""
+        date = pd.Timestamp(date)
+        return min(max((date.year - self.first_year) * 12 + date.month - 1, 0), len(self.years) * 12)
+
+    def window_total(self, cost_type: str, start, end, building_id: Optional[str] = None) -> float:
+        """
+        Total of a cost column over the months from start up to, not including, end
+
+        :param cost_type: One of cube_columns, e.g. 'Energy Costs (USD)'
+        :param start: First month of the window (any date in it)
+        :param end: Month after the window
+        :param building_id: Optional building; the whole portfolio otherwise
+        :return: Window total, 0 for an unknown building or a window outside the data
+        """
+        column = self._column_index[cost_type]
+        start_index, end_index = self._month_index(start), self._month_index(end)
+        if end_index <= start_index:
+            return 0
+        if building_id is None:
+            prefix = self.portfolio_prefix
+        elif building_id in self._building_index:
+            prefix = self.prefix[self._building_index[building_id]]
+        else:
+            return 0
+        return prefix[end_index, column] - prefix[start_index, column]
+
+    def _annual_summary(self, annual: np.ndarray, counts: np.ndarray) -> Dict[str, Any]:
+        """Per-year totals, means and cost breakdown over the years that have rows"""
+        total_column = self._column_index['Total Operating Expense (USD)']
+        present = [index for index in range(len(self.years)) if counts[index]]
+        return {
+            'totals': {self.years[index]: annual[index, total_column] for index in present},
+            'means': {self.years[index]: annual[index, total_column] / counts[index] for index in present},
+            'breakdown': {
+                self.years[index]: {col.replace(' Costs (USD)', ''): annual[index, self._column_index[col]]
+                                    for col in self.cost_columns}
+                for index in present
+            },
+        }
+
     def get_financial_overview(self) -> Dict[str, Any]:
         """
         Generate comprehensive financial portfolio overview
         
         :return: Dictionary of financial insights
         """
-        cost_columns = [col for col in self.data.columns if col.endswith('Costs (USD)')]
-        annual_summary = self.data.groupby('Year')[cost_columns + ['Total Operating Expense (USD)']].agg(['sum', 'mean'])
-        
+        annual_summary = self._annual_summary(self.portfolio_annual, self.portfolio_annual_counts)
+
         return {
-            'total_annual_expenses': dict(annual_summary['Total Operating Expense (USD)']['sum']),
-            'avg_annual_expenses': dict(annual_summary['Total Operating Expense (USD)']['mean']),
-            'expense_breakdown': {
-                year: {col.replace(' Costs (USD)', ''): row[(col, 'sum')] 
-                      for col in cost_columns}
-                for year, row in annual_summary.iterrows()
-            },
+            'total_annual_expenses': annual_summary['totals'],
+            'avg_annual_expenses': annual_summary['means'],
+            'expense_breakdown': annual_summary['breakdown'],
             'utilities_breakdown': self.get_utilities_breakdown(),
-            'date_range': {
-                'start': self.data['Date'].min(),
-                'end': self.data['Date'].max()
-            }
+            'date_range': dict(self.date_range)
         }
     
     def get_utilities_breakdown(self, building_id: str = None, year: int = None) -> Dict[str, float]:
@@ -98,15 +291,23 @@ class FinancialModule:
         :param year: Optional year to filter data
         :return: Dictionary of utilities costs breakdown
         """
-        query = self.data
-
         if building_id:
-            query = query[query['Building ID'] == building_id]
+            if building_id not in self._building_index:
+                annual = np.zeros((len(self.years), len(self.cube_columns)), dtype=self.cube.dtype)
+            else:
+                annual = self.annual[self._building_index[building_id]]
+        else:
+            annual = self.portfolio_annual
+
         if year:
-            query = query[query['Year'] == year]
+            year_index = self._year_index(year)
+            totals = annual[year_index] if year_index is not None else np.zeros(len(self.cube_columns),
+                                                                                 dtype=self.cube.dtype)
+        else:
+            totals = annual.sum(axis=0)
 
-        total_utilities = query['Utilities Costs (USD)'].sum()
-        energy_costs = query['Energy Costs (USD)'].sum()
+        total_utilities = totals[self._column_index['Utilities Costs (USD)']]
+        energy_costs = totals[self._column_index['Energy Costs (USD)']]
         other_utilities = total_utilities - energy_costs
 
         return {
@@ -122,39 +323,75 @@ class FinancialModule:
         :param building_id: Unique identifier for the building
         :return: Comprehensive financial analysis or None
         """
-        building_data = self.data[self.data['Building ID'] == building_id]
-        
-        if building_data.empty:
+        if building_id not in self._building_index:
             return None
-        
-        cost_columns = [col for col in building_data.columns if col.endswith('Costs (USD)')]
-        annual_summary = building_data.groupby('Year')[cost_columns + ['Total Operating Expense (USD)']].agg(['sum', 'mean'])
-        
+
+        building_index = self._building_index[building_id]
+        annual, counts = self.annual[building_index], self.annual_counts[building_index]
+        annual_summary = self._annual_summary(annual, counts)
+        present = np.flatnonzero(counts)
+
         # Cost trend analysis
         cost_trends = {}
-        for col in cost_columns:
-            yearly_costs = building_data.groupby('Year')[col].sum()
-            if len(yearly_costs) > 1:
-                # Calculate year-over-year change
-                yoy_change = (yearly_costs.pct_change() * 100).dropna()
+        if len(present) > 1:
+            years = [self.years[index] for index in present]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                # Year-over-year change between consecutive years with data, as pct_change computes it
+                changes = (annual[present[1:]] / annual[present[:-1]] - 1) * 100
+            for col in self.cost_columns:
+                column = self._column_index[col]
                 cost_trends[col.replace(' Costs (USD)', '')] = {
-                    'total_by_year': dict(yearly_costs),
-                    'year_over_year_change': dict(yoy_change)
+                    'total_by_year': dict(zip(years, annual[present, column])),
+                    'year_over_year_change': {year: change for year, change in zip(years[1:], changes[:, column])
+                                              if not np.isnan(change)}
                 }
-        
+
         return {
             'building_id': building_id,
-            'annual_expenses': dict(annual_summary['Total Operating Expense (USD)']['sum']),
-            'avg_annual_expenses': dict(annual_summary['Total Operating Expense (USD)']['mean']),
-            'cost_breakdown': {
-                year: {col.replace(' Costs (USD)', ''): row[(col, 'sum')] 
-                      for col in cost_columns}
-                for year, row in annual_summary.iterrows()
-            },
+            'annual_expenses': annual_summary['totals'],
+            'avg_annual_expenses': annual_summary['means'],
+            'cost_breakdown': annual_summary['breakdown'],
             'utilities_breakdown': self.get_utilities_breakdown(building_id),
             'cost_trends': cost_trends
         }
     
+    def cost_z_scores(self, seasonal: bool = False) -> np.ndarray:
+        """
+        Rows x cost columns z-scores within each building (and calendar month when seasonal)
+
+        Computed in one grouped transform and kept for later calls.
+        """
+        if seasonal not in self._z_scores:
+            keys = ['Building ID', 'Month'] if seasonal else ['Building ID']
+            grouped = self.data.groupby(keys, observed=True, sort=False)[self.cost_columns]
+            values = self.data[self.cost_columns].to_numpy(dtype=float)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                self._z_scores[seasonal] = ((values - grouped.transform('mean').to_numpy(dtype=float))
+                                            / grouped.transform('std').to_numpy(dtype=float))
+        return self._z_scores[seasonal]
+
+    def detect_cost_anomalies(self, threshold: float = 2.5, seasonal: bool = False,
+                              building_id: Optional[str] = None) -> pd.DataFrame:
+        """
+        Cost values more than threshold standard deviations from their building's mean
+
+        :param threshold: |z| above which a value is reported
+        :param seasonal: Compare each month with the same calendar month of other years; with n years of
+            history a value cannot exceed |z| = (n - 1) / sqrt(n), so seasonal scoring needs a lower threshold
+        :param building_id: Optional specific building
+        :return: DataFrame with ANOMALY_COLUMNS
+        """
+        anomalies = _anomaly_frame(self.data, self.cost_columns, self.cost_z_scores(seasonal), threshold)
+        if building_id:
+            anomalies = anomalies[anomalies['building_id'] == building_id].reset_index(drop=True)
+        return anomalies
+
+    def anomaly_tracker(self, seasonal: bool = False) -> CostAnomalyTracker:
+        """Running statistics primed with the loaded history, to score appended months incrementally"""
+        tracker = CostAnomalyTracker(self.cost_columns, seasonal)
+        tracker.update(self.data)
+        return tracker
+
     def identify_cost_anomalies(self, building_id: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         Identify cost anomalies and unusual spending patterns
@@ -162,55 +399,69 @@ class FinancialModule:
         :param building_id: Optional specific building to analyze
         :return: List of cost anomalies
         """
-        # Filter data if building_id is provided
-        data = self.data[self.data['Building ID'] == building_id] if building_id else self.data
-        
-        anomalies = []
-        
-        cost_columns = [col for col in data.columns if col.endswith('Costs (USD)')]
-        
-        for column in cost_columns:
-            # Calculate z-score for identifying outliers
-            z_scores = np.abs((data[column] - data[column].mean()) / data[column].std())
-            
-            # Flag expenses more than 2.5 standard deviations from mean
-            outliers = data[z_scores > 2.5]
-            
-            for _, row in outliers.iterrows():
-                anomalies.append({
-                    'building_id': row['Building ID'],
-                    'date': row['Date'],
-                    'cost_type': column.replace(' Costs (USD)', ''),
-                    'amount': row[column],
-                    'z_score': z_scores[row.name],
-                    'description': f"Unusual {column.lower()} detected"
-                })
-        
-        return anomalies
+        anomalies = self.detect_cost_anomalies(building_id=building_id)
+        return [
+            {**record, 'date': pd.Timestamp(record['date']),
+             'description': f"Unusual {record['cost_type'].lower()} costs (usd) detected"}
+            for record in anomalies.to_dict('records')
+        ]
     
-    def get_detailed_financial_summary(self):
+    def get_detailed_financial_summary(self) -> Dict[str, Dict[str, Dict[int, Any]]]:
+        """
+        Yearly totals of the main cost columns for every building
+
+        Read from the annual (building, year) totals of the cube and kept until the data version changes.
+
+        :return: {building_id: {column: {year: total}}} for the years each building has rows
+        """
+        if self._summary is not None and self._summary[0] == self.data_version:
+            return self._summary[1]
+
+        columns = [self._column_index[col] for col in SUMMARY_COLUMNS]
         summary = {}
         for building_id in self.data['Building ID'].unique():
-            building_data = self.data[self.data['Building ID'] == building_id]
-            yearly_summary = building_data.groupby(building_data['Date'].dt.year).agg({
-                'Energy Costs (USD)': 'sum',
-                'Cleaning Costs (USD)': 'sum',
-                'Utilities Costs (USD)': 'sum',
-                'Maintenance Costs (USD)': 'sum',
-                'Total Operating Expense (USD)': 'sum'
-            }).to_dict()
-            summary[building_id] = yearly_summary
+            building_index = self._building_index[building_id]
+            present = np.flatnonzero(self.annual_counts[building_index])
+            years = [self.years[index] for index in present]
+            totals = self.annual[building_index][np.ix_(present, columns)].T.tolist()
+            summary[building_id] = {col: dict(zip(years, values)) for col, values in zip(SUMMARY_COLUMNS, totals)}
+
+        self._summary = (self.data_version, summary)
         return summary
-    
-   
+
+    def reload(self, dataframe: pd.DataFrame):
+        """
+        Replace the financial data, rebuilding the cube and dropping memoized results
+
+        :param dataframe: DataFrame containing financial data
+        """
+        self._validate_dataframe(dataframe)
+        self.data = dataframe
+        self._preprocess_data()
+        self._build_cube()
+        self.data_version += 1
+
     def fetch_query_result(self, building_id: str, year: int, cost_type: str) -> str:
         """
         Fetch financial data for a specific building, year, and cost type.
         """
-        if building_id not in self.data["Building ID"].values:
+        if building_id not in self._building_index:
             return f"Building {building_id} is not found in the portfolio."
-        
-        # Filter data for the given building and year
+
+        if cost_type not in self._column_index:
+            return self._fetch_derived_result(building_id, year, cost_type)
+
+        # The building's first month with data in that year
+        building_index = self._building_index[building_id]
+        year_index = self._year_index(year)
+        months = np.flatnonzero(self.row_counts[building_index, year_index]) if year_index is not None else []
+        if len(months) == 0:
+            return f"No data available for {building_id} in {year}."
+        value = self.cube[building_index, year_index, months[0], self._column_index[cost_type]]
+        return f"The {cost_type} for Building {building_id} in {year} was ${value:,}."
+
+    def _fetch_derived_result(self, building_id: str, year: int, cost_type: str) -> str:
+        """fetch_query_result for columns outside the cube (percentages, lease cost), read from the rows"""
         building_data = self.data[self.data["Building ID"] == building_id]
         try:
             value = building_data.loc[building_data["Year"] == year, cost_type].values[0]
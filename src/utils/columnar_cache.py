@@ -0,0 +1,226 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+from typing import Any, Dict, Optional
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:  # Optional: without pyarrow the cache stores pickles, still typed but not memory-mapped
+    pa = None
+    feather = None
+    pq = None
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from src.utils.config import Config
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+# Bump when the conversion rules change so existing cache files are rebuilt
+CONVERSION_VERSION = 1
+EXTENSIONS = {"arrow": ".arrow", "parquet": ".parquet", "pickle": ".pkl"}
+
+# Dates in the portfolio CSVs are written day first
+DATE_FORMAT = "%d/%m/%Y"
+
+
+def _column_key(name: str) -> str:
+    """'\\ufeffBuilding ID' -> 'building_id', 'Energy Costs (USD)' -> 'energy_costs_usd'"""
+    return re.sub(r"[^a-z0-9]+", "_", name.replace("﻿", "").strip().lower()).strip("_")
+
+
+def _is_date_column(key: str) -> bool:
+    return key == "date" or key.endswith("_date")
+
+
+def _is_cost_column(key: str) -> bool:
+    return any(part in key for part in ("cost", "expense", "usd"))
+
+
+def apply_types(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Types the loaders would otherwise infer (or re-parse) on every read
+
+    Dates are parsed once (day first), building ids become categoricals and cost columns floats.
+    Column names are kept as they appear in the CSV.
+    """
+    df = df.rename(columns=lambda name: name.replace("﻿", ""))
+    for column in df.columns:
+        key = _column_key(column)
+        if _is_date_column(key) and pd.api.types.is_string_dtype(df[column]):
+            try:
+                df[column] = pd.to_datetime(df[column], format=DATE_FORMAT)
+            except ValueError:
+                df[column] = pd.to_datetime(df[column], dayfirst=True, errors="coerce")
+        elif key == "building_id":
+            df[column] = df[column].astype("category")
+        elif _is_cost_column(key) and pd.api.types.is_numeric_dtype(df[column]):
+            df[column] = df[column].astype("float64")
+    return df
+
+
+def source_hash(path: str, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file_obj:
+        for block in iter(lambda: file_obj.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ColumnarCache:
+    def __init__(self, cache_dir: Optional[str] = None, file_format: Optional[str] = None):
+        """
+        Typed columnar copies of the portfolio CSVs, rebuilt when a CSV's content changes
+
+        A JSON manifest maps each CSV to its content hash and cache file. A CSV whose size and
+        mtime match the manifest is not re-hashed. Arrow IPC files are memory-mapped on load.
+
+        :param cache_dir: Directory for the cache files and manifest
+        :param file_format: "arrow" (default), "parquet", or "pickle"; without pyarrow always "pickle"
+        """
+        self.cache_dir = cache_dir or Config.COLUMNAR_CACHE_DIR
+        file_format = file_format or Config.COLUMNAR_CACHE_FORMAT
+        self.file_format = file_format if pa is not None else "pickle"
+        self._lock = threading.Lock()
+        self._manifest_path = os.path.join(self.cache_dir, MANIFEST_FILE)
+        self._manifest = self._read_manifest()
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        try:
+            with open(self._manifest_path, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _write_manifest(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_path = self._manifest_path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self._manifest, f, indent=2)
+        os.replace(temp_path, self._manifest_path)
+
+    def _cache_path(self, csv_path: str) -> str:
+        name = os.path.splitext(os.path.basename(csv_path))[0]
+        digest = hashlib.sha1(csv_path.encode()).hexdigest()[:8]
+        return os.path.join(self.cache_dir, f"{name}-{digest}{EXTENSIONS[self.file_format]}")
+
+    def _entry_is_current(self, entry: Optional[Dict[str, Any]], csv_path: str, stat) -> bool:
+        """Size+mtime match, or the content hash still matches (e.g. the file was touched)"""
+        if not entry or entry.get("version") != CONVERSION_VERSION or entry.get("format") != self.file_format:
+            return False
+        if not os.path.exists(entry["cache_path"]):
+            return False
+        if entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+            return True
+        if entry["size"] == stat.st_size and source_hash(csv_path) == entry["hash"]:
+            entry["mtime"] = stat.st_mtime
+            self._write_manifest()
+            return True
+        return False
+
+    def convert(self, csv_path: str) -> str:
+        """
+        Write the typed columnar copy of a CSV and record it in the manifest
+
+        :return: Cache file path
+        """
+        csv_path = os.path.abspath(csv_path)
+        stat = os.stat(csv_path)
+        df = apply_types(pd.read_csv(csv_path, encoding="utf-8-sig", keep_default_na=False, na_values=[""]))
+        cache_path = self._cache_path(csv_path)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_path = cache_path + ".tmp"
+        if self.file_format == "arrow":
+            feather.write_feather(df, temp_path, compression="uncompressed")
+        elif self.file_format == "parquet":
+            df.to_parquet(temp_path, index=False)
+        else:
+            df.to_pickle(temp_path)
+        os.replace(temp_path, cache_path)
+
+        self._manifest[csv_path] = {
+            "hash": source_hash(csv_path),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "cache_path": cache_path,
+            "format": self.file_format,
+            "rows": len(df),
+            "version": CONVERSION_VERSION,
+        }
+        self._write_manifest()
+        logger.info(f"Converted {csv_path} -> {cache_path} ({len(df)} rows)")
+        return cache_path
+
+    def _read(self, cache_path: str, file_format: str) -> pd.DataFrame:
+        if file_format == "arrow":
+            with pa.memory_map(cache_path, "r") as source:
+                return pa.ipc.open_file(source).read_all().to_pandas()
+        if file_format == "parquet":
+            return pq.read_table(cache_path, memory_map=True).to_pandas()
+        return pd.read_pickle(cache_path)
+
+    def load(self, csv_path: str) -> pd.DataFrame:
+        """
+        Typed DataFrame for a CSV, from the cache when current, converting it otherwise
+
+        :param csv_path: Source CSV
+        :return: DataFrame with parsed dates, categorical building ids and float costs
+        """
+        csv_path = os.path.abspath(csv_path)
+        stat = os.stat(csv_path)
+        with self._lock:
+            entry = self._manifest.get(csv_path)
+            if not self._entry_is_current(entry, csv_path, stat):
+                self.convert(csv_path)
+                entry = self._manifest[csv_path]
+        try:
+            return self._read(entry["cache_path"], entry["format"])
+        except Exception as e:
+            logger.warning(f"Unreadable cache file for {csv_path}, rebuilding: {e}")
+            with self._lock:
+                self.convert(csv_path)
+                entry = self._manifest[csv_path]
+            return self._read(entry["cache_path"], entry["format"])
+
+
+_cache: Optional[ColumnarCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_columnar_cache() -> ColumnarCache:
+    """Return the process-wide columnar cache, creating it from Config on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ColumnarCache()
+        return _cache
+
+
+def load_table(csv_path: str) -> pd.DataFrame:
+    """Drop-in for pd.read_csv on the portfolio CSVs, served from the columnar cache."""
+    if not Config.COLUMNAR_CACHE_ENABLED:
+        return apply_types(pd.read_csv(csv_path, encoding="utf-8-sig", keep_default_na=False, na_values=[""]))
+    return get_columnar_cache().load(csv_path)
+
+
+def main():
+    """Convert every CSV in a directory ahead of time: python src/utils/columnar_cache.py [data_dir]"""
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else "data"
+    cache = get_columnar_cache()
+    for name in sorted(os.listdir(data_dir)):
+        if name.lower().endswith(".csv"):
+            path = cache.convert(os.path.join(data_dir, name))
+            print(f"{name} -> {path}")
+
+
+if __name__ == "__main__":
+    main()
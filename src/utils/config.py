@@ -1,2 +1,75 @@
+import os
+
+
 class Config:
-    DATABASE_URI = None
\ No newline at end of file
+    DATABASE_URI = None
+
+    # Process-wide PostgreSQL connection pool used by the NL-to-SQL executor
+    DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", 1))
+    DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", 10))
+    DB_POOL_ACQUIRE_TIMEOUT = float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", 10.0))
+    DB_POOL_MAX_IDLE_SECONDS = float(os.getenv("DB_POOL_MAX_IDLE_SECONDS", 300.0))
+    DB_POOL_MAX_LIFETIME_SECONDS = float(os.getenv("DB_POOL_MAX_LIFETIME_SECONDS", 3600.0))
+    DB_POOL_HEALTH_CHECK_INTERVAL = float(os.getenv("DB_POOL_HEALTH_CHECK_INTERVAL", 30.0))
+
+    # In-process cache of generated-SQL results, invalidated by per-table data versions
+    RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+    RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", 256))
+    RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", 300.0))
+    RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+    DATA_VERSION_REFRESH_SECONDS = float(os.getenv("DATA_VERSION_REFRESH_SECONDS", 2.0))
+
+    # Persistent question -> validated SQL cache that skips the SQL-generation LLM call
+    SQL_CACHE_ENABLED = os.getenv("SQL_CACHE_ENABLED", "true").lower() == "true"
+    SQL_CACHE_PATH = os.getenv("SQL_CACHE_PATH", "sql_cache.db")
+    SQL_CACHE_MAX_AGE_DAYS = float(os.getenv("SQL_CACHE_MAX_AGE_DAYS", 30))
+
+    # Stream the narrative answer token by token in the SQL chat UI
+    STREAM_NARRATIVE = os.getenv("STREAM_NARRATIVE", "true").lower() == "true"
+
+    # Bounded fetch of generated-SQL results
+    MAX_RESULT_ROWS = int(os.getenv("MAX_RESULT_ROWS", 1000))
+    FETCH_BATCH_SIZE = int(os.getenv("FETCH_BATCH_SIZE", 500))
+    RESULT_PAGE_SIZE = int(os.getenv("RESULT_PAGE_SIZE", 100))
+
+    # Route aggregations over raw floor_utilization readings to the pre-aggregated rollups
+    ENABLE_ROLLUP_REWRITE = os.getenv("ENABLE_ROLLUP_REWRITE", "true").lower() == "true"
+
+    # Model that writes SQL from questions (part of the question -> SQL cache key)
+    SQL_MODEL = os.getenv("SQL_MODEL", "gpt-4")
+
+    # Token budget for the SQL-generation prompt (schema is pruned to fit)
+    SQL_PROMPT_TOKEN_BUDGET = int(os.getenv("SQL_PROMPT_TOKEN_BUDGET", 1200))
+
+    # Token budget for the query result shown to GPT for narration (larger results are digested to fit)
+    NARRATIVE_DIGEST_TOKEN_BUDGET = int(os.getenv("NARRATIVE_DIGEST_TOKEN_BUDGET", 800))
+
+    # Asyncio question pipeline: concurrent calls allowed per stage, and per-stage timeouts
+    ASYNC_SQL_CONCURRENCY = int(os.getenv("ASYNC_SQL_CONCURRENCY", 8))
+    ASYNC_DB_CONCURRENCY = int(os.getenv("ASYNC_DB_CONCURRENCY", 10))
+    ASYNC_NARRATIVE_CONCURRENCY = int(os.getenv("ASYNC_NARRATIVE_CONCURRENCY", 8))
+    LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", 60.0))
+    QUERY_TIMEOUT_SECONDS = float(os.getenv("QUERY_TIMEOUT_SECONDS", 30.0))
+
+    # EXPLAIN-based cost guard and per-statement timeout for generated SQL
+    QUERY_GUARD_ENABLED = os.getenv("QUERY_GUARD_ENABLED", "true").lower() == "true"
+    MAX_QUERY_COST = float(os.getenv("MAX_QUERY_COST", 5_000_000))
+    MAX_QUERY_ROWS = float(os.getenv("MAX_QUERY_ROWS", 50_000_000))
+    STATEMENT_TIMEOUT_MS = int(os.getenv("STATEMENT_TIMEOUT_MS", 30_000))
+    QUERY_GUARD_REGENERATE_ATTEMPTS = int(os.getenv("QUERY_GUARD_REGENERATE_ATTEMPTS", 1))
+    REJECTED_PLANS_PATH = os.getenv("REJECTED_PLANS_PATH", "rejected_plans.db")
+
+    # Per-question latency/token metrics (ring buffer flushed to SQLite)
+    METRICS_DB_PATH = os.getenv("METRICS_DB_PATH", "question_metrics.db")
+    METRICS_BUFFER_SIZE = int(os.getenv("METRICS_BUFFER_SIZE", 1000))
+    METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", 5.0))
+    METRICS_MAX_ROWS = int(os.getenv("METRICS_MAX_ROWS", 10000))
+
+    # Typed columnar (Arrow IPC / Parquet) copies of the portfolio CSVs, rebuilt when a CSV changes
+    COLUMNAR_CACHE_ENABLED = os.getenv("COLUMNAR_CACHE_ENABLED", "true").lower() == "true"
+    COLUMNAR_CACHE_DIR = os.getenv("COLUMNAR_CACHE_DIR", ".columnar_cache")
+    COLUMNAR_CACHE_FORMAT = os.getenv("COLUMNAR_CACHE_FORMAT", "arrow")
+
+    # Where generated SQL runs: "postgres" (DATABASE_URI) or "sqlite" (in-process copy of EMBEDDED_DATA_DIR)
+    EXECUTION_BACKEND = os.getenv("EXECUTION_BACKEND", "postgres").lower()
+    EMBEDDED_DATA_DIR = os.getenv("EMBEDDED_DATA_DIR", "data")
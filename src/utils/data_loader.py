@@ -1,10 +1,12 @@
 import pandas as pd
 
+from src.utils.columnar_cache import load_table
+
 class DataLoader:
     @staticmethod
     def load_buildings_data(file_path: str) -> pd.DataFrame:
-        return pd.read_csv(file_path)
+        return load_table(file_path)
 
     @staticmethod
     def load_financial_data(file_path: str) -> pd.DataFrame:
-        return pd.read_csv(file_path)
\ No newline at end of file
+        return load_table(file_path)
\ No newline at end of file
@@ -0,0 +1,109 @@
+import threading
+import weakref
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+class FinancialDataset:
+    def __init__(self, dataframe: pd.DataFrame):
+        """
+        Financial rows prepared once for the query calculators
+
+        Dates are parsed and integer year, month and yyyymm columns added. Rows are sorted by
+        (Building ID, Date), and each building's rows are one contiguous block, so a building's time
+        window is a binary search within its block. Portfolio-wide windows are one mask over the
+        precomputed columns.
+
+        :param dataframe: Financial data with 'Building ID' and 'Date' columns; it is not modified
+        """
+        self.source_columns = list(dataframe.columns)
+        dates = dataframe['Date']
+        if not pd.api.types.is_datetime64_any_dtype(dates):
+            dates = pd.to_datetime(dates)
+        frame = dataframe.assign(
+            Date=dates,
+            year=dates.dt.year.fillna(0).astype(np.int64),
+            month=dates.dt.month.fillna(0).astype(np.int64),
+        )
+        frame['yyyymm'] = frame['year'] * 100 + frame['month']
+        self.frame = frame.sort_values(['Building ID', 'Date'], kind='stable')
+
+        self._year = self.frame['year'].to_numpy()
+        self._yyyymm = self.frame['yyyymm'].to_numpy()
+        self._dates = self.frame['Date'].to_numpy()
+        ids = self.frame['Building ID'].to_numpy()
+        starts = np.concatenate([[0], np.flatnonzero(ids[1:] != ids[:-1]) + 1]) if len(ids) else np.array([], int)
+        stops = np.append(starts[1:], len(ids))
+        self.offsets: Dict[str, Tuple[int, int]] = {ids[start]: (int(start), int(stop))
+                                                    for start, stop in zip(starts, stops)}
+
+    def select(self, building_id: Optional[str] = None, year: Optional[int] = None,
+               start_date=None, end_date=None) -> pd.DataFrame:
+        """
+        Rows of one building and/or time window, in (Building ID, Date) order
+
+        :param building_id: Only this building's block
+        :param year: Only rows dated in this year
+        :param start_date: Only rows dated on or after this date
+        :param end_date: Only rows dated on or before this date
+        :return: Slice of the prepared frame
+        """
+        if building_id is None and year is None and start_date is None and end_date is None:
+            return self.frame
+        if building_id is None:
+            # Portfolio-wide windows cut every block: one vectorized mask beats a search per building
+            mask = np.ones(len(self.frame), dtype=bool)
+            if year is not None:
+                mask &= self._year == year
+            if start_date is not None:
+                mask &= self._dates >= np.datetime64(pd.Timestamp(start_date))
+            if end_date is not None:
+                mask &= self._dates <= np.datetime64(pd.Timestamp(end_date))
+            return self.frame[mask]
+
+        start, stop = self.offsets.get(building_id, (0, 0))
+        if year is not None:
+            months = self._yyyymm[start:stop]
+            start, stop = (start + int(np.searchsorted(months, year * 100 + 1, 'left')),
+                           start + int(np.searchsorted(months, year * 100 + 12, 'right')))
+        if start_date is not None:
+            start += int(np.searchsorted(self._dates[start:stop], np.datetime64(pd.Timestamp(start_date)), 'left'))
+        if end_date is not None:
+            stop = start + int(np.searchsorted(self._dates[start:stop], np.datetime64(pd.Timestamp(end_date)),
+                                               'right'))
+        return self.frame.iloc[start:max(start, stop)]
+
+
+_datasets: Dict[int, Tuple[weakref.ref, tuple, FinancialDataset]] = {}
+_datasets_lock = threading.Lock()
+
+
+def _fingerprint(dataframe: pd.DataFrame) -> tuple:
+    """Shape, columns and a hash of index and values, so rows appended or values corrected in place change it"""
+    content = pd.util.hash_pandas_object(dataframe, index=True).to_numpy().sum()
+    return dataframe.shape, tuple(dataframe.columns), int(content)
+
+
+def financial_dataset(dataframe: pd.DataFrame) -> FinancialDataset:
+    """
+    FinancialDataset for a frame, prepared on first use and kept while the frame is alive
+
+    The frame is fingerprinted on every call; after an in-place change the dataset is prepared again.
+
+    :param dataframe: Financial data, typically FinancialModule.data
+    """
+    key = id(dataframe)
+    fingerprint = _fingerprint(dataframe)
+    with _datasets_lock:
+        entry = _datasets.get(key)
+        if entry is not None and entry[0]() is dataframe and entry[1] == fingerprint:
+            return entry[2]
+
+    dataset = FinancialDataset(dataframe)
+    with _datasets_lock:
+        if entry is None or entry[0]() is not dataframe:
+            weakref.finalize(dataframe, _datasets.pop, key, None)
+        _datasets[key] = (weakref.ref(dataframe), fingerprint, dataset)
+    return dataset
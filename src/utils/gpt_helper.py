@@ -6,8 +6,12 @@ import numpy as np
 import json
 import pandas as pd
 from datetime import datetime
+from functools import lru_cache
 from ..modules.query_processor import QueryProcessor
 from ..utils.response_generator import ResponseGenerator
+from ..utils.financial_dataset import FinancialDataset, financial_dataset
+from ..utils.config import Config
+from ..chat_gpt.result_digest import digest_result
 import openai
 
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
@@ -387,30 +391,7 @@ def execute_query_plan(query_plan: Dict, buildings_module, financial_module) ->
     """
     Execute the query plan and return results.
     """
-    results = {}
-    buildings_df = buildings_module.data
-    financial_df = financial_module.data
-    
-    # Apply filters
-    if query_plan.get('filters'):
-        for filter_condition in query_plan['filters']:
-            if filter_condition.get('dataset') == 'buildings':
-                buildings_df = apply_filter(buildings_df, filter_condition)
-            elif filter_condition.get('dataset') == 'financial':
-                financial_df = apply_filter(financial_df, filter_condition)
-    
-    # Perform calculations
-    if query_plan.get('calculations'):
-        for calc in query_plan['calculations']:
-            calc_result = perform_calculation(
-                calc, 
-                buildings_df, 
-                financial_df, 
-                query_plan.get('time_period')
-            )
-            results[calc['name']] = calc_result
-    
-    return results
+    return execute_calculations(query_plan, buildings_module.data, financial_module.data)
 
 def apply_filter(df: pd.DataFrame, filter_condition: Dict) -> pd.DataFrame:
     """
@@ -505,26 +486,33 @@ def execute_query(parsed_query, buildings_df, financial_df):
 
     return "Unsupported query type."
 
+def _calculation_rows(dataset: str, buildings_df: pd.DataFrame, financial_df: pd.DataFrame,
+                      time_period: Optional[Dict]):
+    """
+    Rows a calculation runs over, and the columns to report as its context
+
+    Financial rows come from the prepared FinancialDataset, so a year is a slice of each building's
+    block rather than a date parse and mask over the whole frame.
+    """
+    if dataset == 'buildings':
+        return buildings_df, list(buildings_df.columns)
+    prepared = financial_dataset(financial_df)
+    year = time_period.get('year') if time_period else None
+    return prepared.select(year=year), prepared.source_columns
+
 def calculate_max(calc: Dict, buildings_df: pd.DataFrame, 
                       financial_df: pd.DataFrame, time_period: Dict) -> Dict:
     """Calculate maximum value with context."""
     field = calc.get('field')
     dataset = calc.get('dataset', 'buildings')
-    df = buildings_df if dataset == 'buildings' else financial_df
-    
-    if time_period:
-        if 'year' in time_period:
-            if dataset == 'financial':
-                df = df[pd.to_datetime(df['Date']).dt.year == time_period['year']]
-            else:
-                # For buildings dataset, no time filtering needed unless specifically looking at historical data
-                pass
+    # For buildings dataset, no time filtering needed unless specifically looking at historical data
+    df, columns = _calculation_rows(dataset, buildings_df, financial_df, time_period)
     
     if df.empty:
         return {"error": "No data found for the specified criteria"}
     
     max_value = df[field].max()
-    max_row = df.loc[df[field] == max_value].iloc[0]
+    max_row = df.loc[df[field] == max_value, columns].iloc[0]
     
     return {
         "value": max_value,
@@ -538,17 +526,13 @@ def calculate_min(calc: Dict, buildings_df: pd.DataFrame,
     """Calculate minimum value with context."""
     field = calc.get('field')
     dataset = calc.get('dataset', 'buildings')
-    df = buildings_df if dataset == 'buildings' else financial_df
-    
-    if time_period:
-        if 'year' in time_period and dataset == 'financial':
-            df = df[pd.to_datetime(df['Date']).dt.year == time_period['year']]
+    df, columns = _calculation_rows(dataset, buildings_df, financial_df, time_period)
     
     if df.empty:
         return {"error": "No data found for the specified criteria"}
     
     min_value = df[field].min()
-    min_row = df.loc[df[field] == min_value].iloc[0]
+    min_row = df.loc[df[field] == min_value, columns].iloc[0]
     
     return {
         "value": min_value,
@@ -563,11 +547,7 @@ def calculate_sum(calc: Dict, buildings_df: pd.DataFrame,
     field = calc.get('field')
     dataset = calc.get('dataset', 'buildings')
     groupby = calc.get('groupby')
-    df = buildings_df if dataset == 'buildings' else financial_df
-    
-    if time_period:
-        if 'year' in time_period and dataset == 'financial':
-            df = df[pd.to_datetime(df['Date']).dt.year == time_period['year']]
+    df, _ = _calculation_rows(dataset, buildings_df, financial_df, time_period)
     
     if df.empty:
         return {"error": "No data found for the specified criteria"}
@@ -589,11 +569,7 @@ def calculate_average(calc: Dict, buildings_df: pd.DataFrame,
     field = calc.get('field')
     dataset = calc.get('dataset', 'buildings')
     groupby = calc.get('groupby')
-    df = buildings_df if dataset == 'buildings' else financial_df
-    
-    if time_period:
-        if 'year' in time_period and dataset == 'financial':
-            df = df[pd.to_datetime(df['Date']).dt.year == time_period['year']]
+    df, _ = _calculation_rows(dataset, buildings_df, financial_df, time_period)
     
     if df.empty:
         return {"error": "No data found for the specified criteria"}
@@ -615,11 +591,7 @@ def calculate_count(calc: Dict, buildings_df: pd.DataFrame,
     field = calc.get('field')
     dataset = calc.get('dataset', 'buildings')
     groupby = calc.get('groupby')
-    df = buildings_df if dataset == 'buildings' else financial_df
-    
-    if time_period:
-        if 'year' in time_period and dataset == 'financial':
-            df = df[pd.to_datetime(df['Date']).dt.year == time_period['year']]
+    df, _ = _calculation_rows(dataset, buildings_df, financial_df, time_period)
     
     if df.empty:
         return {"error": "No data found for the specified criteria"}
@@ -640,25 +612,25 @@ def calculate_trend(calc: Dict, buildings_df: pd.DataFrame,
     """Calculate trend over time."""
     field = calc.get('field')
     building_id = calc.get('building_id')
-    df = financial_df  # Trends are always from financial data
-    
-    # Filter for specific building if provided
-    if building_id:
-        df = df[df['Building ID'] == building_id]
-    
-    # Apply time period filter
-    if time_period:
-        if 'year' in time_period:
-            df = df[pd.to_datetime(df['Date']).dt.year == time_period['year']]
-        if 'start_date' in time_period and 'end_date' in time_period:
-            df = df[(df['Date'] >= time_period['start_date']) & 
-                   (df['Date'] <= time_period['end_date'])]
-    
+    time_period = time_period or {}
+    has_range = 'start_date' in time_period and 'end_date' in time_period
+
+    # Trends are always from financial data: the building's block, narrowed to the time period
+    df = financial_dataset(financial_df).select(
+        building_id=building_id or None,
+        year=time_period.get('year'),
+        start_date=time_period['start_date'] if has_range else None,
+        end_date=time_period['end_date'] if has_range else None,
+    )
+    return _trend_result(df, field)
+
+
+def _trend_result(df: pd.DataFrame, field: str) -> Dict:
+    """Per-date mean/min/max of a field over already selected financial rows"""
     if df.empty:
         return {"error": "No data found for the specified criteria"}
     
     # Group by date and calculate statistics
-    df['Date'] = pd.to_datetime(df['Date'])
     trend_data = df.groupby('Date')[field].agg(['mean', 'min', 'max']).reset_index()
     
     return {
@@ -672,6 +644,174 @@ def calculate_trend(calc: Dict, buildings_df: pd.DataFrame,
     }
 
 
+# Calculation type -> pandas aggregations it needs over its rows, and when grouped
+_CALCULATION_AGGREGATIONS = {
+    'max': (['max', 'idxmax'], ['max']),
+    'min': (['min', 'idxmin'], ['min']),
+    'sum': (['sum'], ['sum']),
+    'average': (['mean'], ['mean']),
+    'count': (['size'], ['count']),
+}
+
+
+def _financial_scope(prepared: FinancialDataset, query_plan: Dict, building_id: Optional[str] = None) -> pd.DataFrame:
+    """Financial rows in a plan's time period (and one building's block), with its financial filters applied"""
+    time_period = query_plan.get('time_period') or {}
+    has_range = 'start_date' in time_period and 'end_date' in time_period
+    financial_view = prepared.select(
+        building_id=building_id,
+        year=time_period.get('year'),
+        start_date=time_period['start_date'] if has_range else None,
+        end_date=time_period['end_date'] if has_range else None,
+    )
+    for filter_condition in query_plan.get('filters') or []:
+        if filter_condition.get('dataset') == 'financial':
+            financial_view = apply_filter(financial_view, filter_condition)
+    return financial_view
+
+
+def apply_query_scope(query_plan: Dict, buildings_df: pd.DataFrame, financial_df: pd.DataFrame):
+    """
+    Apply a plan's filters and time period once
+
+    The time period is a slice of the prepared financial dataset; filters are then applied to each view.
+
+    :return: (buildings view, financial view)
+    """
+    financial_view = _financial_scope(financial_dataset(financial_df), query_plan)
+    buildings_view = buildings_df
+    for filter_condition in query_plan.get('filters') or []:
+        if filter_condition.get('dataset') == 'buildings':
+            buildings_view = apply_filter(buildings_view, filter_condition)
+    return buildings_view, financial_view
+
+
+def _calculation_name(calc: Dict, names: set) -> str:
+    building = f"for {calc['building_id']}" if calc.get('building_id') else None
+    name = calc.get('name') or ' '.join(part for part in [calc.get('type'), 'of', calc.get('field'), building] if part)
+    unique, suffix = name, 2
+    while unique in names:
+        unique, suffix = f"{name} ({suffix})", suffix + 1
+    names.add(unique)
+    return unique
+
+
+def run_calculations(calculations: List[Dict], buildings_view: pd.DataFrame,
+                     financial_view: pd.DataFrame) -> List[Any]:
+    """
+    All of a plan's calculations over the already filtered views, in one grouped pass per grouping
+
+    Calculations on the same dataset and grouping (overall, per building, per groupby column) share a
+    single agg call; each result has the shape the matching calculate_* function returns.
+
+    :return: One result per calculation, in order
+    """
+    views = {'buildings': buildings_view, 'financial': financial_view}
+    columns = {'buildings': list(buildings_view.columns),
+               'financial': [col for col in financial_view.columns if col not in ('year', 'month', 'yyyymm')]}
+
+    # (dataset, grouping keys) -> {field: aggregations}
+    batches: Dict[tuple, Dict[str, List[str]]] = {}
+    plans = []
+    for calc in calculations:
+        calc_type, field = calc.get('type'), calc.get('field')
+        dataset = 'buildings' if calc.get('dataset', 'buildings') == 'buildings' else 'financial'
+        if calc_type not in _CALCULATION_AGGREGATIONS or field not in views[dataset].columns:
+            plans.append(None)
+            continue
+        base = ('Building ID',) if calc.get('building_id') and dataset == 'financial' else ()
+        overall_ops, grouped_ops = _CALCULATION_AGGREGATIONS[calc_type]
+        levels = [(base, overall_ops)]
+        if calc.get('groupby'):
+            levels.append((base + (calc['groupby'],), grouped_ops))
+        for keys, ops in levels:
+            requested = batches.setdefault((dataset, keys), {}).setdefault(field, [])
+            requested.extend(op for op in ops if op not in requested)
+        plans.append((dataset, base, calc_type, field))
+
+    aggregates = {}
+    for (dataset, keys), spec in batches.items():
+        view = views[dataset]
+        if keys:
+            aggregates[(dataset, keys)] = view.groupby(list(keys), observed=True).agg(spec)
+        else:
+            aggregates[(dataset, keys)] = {
+                field: {op: len(view) if op == 'size' else getattr(view[field], op)() for op in ops}
+                for field, ops in spec.items()
+            }
+
+    results = []
+    for calc, plan in zip(calculations, plans):
+        if plan is None:
+            results.append({"error": f"Unsupported calculation: {calc.get('type')} of {calc.get('field')}"})
+            continue
+        dataset, base, calc_type, field = plan
+        view = views[dataset]
+
+        if base:
+            overall = aggregates[(dataset, base)]
+            if calc['building_id'] not in overall.index:
+                results.append({"error": "No data found for the specified criteria"})
+                continue
+            stats = overall.loc[calc['building_id'], field]
+        elif view.empty:
+            results.append({"error": "No data found for the specified criteria"})
+            continue
+        else:
+            stats = aggregates[(dataset, base)][field]
+
+        grouped = None
+        if calc.get('groupby'):
+            grouped = aggregates[(dataset, base + (calc['groupby'],))][field]
+            if base:
+                grouped = grouped.xs(calc['building_id'], level='Building ID')
+            grouped = grouped[_CALCULATION_AGGREGATIONS[calc_type][1][0]].to_dict()
+
+        if calc_type in ('max', 'min'):
+            row = view.loc[stats[f'idx{calc_type}'], columns[dataset]]
+            results.append({
+                "value": stats[calc_type],
+                "building_id": row.get('Building ID'),
+                "location": row.get('Location') if 'Location' in row else None,
+                "context": row.to_dict()
+            })
+        elif calc_type == 'sum':
+            results.append({"grouped_sums": grouped, "total": sum(grouped.values())} if grouped is not None
+                           else {"total": stats['sum']})
+        elif calc_type == 'average':
+            results.append({"grouped_averages": grouped, "overall_average": stats['mean']} if grouped is not None
+                           else {"average": stats['mean']})
+        else:
+            results.append({"grouped_counts": grouped, "total_count": stats['size']} if grouped is not None
+                           else {"count": stats['size']})
+    return results
+
+
+def execute_calculations(query_plan: Dict, buildings_df: pd.DataFrame, financial_df: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Every calculation of a query plan over one filtered view of each dataset
+
+    :return: Calculation name -> result, in plan order
+    """
+    buildings_view, financial_view = apply_query_scope(query_plan, buildings_df, financial_df)
+    calculations = query_plan.get('calculations') or []
+    aggregate_calculations = [calc for calc in calculations if calc.get('type') != 'trend']
+    aggregate_results = iter(run_calculations(aggregate_calculations, buildings_view, financial_view))
+
+    results, names = {}, set()
+    for calc in calculations:
+        if calc.get('type') == 'trend':
+            # A building's trend is its block of the dataset prepared for financial_df, not a re-prepared view
+            building_id = calc.get('building_id') or None
+            rows = _financial_scope(financial_dataset(financial_df), query_plan, building_id) if building_id \
+                else financial_view
+            result = _trend_result(rows, calc.get('field'))
+        else:
+            result = next(aggregate_results)
+        results[_calculation_name(calc, names)] = convert_numpy_types(result)
+    return results
+
+
 def parse_user_query_with_gpt(user_message: str, system_prompt: str) -> dict:
     """
     Use GPT to parse user queries into structured actions.
@@ -710,67 +850,37 @@ def parse_user_query_with_gpt(user_message: str, system_prompt: str) -> dict:
         print(f"Error in parse_user_query_with_gpt: {e}")
         return {"error": str(e)}
 
-def execute_data_query(query: dict, buildings_data: pd.DataFrame, financial_data: pd.DataFrame) -> Dict:
-    """
-    Execute the data query on the provided datasets.
-    """
-    if not isinstance(query, dict):
-        raise ValueError("Query must be a dictionary")
-    
-    # Handle potential error from previous step
-    if 'error' in query:
-        return query
-    
-    # Check if query_plan exists
-    if 'query_plan' not in query:
-        # For queries without a detailed query plan, try to infer the intent
-        return execute_flexible_query(query, buildings_data, financial_data)
-    
-    query_plan = query['query_plan']
-    
-    # Ensure calculations are present
-    if 'calculations' not in query_plan or not query_plan['calculations']:
-        # If no calculations, try flexible query approach
-        return execute_flexible_query(query, buildings_data, financial_data)
-    
-    # Get the first calculation (assuming single calculation for now)
-    calculation = query_plan['calculations'][0]
-    
-    # Mapping of calculation types to their respective functions
-    calculation_map = {
-        'min': calculate_min,
-        'max': calculate_max,
-        'count': calculate_count,
-        'average': calculate_average,
-        'sum': calculate_sum,
-        'trend': calculate_trend
-    }
-    
-    # Get the calculation function
-    calc_func = calculation_map.get(calculation['type'])
-    
-    if not calc_func:
-        raise ValueError(f"Unsupported calculation type: {calculation['type']}")
-    
-    # Perform the calculation
-    result = calc_func({
-        'field': calculation['field'],
-        'dataset': calculation.get('dataset', 'buildings'),
-        'building_id': calculation.get('building_id')
-    }, buildings_data, financial_data, query_plan.get('time_period'))
-    
-    # Convert NumPy types to standard Python types
-    result = convert_numpy_types(result)
-    
-    return {
-        "result": result,
-        "query": query
-    }
-
 import re
 import pandas as pd
 import numpy as np
 
+# Query words that select an operation
+FLEXIBLE_OPERATION_TRIGGERS = {
+    'count': ['how many', 'count', 'number of'],
+    'sum': ['total', 'sum', 'aggregate'],
+    'average': ['average', 'mean', 'typical'],
+    'max': ['highest', 'maximum', 'largest', 'most'],
+    'min': ['lowest', 'minimum', 'smallest', 'least']
+}
+_FLEXIBLE_AGGREGATIONS = {'sum': 'sum', 'average': 'mean', 'max': 'max', 'min': 'min'}
+
+
+def _word_tokens(text: str) -> List[str]:
+    """Lower-case alphanumeric tokens, plurals folded ('Costs (USD)' -> ['cost', 'usd'])"""
+    return [token[:-1] if len(token) > 3 and token.endswith('s') else token
+            for token in re.findall(r'[a-z0-9]+', text.lower())]
+
+
+@lru_cache(maxsize=64)
+def column_token_index(columns: tuple) -> Dict[str, List[str]]:
+    """Token -> columns whose name contains it, built once per set of column names"""
+    index: Dict[str, List[str]] = {}
+    for column in columns:
+        for token in set(_word_tokens(column)):
+            index.setdefault(token, []).append(column)
+    return index
+
+
 def execute_flexible_query(query: dict, *dataframes: pd.DataFrame) -> Dict:
     """
     Dynamically analyze and process queries across multiple dataframes.
@@ -779,6 +889,9 @@ def execute_flexible_query(query: dict, *dataframes: pd.DataFrame) -> Dict:
     - No hard-coded questions
     - Flexible query interpretation
     - Generic data operations
+
+    Query words are looked up in a token index of the column names, each dataframe is filtered
+    with one mask, and each detected operation is one reduction over all its candidate numeric columns.
     """
     user_query = query.get('user_query', '').lower()
     
@@ -790,26 +903,15 @@ def execute_flexible_query(query: dict, *dataframes: pd.DataFrame) -> Dict:
         'grouping_candidates': []
     }
     
-    # Dynamic column identification
-    def identify_potential_columns(dataframes):
-        all_columns = set()
-        for df in dataframes:
-            all_columns.update(df.columns)
-        return [col for col in all_columns if any(word.lower() in col.lower() for word in user_query.split())]
-    
-    elements['column_candidates'] = identify_potential_columns(dataframes)
+    # Column identification through the token index, in column order
+    all_columns = tuple(dict.fromkeys(col for df in dataframes for col in df.columns))
+    index = column_token_index(all_columns)
+    matched = {col for token in set(_word_tokens(user_query)) for col in index.get(token, [])}
+    elements['column_candidates'] = [col for col in all_columns if col in matched]
     
     # Semantic operation detection
-    operation_map = {
-        'count': ['how many', 'count', 'number of'],
-        'sum': ['total', 'sum', 'aggregate'],
-        'average': ['average', 'mean', 'typical'],
-        'max': ['highest', 'maximum', 'largest', 'most'],
-        'min': ['lowest', 'minimum', 'smallest', 'least']
-    }
-    
     elements['operation_types'] = [
-        op for op, triggers in operation_map.items() 
+        op for op, triggers in FLEXIBLE_OPERATION_TRIGGERS.items()
         if any(trigger in user_query for trigger in triggers)
     ]
     
@@ -817,53 +919,32 @@ def execute_flexible_query(query: dict, *dataframes: pd.DataFrame) -> Dict:
     if not elements['operation_types']:
         elements['operation_types'] = ['average']  # Default fallback
     
-    # Dynamic filtering
-    def apply_dynamic_filters(dataframes):
-        filtered_dfs = []
-        for df in dataframes:
-            for col in elements['column_candidates']:
-                # Try text-based filtering
-                text_filters = [val for val in elements['numeric_values'] if val.isalpha()]
-                if text_filters:
-                    df = df[df[col].astype(str).str.contains('|'.join(text_filters), case=False)]
-                
-                # Try numeric filtering
-                numeric_filters = [float(val.replace(',', '')) for val in elements['numeric_values'] if val.replace(',', '').isnumeric()]
-                if numeric_filters:
-                    df = df[df[col].isin(numeric_filters)]
-            
-            filtered_dfs.append(df)
-        return filtered_dfs
-    
-    filtered_dataframes = apply_dynamic_filters(dataframes)
-    
-    # Generic data operation
-    def perform_generic_operation(dataframes):
-        results = {}
-        for df in dataframes:
-            for col in elements['column_candidates']:
-                for op in elements['operation_types']:
-                    try:
-                        if op == 'count':
-                            result = len(df)
-                        elif op == 'sum':
-                            result = df[col].sum() if pd.api.types.is_numeric_dtype(df[col]) else None
-                        elif op == 'average':
-                            result = df[col].mean() if pd.api.types.is_numeric_dtype(df[col]) else None
-                        elif op == 'max':
-                            result = df[col].max() if pd.api.types.is_numeric_dtype(df[col]) else None
-                        elif op == 'min':
-                            result = df[col].min() if pd.api.types.is_numeric_dtype(df[col]) else None
-                        
-                        if result is not None:
-                            results[f"{op.capitalize()} of {col}"] = result
-                    except Exception:
-                        continue
-        
-        return results
+    numeric_filters = [float(val.replace(',', '')) for val in elements['numeric_values']
+                       if val.replace(',', '').isnumeric()]
+    aggregations = [_FLEXIBLE_AGGREGATIONS[op] for op in elements['operation_types'] if op in _FLEXIBLE_AGGREGATIONS]
     
-    # Execute analysis
-    analysis_results = perform_generic_operation(filtered_dataframes)
+    analysis_results = {}
+    for df in dataframes:
+        columns = [col for col in elements['column_candidates'] if col in df.columns]
+        if not columns:
+            continue
+        
+        numeric_columns = [col for col in columns if pd.api.types.is_numeric_dtype(df[col])]
+        
+        # One mask per dataframe: rows whose numeric candidate columns all hold a number from the query
+        if numeric_filters and numeric_columns:
+            df = df[df[numeric_columns].isin(numeric_filters).all(axis=1)]
+        
+        # Every detected reduction over every numeric candidate in one DataFrame.agg: functions x columns
+        functions = list(dict.fromkeys(aggregations))
+        aggregated = df[numeric_columns].agg(functions) if functions and numeric_columns else None
+        
+        for col in columns:
+            for op in elements['operation_types']:
+                if op == 'count':
+                    analysis_results[f"Count of {col}"] = len(df)
+                elif op in _FLEXIBLE_AGGREGATIONS and col in numeric_columns:
+                    analysis_results[f"{op.capitalize()} of {col}"] = aggregated.at[_FLEXIBLE_AGGREGATIONS[op], col]
     
     return {
         "result": analysis_results,
@@ -874,6 +955,9 @@ def execute_flexible_query(query: dict, *dataframes: pd.DataFrame) -> Dict:
 def execute_data_query(query: dict, buildings_data: pd.DataFrame, financial_data: pd.DataFrame) -> Dict:
     """
     Execute the data query on the provided datasets.
+
+    All calculations of the plan run over one filtered view; a single calculation's result is
+    returned as is, several are keyed by calculation name.
     """
     if not isinstance(query, dict):
         raise ValueError("Query must be a dictionary")
@@ -894,37 +978,14 @@ def execute_data_query(query: dict, buildings_data: pd.DataFrame, financial_data
         # If no calculations, try flexible query approach
         return execute_flexible_query(query, buildings_data, financial_data)
     
-    # Get the first calculation (assuming single calculation for now)
-    calculation = query_plan['calculations'][0]
-    
-    # Mapping of calculation types to their respective functions
-    calculation_map = {
-        'min': calculate_min,
-        'max': calculate_max,
-        'count': calculate_count,
-        'average': calculate_average,
-        'sum': calculate_sum,
-        'trend': calculate_trend
-    }
-    
-    # Get the calculation function
-    calc_func = calculation_map.get(calculation['type'])
-    
-    if not calc_func:
+    supported = set(_CALCULATION_AGGREGATIONS) | {'trend'}
+    if not any(calc.get('type') in supported for calc in query_plan['calculations']):
         return execute_flexible_query(query, buildings_data, financial_data)
     
-    # Perform the calculation
-    result = calc_func({
-        'field': calculation['field'],
-        'dataset': calculation.get('dataset', 'buildings'),
-        'building_id': calculation.get('building_id')
-    }, buildings_data, financial_data, query_plan.get('time_period'))
-    
-    # Convert NumPy types to standard Python types
-    result = convert_numpy_types(result)
+    results = execute_calculations(query_plan, buildings_data, financial_data)
     
     return {
-        "result": result,
+        "result": next(iter(results.values())) if len(results) == 1 else results,
         "query": query
     }
 
@@ -932,8 +993,8 @@ def generate_response_with_gpt(data_result: Dict, user_message: str, system_prom
     """
     Generate a natural language response using GPT.
     """
-    # Ensure data_result is fully converted to JSON-serializable types
-    result_str = json.dumps(convert_numpy_types(data_result), indent=2)
+    # Compact JSON, digested when the full result would exceed the narration token budget
+    result_str = digest_result(convert_numpy_types(data_result), Config.NARRATIVE_DIGEST_TOKEN_BUDGET)
     
     messages = [
         {"role": "system", "content": system_prompt},
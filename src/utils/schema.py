@@ -0,0 +1,91 @@
+from sqlalchemy import MetaData, Table, Column, Integer, BigInteger, String, Float, DateTime, Boolean, ForeignKey, Date, Index, func
+
+# Initialize metadata
+metadata = MetaData()
+
+# Define the 'buildings' table
+buildings = Table(
+    "buildings", metadata,
+    Column("building_id", String(10), primary_key=True),
+    Column("city", String(100)),
+    Column("address", String(255)),
+    Column("country", String(100)),
+    Column("region", String(100)),
+    Column("size", Float),
+    Column("floors", Integer),
+    Column("purpose", String(50)),
+    Column("ownership", String(50)),
+    Column("year_built", Integer),
+    Column("market_rate", Float),
+    Column("employee_capacity", Integer),
+    Column("energy_target", Float),
+    Column("leed_certified", Boolean)
+)
+
+# Define the 'financials' table
+financials = Table(
+    "financials", metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("building_id", String(10), ForeignKey("buildings.building_id"), nullable=False),
+    Column("date", Date, nullable=False),
+    Column("lease_cost", Float),
+    Column("total_operating_expense", Float),
+    Column("energy_costs", Float),
+    Column("utilities_costs", Float),
+    Column("maintenance_costs", Float),
+    Column("catering_costs", Float),
+    Column("cleaning_costs", Float),
+    Column("security_costs", Float),
+    Column("insurance_costs", Float),
+    Column("waste_disposal_costs", Float),
+    Column("other_costs", Float),
+    # Natural key the bulk loader upserts on
+    Index("financials_natural_key", "building_id", "date", unique=True)
+)
+
+# Define the 'floor_occupancy' table
+floor_occupancy = Table(
+    "floor_occupancy", metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("building_id", String(10), ForeignKey("buildings.building_id"), nullable=False),
+    Column("floor", Integer, nullable=False),
+    Column("max_capacity", Integer, nullable=False),
+    Index("floor_occupancy_natural_key", "building_id", "floor", unique=True)
+)
+
+# Define the 'floor_utilization' table, range-partitioned by month on time.
+# The primary key must include the partition key; partitions are created by
+# create_future_partitions() and by the bulk loader for the months it loads.
+floor_utilization = Table(
+    "floor_utilization", metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("building_id", String(10), ForeignKey("buildings.building_id"), nullable=False),
+    Column("floor", Integer, nullable=False),
+    Column("time", DateTime, primary_key=True, nullable=False),
+    Column("occupancy", Integer, nullable=False),
+    # Natural key the bulk loader upserts on; also the (building_id, floor, time) lookup index
+    Index("floor_utilization_natural_key", "building_id", "floor", "time", unique=True),
+    Index("floor_utilization_time_brin", "time", postgresql_using="brin"),
+    postgresql_partition_by="RANGE (time)"
+)
+
+# Define the 'energy_consumption' table, partitioned like floor_utilization
+energy_consumption = Table(
+    "energy_consumption", metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("building_id", String(10), ForeignKey("buildings.building_id"), nullable=False),
+    Column("floor", Integer, nullable=False),
+    Column("time", DateTime, primary_key=True, nullable=False),
+    Column("energy", Float, nullable=False),
+    Index("energy_consumption_natural_key", "building_id", "floor", "time", unique=True),
+    Index("energy_consumption_time_brin", "time", postgresql_using="brin"),
+    postgresql_partition_by="RANGE (time)"
+)
+
+# Define the 'data_versions' table (bumped by the loaders, read by the query result cache)
+data_versions = Table(
+    "data_versions", metadata,
+    Column("table_name", String(64), primary_key=True),
+    Column("version", BigInteger, nullable=False, server_default="0"),
+    Column("updated_at", DateTime, nullable=False, server_default=func.now())
+)
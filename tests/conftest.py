@@ -33,4 +33,85 @@ def sample_financial_df():
         'Cleaning Costs (USD)': [5000, 5500, 4500],
         'Utilities Costs (USD)': [15000, 16000, 14000],
         'Maintenance Costs (USD)': [10000, 11500, 9500]
-    })
\ No newline at end of file
+    })
+
+
+FINANCIAL_COST_COLUMNS = ['Energy Costs (USD)', 'Utilities Costs (USD)', 'Maintenance Costs (USD)',
+                          'Catering Costs (USD)', 'Cleaning Costs (USD)', 'Security Costs (USD)',
+                          'Insurance Costs (USD)', 'Waste Disposal Costs (USD)', 'Other Costs (USD)']
+
+
+@pytest.fixture
+def full_financial_df():
+    """Two buildings, monthly rows: B001 for 2022-2023, B002 for 2023 only"""
+    rows = []
+    for building_id, start, months in [('B001', '2022-01-01', 24), ('B002', '2023-01-01', 12)]:
+        for month, date in enumerate(pd.date_range(start, periods=months, freq='MS')):
+            costs = {col: 100 + 10 * month + index for index, col in enumerate(FINANCIAL_COST_COLUMNS)}
+            rows.append({'Building ID': building_id, 'Date': date,
+                         'Total Operating Expense (USD)': sum(costs.values()), **costs})
+    return pd.DataFrame(rows)
+
+
+@pytest.fixture
+def full_buildings_df():
+    """Buildings with every column BuildingsModule requires, LEED as exported ('Checked' or blank)"""
+    return pd.DataFrame({
+        'Building ID': ['B001', 'B002', 'B003', 'B004'],
+        'Location': ['new york, ny', 'Chicago, IL', 'San Francisco, CA', 'New Haven, CT'],
+        'Size': [50000, 75000, 8000, 120000],
+        'Purpose': ['Office', 'Retail', 'Mixed-Use Office', 'Office'],
+        'Ownership': ['Corporate', 'Private', 'REIT', 'Corporate'],
+        'Year Built': [1990, 2005, 2015, 1975],
+        'LEED Certified': ['Checked', None, 'Checked', '']
+    })
+
+
+class FakeCursor:
+    """psycopg2-shaped cursor that records statements and COPY payloads
+
+    fetchone() returns the first `answers` row whose key occurs in the last statement, else `default`.
+    """
+
+    def __init__(self):
+        self.statements = []
+        self.copied = []
+        self.rowcount = 0
+        self.answers = {"to_regclass": (None,)}
+        self.default = (None, None)
+
+    def execute(self, sql, params=None):
+        self.statements.append(sql)
+
+    def fetchone(self):
+        for fragment, row in self.answers.items():
+            if fragment in self.statements[-1]:
+                return row
+        return self.default
+
+    def copy_expert(self, sql, file_obj):
+        self.copied.append(file_obj.read())
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.cursor_obj = FakeCursor()
+        self.committed = False
+
+    def cursor(self):
+        return self.cursor_obj
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        pass
+
+
+@pytest.fixture
+def fake_connection():
+    """Loader connection whose cursor records every statement (see FakeCursor)"""
+    return FakeConnection()
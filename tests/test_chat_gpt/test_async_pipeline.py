@@ -0,0 +1,168 @@
+import asyncio
+import importlib
+from types import SimpleNamespace
+
+import pytest
+
+from src.chat_gpt import execution_backend
+from src.chat_gpt.execution_backend import SQLiteBackend
+from src.utils import columnar_cache
+from src.utils.columnar_cache import ColumnarCache
+from src.utils.config import Config
+
+
+class FakeStream:
+    def __init__(self, tokens):
+        self._chunks = [SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=token))], usage=None)
+                        for token in tokens]
+        self._chunks.append(SimpleNamespace(choices=[], usage=SimpleNamespace(prompt_tokens=7, completion_tokens=2)))
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self._chunks:
+            raise StopAsyncIteration
+        return self._chunks.pop(0)
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeCompletions:
+    """AsyncOpenAI chat.completions stand-in that records concurrency and cancellation"""
+
+    def __init__(self, delay=0.0, content="SELECT 1"):
+        self.delay = delay
+        self.content = content
+        self.active = 0
+        self.peak = 0
+        self.cancelled = 0
+
+    async def create(self, model, messages, stream=False, **kwargs):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.active -= 1
+        if stream:
+            return FakeStream(["Hello", " world"])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=self.content))],
+                               usage=SimpleNamespace(prompt_tokens=10, completion_tokens=5))
+
+
+@pytest.fixture(scope="module")
+def modules(tmp_path_factory):
+    """gpt_sql and async_pipeline, imported with their SQLite stores outside the working tree"""
+    store_dir = tmp_path_factory.mktemp("stores")
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("OPENAI_API_KEY", "test-key")
+        patch.setattr(Config, "SQL_CACHE_PATH", str(store_dir / "sql_cache.db"))
+        patch.setattr(Config, "REJECTED_PLANS_PATH", str(store_dir / "rejected_plans.db"))
+        gpt_sql = importlib.import_module("src.chat_gpt.gpt_sql")
+        async_pipeline = importlib.import_module("src.chat_gpt.async_pipeline")
+    return gpt_sql, async_pipeline
+
+
+def pipeline_with(async_pipeline, completions, **limits):
+    pipeline = async_pipeline.AsyncQuestionPipeline(**limits)
+    pipeline.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return pipeline
+
+
+def test_stage_concurrency_is_bounded(modules):
+    _, async_pipeline = modules
+    completions = FakeCompletions(delay=0.02)
+
+    async def burst():
+        pipeline = pipeline_with(async_pipeline, completions, sql_concurrency=2)
+        results = await asyncio.gather(*(pipeline.generate_sql(f"question {i}", use_cache=False) for i in range(6)))
+        return results, pipeline.metrics()["sql_generation"]
+
+    results, stage = asyncio.run(burst())
+    assert results == ["SELECT 1"] * 6
+    assert completions.peak == 2
+    assert stage["completed"] == 6 and stage["in_flight"] == 0
+
+
+def test_stage_timeout_cancels_the_call(modules):
+    _, async_pipeline = modules
+    completions = FakeCompletions(delay=5)
+
+    async def slow():
+        pipeline = pipeline_with(async_pipeline, completions, llm_timeout=0.05)
+        with pytest.raises(async_pipeline.StageTimeout):
+            await pipeline.generate_sql("question", use_cache=False)
+        return pipeline.metrics()["sql_generation"]
+
+    stage = asyncio.run(slow())
+    assert stage["timeouts"] == 1
+    assert completions.cancelled == 1
+
+
+def test_cancelling_the_task_cancels_the_stage(modules):
+    _, async_pipeline = modules
+    completions = FakeCompletions(delay=5)
+
+    async def cancel():
+        pipeline = pipeline_with(async_pipeline, completions)
+        task = asyncio.create_task(pipeline.analyze("question", ["n"], [(1,)]))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return pipeline.metrics()["narrative"]
+
+    stage = asyncio.run(cancel())
+    assert completions.cancelled == 1
+    assert stage["cancelled"] == 1 and stage["in_flight"] == 0
+
+
+def test_sync_functions_run_on_the_shared_pipeline(modules, tmp_path, monkeypatch):
+    gpt_sql, async_pipeline = modules
+    (tmp_path / "Buildings.csv").write_text(
+        "building_id,address,city,region,size,employee_capacity,market_rate\n"
+        "B001,1 Main St,Seattle,NA,1000,50,40\n"
+        "B002,2 Main St,Boston,NA,2000,80,45\n")
+    monkeypatch.setattr(columnar_cache, "_cache", ColumnarCache(str(tmp_path / "columnar_cache"), "pickle"))
+    monkeypatch.setattr(execution_backend, "_backend", SQLiteBackend(str(tmp_path), timeout_ms=2000))
+    _, pipeline = async_pipeline.shared_pipeline()
+    monkeypatch.setattr(pipeline, "client", SimpleNamespace(chat=SimpleNamespace(
+        completions=FakeCompletions(content="SELECT city, size FROM buildings ORDER BY size"))))
+
+    metrics = {}
+    sql_query = gpt_sql.generate_sql_query("Building sizes?", use_cache=False, metrics=metrics)
+    result = gpt_sql.execute_validated_query(sql_query, question="Building sizes?", metrics=metrics)
+    assert result["rows"] == [("Seattle", 1000), ("Boston", 2000)]
+    assert metrics["prompt_tokens"] == 10
+
+    narrative_metrics = {}
+    tokens = list(gpt_sql.analyze_data_with_gpt("Building sizes?", result["columns"], result["rows"],
+                                                 stream=True, metrics=narrative_metrics))
+    assert tokens == ["Hello", " world"]
+    assert "time_to_first_token" in narrative_metrics and narrative_metrics["completion_tokens"] == 2
+    assert pipeline.metrics()["narrative"]["in_flight"] == 0
+
+
+def test_failing_cached_sql_is_evicted(modules, tmp_path, monkeypatch):
+    gpt_sql, _ = modules
+    (tmp_path / "Buildings.csv").write_text("building_id,address,city,region,size,employee_capacity,market_rate\n"
+                                            "B001,1 Main St,Seattle,NA,1000,50,40\n")
+    monkeypatch.setattr(columnar_cache, "_cache", ColumnarCache(str(tmp_path / "columnar_cache"), "pickle"))
+    monkeypatch.setattr(execution_backend, "_backend", SQLiteBackend(str(tmp_path), timeout_ms=2000))
+    bad_sql = "SELECT missing_function(size) FROM buildings"
+    gpt_sql.remember_validated_sql("Broken question?", bad_sql)
+
+    result = gpt_sql.execute_validated_query(bad_sql, question="Broken question?")
+    assert "error" in result
+    assert gpt_sql.sql_cache.get("Broken question?") is None
+
+    gpt_sql.remember_validated_sql("Working question?", "SELECT city FROM buildings")
+    assert gpt_sql.execute_validated_query("SELECT city FROM buildings", question="Working question?")["rows"] == \
+        [("Seattle",)]
+    assert gpt_sql.sql_cache.get("Working question?") == "SELECT city FROM buildings"
@@ -0,0 +1,165 @@
+import asyncio
+from types import SimpleNamespace
+
+from src.chat_gpt.bounded_fetch import build_digest_query, fetch_bounded, fetch_bounded_async, inject_limit
+
+
+class FakeCursor:
+    def __init__(self, connection, name=None):
+        self.connection = connection
+        self.name = name
+        self.itersize = None
+        self.description = None
+        self._rows = []
+
+    def execute(self, sql):
+        self.connection.executed.append(sql)
+        if sql.startswith("SELECT COUNT(*)"):
+            self._rows = [(2500, 0, 120, 150000)]
+        else:
+            limit = int(sql.rsplit("LIMIT", 1)[1]) if "LIMIT" in sql else len(self.connection.rows)
+            self._rows = list(self.connection.rows[:limit])
+        self.description = [("floor", 25), ("occupancy", 23)][:len(self._rows[0])] if self._rows else []
+
+    def fetchmany(self, size):
+        batch, self._rows = self._rows[:size], self._rows[size:]
+        self.connection.fetch_sizes.append(size)
+        return batch
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.rows = rows
+        self.executed = []
+        self.fetch_sizes = []
+        self.cursor_names = []
+
+    def cursor(self, name=None):
+        self.cursor_names.append(name)
+        return FakeCursor(self, name)
+
+
+class FakeAsyncCursor:
+    def __init__(self, rows):
+        self._rows = rows
+
+    async def fetch(self, n):
+        batch, self._rows = self._rows[:n], self._rows[n:]
+        return batch
+
+
+class FakeStatement:
+    def __init__(self, connection, sql):
+        self.connection = connection
+        self.sql = sql
+
+    def get_attributes(self):
+        return [SimpleNamespace(name="floor", type=SimpleNamespace(oid=25)),
+                SimpleNamespace(name="occupancy", type=SimpleNamespace(oid=23))]
+
+    async def cursor(self):
+        limit = int(self.sql.rsplit("LIMIT", 1)[1])
+        return FakeAsyncCursor(self.connection.rows[:limit])
+
+
+class FakeAsyncConnection:
+    """asyncpg-shaped connection; records come back as tuples."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.executed = []
+
+    async def prepare(self, sql):
+        self.executed.append(sql)
+        return FakeStatement(self, sql)
+
+    async def fetchrow(self, sql):
+        self.executed.append(sql)
+        return (len(self.rows), 0, 120, 150000)
+
+    def transaction(self):
+        connection = self
+
+        class Transaction:
+            async def __aenter__(self):
+                connection.in_transaction = True
+
+            async def __aexit__(self, *exc):
+                connection.in_transaction = False
+
+        return Transaction()
+
+
+def test_inject_limit_only_when_missing():
+    """
+    Test that a LIMIT is appended only to row-returning queries without a top-level one
+    """
+    assert inject_limit("SELECT * FROM floor_utilization;", 100).endswith("LIMIT 100")
+    assert inject_limit("SELECT * FROM t ORDER BY x LIMIT 5", 100) == "SELECT * FROM t ORDER BY x LIMIT 5"
+    nested = "SELECT * FROM (SELECT * FROM t LIMIT 5) s"
+    assert inject_limit(nested, 100).endswith("LIMIT 100")
+    assert inject_limit("UPDATE t SET x = 1", 100) == "UPDATE t SET x = 1"
+
+
+def test_fetch_bounded_caps_rows_and_builds_digest():
+    """
+    Test that large results are cut at the cap and summarized in the database
+    """
+    conn = FakeConnection([(1, n) for n in range(2500)])
+    result = fetch_bounded(conn, "SELECT floor, occupancy FROM floor_utilization", max_rows=1000, batch_size=400)
+
+    assert len(result['rows']) == 1000
+    assert result['truncated'] is True
+    assert conn.cursor_names[0] is not None  # server-side named cursor
+    assert "LIMIT 1001" in conn.executed[0]
+    assert max(conn.fetch_sizes) <= 400
+    assert result['digest']['row_count'] == 2500
+    assert result['digest']['columns']['occupancy'] == {"min": 0, "max": 120, "sum": 150000}
+
+
+def test_fetch_bounded_small_result_has_no_digest():
+    """
+    Test that results under the cap are returned whole without a digest query
+    """
+    conn = FakeConnection([(1, 10), (2, 20)])
+    result = fetch_bounded(conn, "SELECT floor, occupancy FROM floor_utilization", max_rows=1000)
+
+    assert result['rows'] == [(1, 10), (2, 20)]
+    assert result['truncated'] is False
+    assert result['digest'] is None
+    assert len(conn.executed) == 1
+
+
+def test_build_digest_query_quotes_columns():
+    """
+    Test digest SQL shape
+    """
+    sql = build_digest_query("SELECT 1 AS \"a\"\"b\";", ['a"b'])
+    assert sql == 'SELECT COUNT(*), MIN("a""b"), MAX("a""b"), SUM("a""b") FROM (SELECT 1 AS "a""b") AS digest_source'
+
+
+def test_fetch_bounded_async_matches_sync_result_shape():
+    """
+    Test the asyncpg path caps rows, returns tuples and builds the same digest
+    """
+    conn = FakeAsyncConnection([(1, n) for n in range(2500)])
+    result = asyncio.run(fetch_bounded_async(conn, "SELECT floor, occupancy FROM floor_utilization",
+                                             max_rows=1000, batch_size=400))
+
+    assert result['columns'] == ["floor", "occupancy"]
+    assert len(result['rows']) == 1000 and result['rows'][0] == (1, 0)
+    assert result['truncated'] is True
+    assert "LIMIT 1001" in conn.executed[0]
+    assert result['digest']['columns'] == {"occupancy": {"min": 0, "max": 120, "sum": 150000}}
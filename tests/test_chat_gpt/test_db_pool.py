@@ -0,0 +1,74 @@
+import threading
+import pytest
+from src.chat_gpt.db_pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.rollbacks = 0
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = 1
+
+
+def test_pool_reuses_connections():
+    """
+    Test that a returned connection is handed out again instead of reconnecting
+    """
+    pool = ConnectionPool(FakeConnection, min_size=1, max_size=2)
+
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+
+    assert first is second
+    metrics = pool.metrics()
+    assert metrics['connections_created'] == 1
+    assert metrics['borrow_count'] == 2
+    assert metrics['in_use'] == 0
+    assert first.rollbacks == 2
+
+
+def test_pool_replaces_closed_connections():
+    """
+    Test that connections closed by the server are discarded on borrow
+    """
+    pool = ConnectionPool(FakeConnection, min_size=1, max_size=1)
+
+    conn = pool.getconn()
+    pool.putconn(conn)
+    conn.closed = 1
+
+    replacement = pool.getconn()
+    assert replacement is not conn
+    assert pool.metrics()['health_check_failures'] == 1
+
+
+def test_pool_times_out_when_exhausted():
+    """
+    Test that borrowing beyond max_size waits and then raises PoolTimeout
+    """
+    pool = ConnectionPool(FakeConnection, min_size=0, max_size=1, acquire_timeout=0.05)
+    pool.getconn()
+
+    with pytest.raises(PoolTimeout):
+        pool.getconn()
+    assert pool.metrics()['timeouts'] == 1
+
+
+def test_pool_wakes_waiters_on_return():
+    """
+    Test that a waiting borrower receives a connection as soon as one is returned
+    """
+    pool = ConnectionPool(FakeConnection, min_size=0, max_size=1, acquire_timeout=2)
+    conn = pool.getconn()
+
+    timer = threading.Timer(0.05, pool.putconn, args=(conn,))
+    timer.start()
+    assert pool.getconn() is conn
+    assert pool.metrics()['wait_count'] == 1
@@ -0,0 +1,72 @@
+import sqlite3
+
+from src.chat_gpt.metrics_store import MetricsStore, QuestionTrace, outcome_of
+
+
+def make_record(outcome, total_ms, sql_ms=None):
+    trace = QuestionTrace("how many buildings?")
+    if sql_ms is not None:
+        trace.set_stage_ms("sql_generation", sql_ms)
+    trace.add_tokens({"prompt_tokens": 300, "completion_tokens": 40})
+    record = trace.finish(outcome, row_count=3)
+    record["total_ms"] = total_ms
+    return record
+
+
+def test_success_rate_and_percentiles(tmp_path):
+    store = MetricsStore(str(tmp_path / "metrics.db"), flush_interval_seconds=3600)
+    for i in range(1, 101):
+        store.record(make_record("success" if i <= 90 else "error", total_ms=float(i), sql_ms=float(i) / 2))
+
+    assert store.success_rate() == 90.0
+    latency = store.latency_percentiles("total")
+    assert latency == {50: 51.0, 95: 96.0, 99: 100.0}
+    assert store.latency_percentiles("narrative") == {50: None, 95: None, 99: None}
+    assert store.recent(1)[0]["prompt_tokens"] == 300
+
+
+def test_counters_survive_restart(tmp_path):
+    """Outcome counts are persisted as deltas and reloaded on start."""
+    path = str(tmp_path / "metrics.db")
+    first = MetricsStore(path)
+    first.record(make_record("success", 10))
+    first.record(make_record("rejected", 20))
+    first.flush()
+
+    second = MetricsStore(path)
+    second.record(make_record("success", 30))
+    second.flush()
+    assert MetricsStore(path).summary()["outcomes"] == {"success": 2, "rejected": 1}
+
+
+def test_table_keeps_only_recent_questions(tmp_path):
+    store = MetricsStore(str(tmp_path / "metrics.db"), flush_interval_seconds=3600, max_rows=50)
+    for i in range(1, 201):
+        store.record(make_record("success", total_ms=float(i)))
+
+    assert store.latency_percentiles("total") == {50: 176.0, 95: 198.0, 99: 200.0}
+    assert len(store.recent(1000)) == 50
+    assert store.summary()["questions"] == 200
+
+
+def test_failed_flush_keeps_records(tmp_path, monkeypatch):
+    path = str(tmp_path / "metrics.db")
+    store = MetricsStore(path, flush_interval_seconds=3600)
+    store.record(make_record("success", 10))
+    connect = store._connect
+    monkeypatch.setattr(store, "_connect", lambda: (_ for _ in ()).throw(sqlite3.OperationalError("locked")))
+    store.flush()
+
+    monkeypatch.setattr(store, "_connect", connect)
+    store.record(make_record("error", 20))
+    store.flush()
+    assert [record["outcome"] for record in store.recent()] == ["error", "success"]
+    assert MetricsStore(path).summary()["outcomes"] == {"success": 1, "error": 1}
+
+
+def test_outcome_of():
+    assert outcome_of({"columns": ["a"], "rows": [(1,)]}) == "success"
+    assert outcome_of({"columns": ["a"], "rows": []}) == "no_data"
+    assert outcome_of({"error": "Query validation failed", "details": []}) == "validation_error"
+    assert outcome_of({"error": "Query rejected by cost guard", "rejected": True}) == "rejected"
+    assert outcome_of(None) == "error"
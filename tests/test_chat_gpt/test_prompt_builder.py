@@ -0,0 +1,66 @@
+from src.chat_gpt.prompt_builder import PromptBuilder, count_tokens, render_table_ddl
+
+METADATA = {
+    "buildings": {
+        "table_name": "buildings",
+        "columns": {
+            "building_id": {"type": "string", "description": "Unique identifier for each building.", "primary_key": True},
+            "city": {"type": "string", "description": "City where the building is located."},
+            "employee_capacity": {"type": "integer", "description": "Number of employees the building can accommodate."},
+        },
+    },
+    "financials": {
+        "table_name": "financials",
+        "columns": {
+            "building_id": {"type": "string", "description": "Reference to the Building ID.", "foreign_key": "buildings.building_id"},
+            "date": {"type": "date", "description": "Date of the financial record."},
+            "energy_costs": {"type": "float", "description": "Energy costs in USD for the specified period."},
+        },
+    },
+    "floor_utilization": {
+        "table_name": "floor_utilization",
+        "columns": {
+            "building_id": {"type": "string", "description": "Unique identifier for each building.", "foreign_key": "buildings.building_id"},
+            "floor": {"type": "integer", "description": "The floor number within the building."},
+            "time": {"type": "datetime", "description": "Timestamp of the utilization record."},
+            "occupancy": {"type": "integer", "description": "Number of occupants on the floor at the given time."},
+        },
+    },
+}
+
+
+def test_render_table_ddl_is_compact():
+    ddl = render_table_ddl(METADATA["financials"], comment_columns={"energy_costs"})
+    assert ddl == ("financials(building_id text REFERENCES buildings, date date, "
+                   "energy_costs numeric /* Energy costs in USD for the specified period */)")
+
+
+def test_only_relevant_tables_are_sent():
+    builder = PromptBuilder(METADATA)
+    prompt, stats = builder.build("What were the energy costs in 2023?")
+    assert stats["tables"] == ["financials"]
+    assert "floor_utilization(" not in prompt
+    assert "Occupancy/utilization" not in prompt
+
+    _, stats = builder.build("Which building has the highest employee capacity?")
+    assert stats["tables"] == ["buildings"]
+
+
+def test_follow_up_keeps_previous_table():
+    builder = PromptBuilder(METADATA)
+    context = {"previous_question": "How many people were on each floor?", "previous_field": "occupancy"}
+    prompt, stats = builder.build("and the lowest?", context)
+    assert "floor_utilization" in stats["tables"]
+    assert 'used field "occupancy"' in prompt
+
+
+def test_budget_trims_schema():
+    """Descriptions, then unmatched columns, then tables are dropped to fit the budget."""
+    builder = PromptBuilder(METADATA, token_budget=10_000)
+    full_prompt, full_stats = builder.build("hello")
+    assert full_stats["level"] == 0
+
+    builder.token_budget = full_stats["prompt_tokens"] - 1
+    prompt, stats = builder.build("hello")
+    assert stats["prompt_tokens"] <= builder.token_budget
+    assert stats["prompt_tokens"] == count_tokens(prompt)
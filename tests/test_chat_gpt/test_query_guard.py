@@ -0,0 +1,141 @@
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+
+from src.chat_gpt import execution_backend
+from src.chat_gpt.execution_backend import PostgresBackend
+from src.chat_gpt.query_guard import QueryRejected, RejectedPlanLog, check_plan
+from src.utils.config import Config
+
+CROSS_JOIN_PLAN = {
+    "Node Type": "Aggregate", "Total Cost": 2.5e10, "Plan Rows": 1,
+    "Plans": [{
+        "Node Type": "Nested Loop", "Total Cost": 1.9e10, "Plan Rows": 1e12,
+        "Plans": [{"Node Type": "Seq Scan", "Total Cost": 18000, "Plan Rows": 1e6},
+                  {"Node Type": "Seq Scan", "Total Cost": 18000, "Plan Rows": 1e6}],
+    }],
+}
+
+
+def test_cross_join_is_rejected_on_cost():
+    with pytest.raises(QueryRejected) as excinfo:
+        check_plan(CROSS_JOIN_PLAN, max_cost=5e6, max_rows=5e7)
+    assert excinfo.value.total_cost == 2.5e10
+    assert excinfo.value.plan_rows == 1e12
+
+
+def test_rejected_plans_are_recorded(tmp_path):
+    log = RejectedPlanLog(str(tmp_path / "rejected.db"))
+    try:
+        check_plan(CROSS_JOIN_PLAN, max_cost=5e6, max_rows=5e7)
+    except QueryRejected as rejection:
+        log.record("SELECT COUNT(*) FROM floor_utilization a, floor_utilization b", rejection, 5e6, 5e7,
+                   question="how many pairs?")
+
+    recent = log.recent()
+    assert len(recent) == 1
+    assert recent[0]["total_cost"] == 2.5e10
+    assert recent[0]["question"] == "how many pairs?"
+
+
+class PlanningConnection:
+    """
+    psycopg2-shaped connection that answers EXPLAIN with a fixed plan and records every statement
+
+    digest_plan, when set, answers EXPLAIN of the digest query instead.
+    """
+
+    def __init__(self, plan, rows=((1,),), digest_plan=None):
+        self.plan = plan
+        self.rows = list(rows)
+        self.digest_plan = digest_plan
+        self.executed = []
+
+    def cursor(self, name=None):
+        connection = self
+
+        class Cursor:
+            description = [("n", 23)]
+            itersize = None
+
+            def __init__(self):
+                self._rows = list(connection.rows)
+                self._sql = ""
+
+            def execute(self, sql, params=None):
+                connection.executed.append(sql)
+                self._sql = sql
+
+            def fetchone(self):
+                if self._sql.startswith("EXPLAIN") and "AS digest_source" in self._sql and connection.digest_plan:
+                    return [[{"Plan": connection.digest_plan}]]
+                if self._sql.startswith("EXPLAIN"):
+                    return [[{"Plan": connection.plan}]]
+                return (len(connection.rows), 0, 1, len(connection.rows))
+
+            def fetchmany(self, size):
+                batch, self._rows = self._rows[:size], self._rows[size:]
+                return batch
+
+            def fetchall(self):
+                return self._rows
+
+            def close(self):
+                pass
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+        return Cursor()
+
+
+def use_connection(monkeypatch, connection):
+    @contextmanager
+    def borrow():
+        yield connection
+
+    monkeypatch.setattr(execution_backend, "get_pool", lambda: SimpleNamespace(connection=borrow))
+    monkeypatch.setattr(Config, "STATEMENT_TIMEOUT_MS", 15000)
+    monkeypatch.setattr(Config, "QUERY_GUARD_ENABLED", True)
+    monkeypatch.setattr(Config, "MAX_QUERY_COST", 5e6)
+    monkeypatch.setattr(Config, "MAX_QUERY_ROWS", 5e7)
+
+
+def test_digest_of_a_limited_cross_join_is_not_run(monkeypatch):
+    """A Limit over a cross join passes the guard, but the digest would read the whole join."""
+    limited_plan = {"Node Type": "Limit", "Total Cost": 40, "Plan Rows": 11, "Plans": [CROSS_JOIN_PLAN["Plans"][0]]}
+    connection = PlanningConnection(limited_plan, rows=[(n,) for n in range(11)], digest_plan=CROSS_JOIN_PLAN)
+    use_connection(monkeypatch, connection)
+
+    result = PostgresBackend().execute("SELECT a.floor FROM floor_utilization a, floor_utilization b", 10)
+    assert result["truncated"] and result["row_count"] == 10
+    assert result["digest"] is None
+    assert connection.executed[-1].startswith("EXPLAIN (FORMAT JSON) SELECT COUNT(*)")
+    assert not any(sql.startswith("SELECT COUNT(*)") for sql in connection.executed)
+
+    # Within the limits the digest runs as before
+    connection.digest_plan = {"Node Type": "Aggregate", "Total Cost": 500, "Plan Rows": 1}
+    result = PostgresBackend().execute("SELECT a.floor FROM floor_utilization a, floor_utilization b", 10)
+    assert result["digest"]["row_count"] == 11
+    assert connection.executed[-1].startswith("SELECT COUNT(*)")
+
+
+def test_result_pages_run_under_timeout_and_guard(monkeypatch):
+    connection = PlanningConnection(CROSS_JOIN_PLAN)
+    use_connection(monkeypatch, connection)
+    sql = "SELECT COUNT(*) FROM floor_utilization a, floor_utilization b"
+
+    with pytest.raises(QueryRejected):
+        PostgresBackend().fetch_page(sql, 3, 100)
+    assert connection.executed[0].startswith("SET LOCAL statement_timeout")
+    assert connection.executed[1].startswith("EXPLAIN (FORMAT JSON) SELECT * FROM (")
+    assert "LIMIT 100 OFFSET 300" in connection.executed[1]
+    assert len(connection.executed) == 2
+
+    connection.plan = {"Node Type": "Limit", "Total Cost": 40, "Plan Rows": 100}
+    page = PostgresBackend().fetch_page(sql, 3, 100)
+    assert page["rows"] == [(1,)] and page["page"] == 3
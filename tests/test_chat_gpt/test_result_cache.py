@@ -0,0 +1,64 @@
+import pytest
+from src.chat_gpt.result_cache import ResultCache, normalize_sql
+
+
+def test_normalize_sql_ignores_formatting():
+    """
+    Test that whitespace, case, comments and numeric formatting do not change the key
+    """
+    a = "SELECT building_id, size FROM buildings WHERE size > 1000.50;"
+    b = "select  building_id,\n  SIZE\nfrom Buildings -- big ones\nwhere size>01000.5"
+    assert normalize_sql(a) == normalize_sql(b)
+
+
+def test_normalize_sql_keeps_literal_semantics():
+    """
+    Test that string contents and integer/decimal literals are preserved
+    """
+    assert normalize_sql("WHERE city = 'New York'") != normalize_sql("WHERE city = 'new york'")
+    assert normalize_sql("SELECT 5 / 2") != normalize_sql("SELECT 5 / 2.0")
+    assert normalize_sql("SELECT 2.00") == normalize_sql("SELECT 2.0")
+
+
+def test_result_cache_hits_and_invalidates_on_version_bump():
+    """
+    Test that a data version bump drops entries for that table only
+    """
+    cache = ResultCache(known_tables=['buildings', 'financials'])
+    result = {"columns": ["n"], "rows": [(43,)]}
+    other = {"columns": ["total"], "rows": [(1.0,)]}
+    versions = {"buildings": 1, "financials": 1}
+
+    cache.put("SELECT COUNT(*) AS n FROM buildings", versions, result)
+    cache.put("SELECT SUM(energy_costs) AS total FROM financials", versions, other)
+    assert cache.get("select count(*) as n from buildings", versions) is result
+
+    bumped = {"buildings": 2, "financials": 1}
+    assert cache.get("SELECT COUNT(*) AS n FROM buildings", bumped) is None
+    assert cache.get("SELECT SUM(energy_costs) AS total FROM financials", bumped) is other
+    assert cache.metrics()['invalidations'] == 1
+
+
+def test_result_cache_lru_and_memory_cap():
+    """
+    Test that the least recently used entry is evicted when limits are hit
+    """
+    cache = ResultCache(max_entries=2, known_tables=['buildings'])
+    for n in range(3):
+        cache.put(f"SELECT {n} FROM buildings", {}, {"columns": ["n"], "rows": [(n,)]})
+    assert cache.get("SELECT 0 FROM buildings", {}) is None
+    assert cache.get("SELECT 2 FROM buildings", {}) is not None
+
+    tiny = ResultCache(max_bytes=10)
+    tiny.put("SELECT 1", {}, {"columns": ["n"], "rows": [(1,)]})
+    assert tiny.metrics()['entries'] == 0
+
+
+def test_result_cache_ttl_expiry():
+    """
+    Test that entries expire after the TTL
+    """
+    cache = ResultCache(ttl_seconds=0)
+    cache.put("SELECT 1", {}, {"columns": ["n"], "rows": [(1,)]})
+    assert cache.get("SELECT 1", {}) is None
+    assert cache.metrics()['expirations'] == 1
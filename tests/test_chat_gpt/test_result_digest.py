@@ -0,0 +1,50 @@
+import json
+from datetime import date, timedelta
+from decimal import Decimal
+
+import numpy as np
+
+from src.chat_gpt.prompt_builder import count_tokens
+from src.chat_gpt.result_digest import digest_result, digest_rows, sample_indices
+
+
+def test_small_results_are_sent_exactly():
+    result = {"grouped_sums": {"B001": 120.5, "B002": 80.25}, "total": np.int64(3)}
+    assert json.loads(digest_result(result, 800)) == {"grouped_sums": {"B001": 120.5, "B002": 80.25}, "total": 3}
+
+    text = digest_rows(["building_id", "opex"], [("B001", Decimal("10.5")), ("B002", 7)], 800)
+    assert '["B001",10.5]' in text and '["B002",7]' in text
+    assert "digest" not in text
+
+
+def test_large_result_fits_budget_and_keeps_extremes():
+    grouped = {f"B{index:04d}": float(index) for index in range(2000)}
+    text = digest_result({"grouped_sums": grouped}, 300)
+    assert count_tokens(text) <= 300
+    digest = json.loads(text)["grouped_sums"]
+    assert digest["count"] == 2000 and digest["max"] == 1999.0 and digest["sum"] == sum(grouped.values())
+    assert "B1999" in digest["top"] and "B0000" in digest["bottom"]
+
+
+def test_parallel_series_are_sampled_at_the_same_points():
+    days = [(date(2023, 1, 1) + timedelta(days=offset)).isoformat() for offset in range(365)]
+    trend = {"dates": days, "values": list(range(365))}
+    digest = json.loads(digest_result(trend, 250))
+    assert digest["dates"]["sample"][0] == days[0] and digest["dates"]["sample"][-1] == days[-1]
+    assert [days.index(day) for day in digest["dates"]["sample"]] == digest["values"]["sample"]
+
+
+def test_large_row_set_digest():
+    rows = [(date(2024, 1, 1) + timedelta(days=offset), f"B{offset % 7}", float(offset)) for offset in range(500)]
+    text = digest_rows(["date", "building_id", "opex"], rows, 400,
+                       digest={"row_count": 5000, "columns": {"opex": {"min": 0.0, "max": 4999.0, "sum": 1.2e7}}})
+    assert count_tokens(text) <= 400
+    assert "Query results (5000 rows)" in text and '"max":4999.0' in text
+    assert '["2024-01-01","B0",0.0]' in text  # first row of the sampled series / bottom row
+    assert '499.0]' in text  # top row by opex
+
+
+def test_sample_indices_keep_endpoints():
+    assert sample_indices(5, 10) == [0, 1, 2, 3, 4]
+    indices = sample_indices(1000, 12)
+    assert indices[0] == 0 and indices[-1] == 999 and len(indices) == 12
@@ -0,0 +1,42 @@
+from src.chat_gpt.rollup_rewriter import rewrite_to_rollup
+
+
+def test_daily_average_uses_daily_rollup():
+    """A per-day average over raw readings is answered from the daily view."""
+    sql = ("SELECT fu.building_id, fu.time::date AS day, AVG(fu.occupancy) AS avg_occ "
+           "FROM floor_utilization fu "
+           "WHERE fu.time >= '2024-01-01' AND fu.time < '2024-02-01' "
+           "GROUP BY fu.building_id, fu.time::date")
+    rewritten = rewrite_to_rollup(sql)
+    assert "floor_utilization_daily fu" in rewritten
+    assert "SUM(fu.occupancy_sum)::numeric / NULLIF(SUM(fu.reading_count), 0)" in rewritten
+    assert "fu.period_start >= '2024-01-01'" in rewritten
+    assert "fu.time" not in rewritten
+
+
+def test_unbucketed_aggregate_uses_monthly_rollup():
+    sql = "SELECT building_id, MAX(occupancy) FROM floor_utilization GROUP BY building_id"
+    rewritten = rewrite_to_rollup(sql)
+    assert "FROM floor_utilization_monthly AS floor_utilization" in rewritten
+    assert "MAX(floor_utilization.occupancy_max)" in rewritten
+
+
+def test_hour_of_day_uses_hourly_rollup():
+    sql = ("SELECT EXTRACT(hour FROM time) AS h, SUM(occupancy) FROM floor_utilization "
+           "GROUP BY EXTRACT(hour FROM time)")
+    rewritten = rewrite_to_rollup(sql)
+    assert "floor_utilization_hourly" in rewritten
+    assert "EXTRACT(hour FROM floor_utilization.period_start)" in rewritten
+
+
+def test_queries_the_rollup_cannot_answer_are_untouched():
+    """Raw rows, unaligned bounds and row-count semantics stay on the raw table."""
+    untouched = [
+        "SELECT building_id, time, occupancy FROM floor_utilization",
+        "SELECT AVG(occupancy) FROM floor_utilization WHERE time >= NOW() - INTERVAL '7 days'",
+        "SELECT building_id, COUNT(*) FROM floor_utilization GROUP BY building_id",
+        "SELECT AVG(occupancy) FROM floor_utilization WHERE time >= '2024-01-01 08:30'",
+        "SELECT building_id, address FROM buildings",
+    ]
+    for sql in untouched:
+        assert rewrite_to_rollup(sql) == sql
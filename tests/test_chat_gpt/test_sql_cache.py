@@ -0,0 +1,57 @@
+import pytest
+from src.chat_gpt.sql_cache import QuestionSQLCache, normalize_question
+
+
+@pytest.fixture
+def sql_cache(tmp_path):
+    return QuestionSQLCache(db_path=str(tmp_path / "sql_cache.db"), schema_version="v1")
+
+
+def test_normalize_question():
+    """
+    Test that punctuation and spacing variants share one normalized form
+    """
+    assert normalize_question("How many buildings are in lease vs. owned?") == \
+        normalize_question("how many  buildings are in lease vs owned")
+    assert normalize_question("Energy cost of B002 in 2023?") == "energy cost of b002 in 2023"
+    assert normalize_question("Rate above 1.5?") == "rate above 1.5"
+
+
+def test_sql_cache_round_trip_with_context(sql_cache):
+    """
+    Test that follow-up context is part of the key
+    """
+    context = {"previous_question": "Which building has the highest capacity?",
+               "previous_field": "employee_capacity"}
+    sql_cache.put("and the lowest?", "SELECT MIN(employee_capacity) FROM buildings", context)
+
+    assert sql_cache.get("And the lowest", context) == "SELECT MIN(employee_capacity) FROM buildings"
+    assert sql_cache.get("and the lowest?") is None
+
+    metrics = sql_cache.metrics()
+    assert metrics['hits'] == 1
+    assert metrics['misses'] == 1
+    assert metrics['entries'] == 1
+
+
+def test_sql_cache_schema_version_and_purge(tmp_path, sql_cache):
+    """
+    Test that entries are scoped to a schema version and can be purged
+    """
+    sql_cache.put("How many buildings?", "SELECT COUNT(*) FROM buildings")
+    other_schema = QuestionSQLCache(db_path=sql_cache.db_path, schema_version="v2")
+    assert other_schema.get("How many buildings?") is None
+
+    assert sql_cache.purge(older_than_days=1) == 0
+    assert sql_cache.purge() == 1
+    assert sql_cache.get("How many buildings?") is None
+
+
+def test_sql_cache_evict(sql_cache):
+    """
+    Test that failing SQL is evicted, but not an entry that was replaced in the meantime
+    """
+    sql_cache.put("How many buildings?", "SELECT COUNT(*) FROM building")
+    assert not sql_cache.evict("How many buildings?", sql_query="SELECT 1")
+    assert sql_cache.evict("how many buildings", sql_query="SELECT COUNT(*) FROM building")
+    assert sql_cache.get("How many buildings?") is None
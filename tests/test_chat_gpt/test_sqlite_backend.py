@@ -0,0 +1,103 @@
+import sqlite3
+import time
+
+import pytest
+
+from src.chat_gpt.execution_backend import SQLiteBackend
+from src.chat_gpt.sqlite_dialect import register_functions, to_sqlite
+from src.utils import columnar_cache
+from src.utils.columnar_cache import ColumnarCache
+
+
+def test_postgres_syntax_is_rewritten():
+    sql = ("SELECT SUM(opex)::numeric / COUNT(*) FROM financials "
+           "WHERE EXTRACT(YEAR FROM date) = 2023 AND city ILIKE 'new%' "
+           "AND date >= DATE '2023-01-01' AND date < CURRENT_DATE - INTERVAL '1 month'")
+    rewritten = to_sqlite(sql)
+    assert rewritten.startswith("SELECT CAST(SUM(opex) AS REAL) / COUNT(*) FROM financials")
+    assert "date_part('year', date)" in rewritten
+    assert "LIKE 'new%'" in rewritten and "ILIKE" not in rewritten
+    assert "date('2023-01-01')" in rewritten
+    assert "date(CURRENT_DATE, '-1 months')" in rewritten
+
+
+def test_plain_sql_is_unchanged():
+    sql = "SELECT building_id, AVG(occupancy) FROM floor_utilization GROUP BY building_id"
+    assert to_sqlite(sql) == sql
+    sql = "SELECT date, SUM(opex) FROM financials WHERE date >= '2023-01-01' GROUP BY date"
+    assert to_sqlite(sql) == sql
+
+
+def test_cast_to_date_keeps_the_date():
+    sql = "SELECT CAST(date AS date) AS d, SUM(x) FROM t GROUP BY CAST(date AS date)"
+    assert to_sqlite(sql) == "SELECT date(date) AS d, SUM(x) FROM t GROUP BY date(date)"
+    assert to_sqlite("SELECT CAST(x AS timestamp), CAST(y AS numeric)") == "SELECT datetime(x), CAST(y AS numeric)"
+
+    connection = sqlite3.connect(":memory:")
+    connection.execute("CREATE TABLE t (date TEXT, x INTEGER)")
+    connection.executemany("INSERT INTO t VALUES (?, ?)", [("2023-05-01 00:00:00", 1), ("2023-05-01 12:00:00", 1),
+                                                          ("2023-06-01 00:00:00", 1)])
+    assert connection.execute(to_sqlite(sql + " ORDER BY d")).fetchall() == [("2023-05-01", 2), ("2023-06-01", 1)]
+
+
+def test_rewrite_keeps_the_original_text_around_it():
+    sql = "SELECT SUM(x) AS total,  MAX(t)::date -- last day\nFROM t WHERE t >= DATE '2024-01-01'"
+    assert to_sqlite(sql) == "SELECT SUM(x) AS total,  date(MAX(t)) -- last day\nFROM t WHERE t >= date('2024-01-01')"
+
+
+def test_registered_functions():
+    connection = sqlite3.connect(":memory:")
+    register_functions(connection)
+    row = connection.execute(
+        "SELECT date_trunc('month', '2024-03-17 10:30:00'), date_part('quarter', '2024-08-01'), "
+        "to_char('2024-03-17', 'YYYY-MM'), greatest(1, NULL, 3)").fetchone()
+    assert row == ('2024-03-01 00:00:00', 3, '2024-03', 3)
+    stddev = connection.execute(
+        "SELECT stddev(x) FROM (SELECT 2 AS x UNION ALL SELECT 4 UNION ALL SELECT 6)").fetchone()[0]
+    assert abs(stddev - 2.0) < 1e-9
+
+
+@pytest.fixture(autouse=True)
+def isolated_columnar_cache(tmp_path, monkeypatch):
+    """Keep the backend's CSV loads out of the process-wide cache in the working tree"""
+    monkeypatch.setattr(columnar_cache, "_cache", ColumnarCache(str(tmp_path / "columnar_cache"), "pickle"))
+
+
+def test_backend_loads_csvs_and_truncates(tmp_path):
+    (tmp_path / "Buildings.csv").write_text(
+        "building_id,address,city,region,size,employee_capacity,market_rate\n"
+        "B001,1 Main St,Seattle,NA,1000,50,40\n"
+        "B002,2 Main St,Boston,NA,2000,80,45\n")
+    (tmp_path / "Financial_Data.csv").write_text(
+        "building_id,date,lease_cost,total_operating_expense\n"
+        "B001,01/01/2023,100,500\nB001,01/02/2023,110,520\nB002,01/01/2023,200,900\n")
+    backend = SQLiteBackend(str(tmp_path), timeout_ms=2000)
+
+    result = backend.execute("SELECT region, COUNT(*) AS n FROM buildings GROUP BY region", 10)
+    assert result["rows"] == [("NA", 2)]
+
+    result = backend.execute("SELECT building_id, EXTRACT(MONTH FROM date) AS m FROM financials "
+                             "WHERE date >= DATE '2023-02-01'", 10)
+    assert result["rows"] == [("B001", 2)]
+
+    result = backend.execute("SELECT * FROM financials", 2)
+    assert result["truncated"] and result["row_count"] == 2
+    assert result["digest"]["row_count"] == 3
+    assert backend.data_versions()["financials"] == 1
+
+    # The keys the Streamlit sidebar shows for the embedded backend
+    metrics = backend.metrics()
+    assert metrics["backend"] == "sqlite" and metrics["queries"] == 3 and metrics["timeouts"] == 0
+    assert metrics["load_seconds"] >= 0 and "generation" in metrics
+
+
+def test_timeout_covers_reading_rows(tmp_path):
+    backend = SQLiteBackend(str(tmp_path), timeout_ms=200)
+    # The first row is ready at once, the rest only after ~100M recursion steps
+    slow_rows = ("WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 100000000) "
+                 "SELECT x FROM c WHERE x % 1000 = 1")
+    started = time.monotonic()
+    result = backend.execute(slow_rows, 1_000_000)
+    assert result["error"] == "Query timed out"
+    assert backend.fetch_page(slow_rows, 0, 1_000_000)["error"] == "Query timed out"
+    assert time.monotonic() - started < 10
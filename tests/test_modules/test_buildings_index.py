@@ -0,0 +1,34 @@
+from src.modules.buildings import BuildingsModule
+
+
+def test_compound_criteria_intersect(full_buildings_df):
+    module = BuildingsModule(full_buildings_df.copy())
+
+    assert list(module.find_buildings({'location': 'new'})['Building ID']) == ['B001', 'B004']
+    assert list(module.find_buildings({'location': 'new', 'purpose': 'office',
+                                       'ownership_type': 'Corporate'})['Building ID']) == ['B001', 'B004']
+    assert list(module.find_buildings({'purpose': 'office', 'leed_certified': True})['Building ID']) == ['B001', 'B003']
+    assert list(module.find_buildings({'min_size': 10000, 'max_size': 80000})['Building ID']) == ['B001', 'B002']
+    assert module.find_buildings({'location': 'Boston'}).empty
+    assert len(module.find_buildings({})) == 4
+
+
+def test_search_results_are_memoized_and_isolated(full_buildings_df):
+    module = BuildingsModule(full_buildings_df.copy())
+    first = module.find_buildings({'purpose': 'office', 'location': 'new'})
+    first['Size'] = 0
+
+    again = module.find_buildings({'location': 'new', 'purpose': 'office'})
+    assert len(module._search_cache) == 1
+    assert list(again['Size']) == [50000, 120000]
+
+
+def test_profile_lookup_and_overview_are_repeatable(full_buildings_df):
+    module = BuildingsModule(full_buildings_df.copy())
+    profile = module.generate_building_profile('B003')
+    assert profile['id'] == 'B003'
+    assert profile['location_details']['city'] == 'San Francisco'
+    assert module.generate_building_profile('B999') is None
+
+    assert module.get_portfolio_overview()['leed_certified_percentage'] == 50
+    assert module.get_portfolio_overview()['leed_certified_percentage'] == 50
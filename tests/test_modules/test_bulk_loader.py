@@ -0,0 +1,75 @@
+import sqlite3
+from datetime import datetime
+
+from src.data_manager.bulk_loader import (bulk_load_csv, delete_duplicate_keys, ensure_natural_key, normalize_column,
+                                          upsert_from_staging)
+
+
+def test_headers_are_normalized():
+    assert normalize_column("﻿Building ID") == "building_id"
+    assert normalize_column("Energy Costs (USD)") == "energy_costs"
+    assert normalize_column("max_capacity") == "max_capacity"
+
+
+def test_upsert_updates_only_changed_rows(fake_connection):
+    cursor = fake_connection.cursor()
+    upsert_from_staging(cursor, "floor_utilization", "staging_floor_utilization",
+                        ["building_id", "floor", "time", "occupancy"])
+    sql = cursor.statements[-1]
+    assert 'ON CONFLICT ("building_id", "floor", "time") DO UPDATE SET "occupancy" = EXCLUDED."occupancy"' in sql
+    assert 'WHERE "floor_utilization"."occupancy" IS DISTINCT FROM EXCLUDED."occupancy"' in sql
+    assert 'DISTINCT ON ("building_id", "floor", "time")' in sql
+
+
+def test_csv_is_copied_in_chunks(tmp_path, fake_connection):
+    csv_path = tmp_path / "occupancy.csv"
+    csv_path.write_text("Building ID,Floor,Time,Occupancy\n"
+                        + "".join(f"B001,{floor},01/01/2024 09:00,{floor * 3}\n" for floor in range(5)),
+                        encoding="utf-8-sig")
+    cursor = fake_connection.cursor()
+    cursor.default = (datetime(2024, 1, 1, 9), datetime(2024, 2, 3, 9))
+
+    bulk_load_csv(fake_connection, str(csv_path), "floor_utilization", chunk_rows=2)
+
+    assert [chunk.count("\n") for chunk in cursor.copied] == [2, 2, 1]
+    assert "Building ID" not in "".join(cursor.copied)
+    assert any("floor_utilization_natural_key" in sql for sql in cursor.statements)
+    assert any("floor_utilization_y2024m02 PARTITION OF" in sql for sql in cursor.statements)
+    assert fake_connection.committed
+
+
+def test_quoted_newlines_stay_in_one_chunk(tmp_path, fake_connection):
+    csv_path = tmp_path / "buildings.csv"
+    csv_path.write_text('Building ID,Address\nB001,"1 Main St\nSuite 2"\nB002,"2 ""Old"" Rd"\nB003,3 Elm St\n',
+                        encoding="utf-8-sig")
+
+    bulk_load_csv(fake_connection, str(csv_path), "buildings", chunk_rows=1)
+
+    assert fake_connection.cursor_obj.copied == ['B001,"1 Main St\nSuite 2"\n', 'B002,"2 ""Old"" Rd"\n',
+                                                 'B003,3 Elm St\n']
+
+
+def test_duplicates_from_old_loads_are_removed_before_the_index():
+    connection = sqlite3.connect(":memory:")
+    connection.execute("CREATE TABLE financials (id INTEGER PRIMARY KEY, building_id TEXT, date TEXT, energy_costs REAL)")
+    connection.executemany("INSERT INTO financials VALUES (?, ?, ?, ?)", [
+        (1, "B001", "2023-01-01", 10.0), (2, "B001", "2023-02-01", 11.0),
+        (3, "B001", "2023-01-01", 10.0), (4, "B001", "2023-02-01", 12.0), (5, "B002", "2023-01-01", 7.0),
+    ])
+
+    assert delete_duplicate_keys(connection.cursor(), "financials") == 2
+    assert connection.execute("SELECT id, energy_costs FROM financials ORDER BY id").fetchall() == \
+        [(3, 10.0), (4, 12.0), (5, 7.0)]
+    connection.execute("CREATE UNIQUE INDEX financials_natural_key ON financials (building_id, date)")
+
+
+def test_existing_natural_key_is_left_alone(fake_connection):
+    cursor = fake_connection.cursor()
+    cursor.answers["to_regclass"] = ("financials_natural_key",)
+    ensure_natural_key(cursor, "financials")
+    assert len(cursor.statements) == 1 and "to_regclass" in cursor.statements[0]
+
+    cursor.answers["to_regclass"] = (None,)
+    ensure_natural_key(cursor, "financials")
+    assert "DELETE FROM \"financials\"" in cursor.statements[2]
+    assert "CREATE UNIQUE INDEX IF NOT EXISTS financials_natural_key" in cursor.statements[3]
@@ -0,0 +1,37 @@
+import pandas as pd
+
+from src.utils.columnar_cache import ColumnarCache
+
+CSV = "﻿building_id,date,lease_cost,region\nB001,01/02/2020,0,NA\nB002,13/02/2020,1500,EMEA\n"
+
+
+def test_loaded_table_is_typed(tmp_path):
+    csv_path = tmp_path / "Financial_Data.csv"
+    csv_path.write_text(CSV, encoding="utf-8")
+
+    df = ColumnarCache(str(tmp_path / "cache")).load(str(csv_path))
+
+    assert list(df.columns) == ["building_id", "date", "lease_cost", "region"]
+    assert isinstance(df["building_id"].dtype, pd.CategoricalDtype)
+    assert df["date"].tolist() == [pd.Timestamp("2020-02-01"), pd.Timestamp("2020-02-13")]
+    assert df["lease_cost"].dtype == "float64"
+    assert df["region"].tolist() == ["NA", "EMEA"]
+
+
+def test_conversion_reruns_only_when_content_changes(tmp_path, monkeypatch):
+    csv_path = tmp_path / "Financial_Data.csv"
+    csv_path.write_text(CSV, encoding="utf-8")
+    cache = ColumnarCache(str(tmp_path / "cache"))
+    conversions = []
+    convert = cache.convert
+    monkeypatch.setattr(cache, "convert", lambda path: conversions.append(path) or convert(path))
+
+    cache.load(str(csv_path))
+    cache.load(str(csv_path))
+    # A fresh instance reads the manifest written by the first
+    assert len(ColumnarCache(str(tmp_path / "cache")).load(str(csv_path))) == 2
+    assert len(conversions) == 1
+
+    csv_path.write_text(CSV + "B003,01/03/2020,10,APAC\n", encoding="utf-8")
+    assert len(cache.load(str(csv_path))) == 3
+    assert len(conversions) == 2
@@ -0,0 +1,44 @@
+import numpy as np
+
+from src.modules.financial import ANOMALY_COLUMNS, CostAnomalyTracker, FinancialModule
+
+
+def test_z_scores_are_per_building(full_financial_df):
+    """A spike is judged against its own building's history, not the portfolio's."""
+    df = full_financial_df.copy()
+    df.loc[(df['Building ID'] == 'B002') & (df['Date'] == '2023-06-01'), 'Energy Costs (USD)'] = 5000
+    module = FinancialModule(df)
+
+    anomalies = module.detect_cost_anomalies()
+    assert list(anomalies.columns) == ANOMALY_COLUMNS
+    assert anomalies[['building_id', 'cost_type']].values.tolist() == [['B002', 'Energy']]
+
+    records = module.identify_cost_anomalies('B002')
+    assert records[0]['amount'] == 5000 and records[0]['description'] == "Unusual energy costs (usd) detected"
+    assert module.identify_cost_anomalies('B001') == []
+
+
+def test_tracker_matches_batch_statistics(full_financial_df):
+    module = FinancialModule(full_financial_df.copy())
+    history = module.data[module.data['Date'] < '2023-07-01']
+    appended = module.data[module.data['Date'] >= '2023-07-01']
+
+    tracker = CostAnomalyTracker(module.cost_columns)
+    for _, month in history.groupby('Date'):
+        tracker.update(month)
+
+    grouped = history.groupby('Building ID')[module.cost_columns]
+    expected = ((appended[module.cost_columns].to_numpy() - grouped.mean().loc[appended['Building ID']].to_numpy())
+                / grouped.std().loc[appended['Building ID']].to_numpy())
+    assert np.allclose(tracker.z_scores(appended), expected)
+
+    tracker.update(appended)
+    assert np.allclose(tracker.mean, module.anomaly_tracker().mean)
+    assert np.allclose(tracker.m2, module.anomaly_tracker().m2)
+
+
+def test_tracker_scores_unseen_building_as_nan(full_financial_df):
+    tracker = FinancialModule(full_financial_df.copy()).anomaly_tracker(seasonal=True)
+    new_building = full_financial_df.head(1).assign(**{'Building ID': 'B003'})
+    assert np.isnan(tracker.z_scores(new_building)).all()
+    assert tracker.score(new_building).empty
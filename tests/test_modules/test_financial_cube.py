@@ -0,0 +1,61 @@
+import pytest
+
+from src.modules.financial import FinancialModule
+
+
+def test_overview_matches_row_totals(full_financial_df):
+    module = FinancialModule(full_financial_df.copy())
+    overview = module.get_financial_overview()
+
+    by_year = full_financial_df.groupby(full_financial_df['Date'].dt.year)['Total Operating Expense (USD)']
+    assert overview['total_annual_expenses'] == by_year.sum().to_dict()
+    assert overview['avg_annual_expenses'] == pytest.approx(by_year.mean().to_dict())
+    assert overview['expense_breakdown'][2023]['Energy'] == full_financial_df.loc[
+        full_financial_df['Date'].dt.year == 2023, 'Energy Costs (USD)'].sum()
+
+
+def test_building_lookups(full_financial_df):
+    module = FinancialModule(full_financial_df.copy())
+
+    analysis = module.analyze_building_financials('B001')
+    assert set(analysis['annual_expenses']) == {2022, 2023}
+    assert list(analysis['cost_trends']['Energy']['year_over_year_change']) == [2023]
+    assert module.analyze_building_financials('B002')['cost_trends'] == {}
+    assert module.analyze_building_financials('B999') is None
+
+    utilities = module.get_utilities_breakdown('B002', 2022)
+    assert utilities['Total Utilities Costs'] == 0
+
+    assert module.fetch_query_result('B001', 2023, 'Energy Costs (USD)') == \
+        "The Energy Costs (USD) for Building B001 in 2023 was $220."
+    assert module.fetch_query_result('B002', 2022, 'Energy Costs (USD)') == "No data available for B002 in 2022."
+    assert module.fetch_query_result('B001', None, 'Energy Costs (USD)') == "No data available for B001 in None."
+    assert module.fetch_query_result('B001', 'last', 'Energy Costs (USD)') == "No data available for B001 in last."
+    assert "Invalid cost type" in module.fetch_query_result('B001', 2023, 'Rent')
+
+
+def test_window_total_uses_prefix_sums(full_financial_df):
+    module = FinancialModule(full_financial_df.copy())
+    window = full_financial_df[(full_financial_df['Date'] >= '2022-06-01') & (full_financial_df['Date'] < '2023-03-01')]
+
+    assert module.window_total('Energy Costs (USD)', '2022-06-01', '2023-03-01') == window['Energy Costs (USD)'].sum()
+    assert module.window_total('Energy Costs (USD)', '2022-06-15', '2023-03-01', 'B002') == \
+        window.loc[window['Building ID'] == 'B002', 'Energy Costs (USD)'].sum()
+    assert module.window_total('Energy Costs (USD)', '2019-01-01', '2030-01-01') == \
+        full_financial_df['Energy Costs (USD)'].sum()
+
+
+def test_detailed_summary_is_memoized_per_data_version(full_financial_df):
+    module = FinancialModule(full_financial_df.copy())
+    summary = module.get_detailed_financial_summary()
+
+    expected = full_financial_df[full_financial_df['Building ID'] == 'B001'].groupby(
+        full_financial_df['Date'].dt.year)[['Energy Costs (USD)', 'Total Operating Expense (USD)']].sum().to_dict()
+    assert summary['B001']['Energy Costs (USD)'] == expected['Energy Costs (USD)']
+    assert summary['B001']['Total Operating Expense (USD)'] == expected['Total Operating Expense (USD)']
+    assert list(summary['B002']['Energy Costs (USD)']) == [2023]
+    assert module.get_detailed_financial_summary() is summary
+
+    module.reload(full_financial_df[full_financial_df['Building ID'] == 'B002'].copy())
+    assert module.data_version == 1
+    assert list(module.get_detailed_financial_summary()) == ['B002']
@@ -0,0 +1,57 @@
+import pandas as pd
+
+from src.utils.financial_dataset import FinancialDataset, financial_dataset
+from src.utils.gpt_helper import calculate_sum, calculate_trend
+
+
+def test_select_slices_buildings_and_windows(full_financial_df):
+    shuffled = full_financial_df.sample(frac=1, random_state=0)
+    dataset = FinancialDataset(shuffled)
+
+    assert dataset.offsets == {'B001': (0, 24), 'B002': (24, 36)}
+    assert list(dataset.frame.columns[-3:]) == ['year', 'month', 'yyyymm']
+
+    rows = dataset.select(building_id='B001', year=2023)
+    assert len(rows) == 12 and rows['Date'].is_monotonic_increasing
+    portfolio = dataset.select(year=2023)
+    assert set(portfolio['Building ID']) == {'B001', 'B002'}
+    assert portfolio.index.equals(dataset.frame.index[dataset.frame['year'] == 2023])
+    assert len(dataset.select(start_date='2023-11-01', end_date='2023-12-01')) == 4
+    assert dataset.select(building_id='B003').empty
+    assert dataset.select(year=2021).empty
+
+
+def test_dataset_is_prepared_once_per_frame(full_financial_df):
+    assert financial_dataset(full_financial_df) is financial_dataset(full_financial_df)
+    assert financial_dataset(full_financial_df.copy()) is not financial_dataset(full_financial_df)
+
+
+def test_in_place_changes_prepare_the_dataset_again(full_financial_df):
+    df = full_financial_df
+    first = financial_dataset(df)
+
+    df.loc[0, 'Energy Costs (USD)'] = 9999
+    corrected = financial_dataset(df)
+    assert corrected is not first
+    assert corrected.select(building_id='B001', year=2022)['Energy Costs (USD)'].iloc[0] == 9999
+
+    df.loc[len(df)] = {**df.iloc[-1].to_dict(), 'Date': pd.Timestamp('2024-01-01')}
+    assert len(financial_dataset(df).select(building_id='B002', year=2024)) == 1
+    assert financial_dataset(df) is financial_dataset(df)
+
+
+def test_calculators_use_the_dataset_without_mutating_input():
+    df = pd.DataFrame({
+        'Building ID': ['B002', 'B001', 'B001', 'B002'],
+        'Date': ['2023-02-01', '2023-01-01', '2022-12-01', '2023-01-01'],
+        'Energy Costs (USD)': [30, 10, 5, 20],
+    })
+    before = df.copy()
+
+    trend = calculate_trend({'field': 'Energy Costs (USD)', 'building_id': 'B002'}, None, df, {'year': 2023})
+    assert trend['values'] == [20, 30] and trend['overall_trend'] == 'increasing'
+
+    total = calculate_sum({'field': 'Energy Costs (USD)', 'dataset': 'financial', 'groupby': 'Building ID'},
+                          None, df, {'year': 2023})
+    assert total == {'grouped_sums': {'B001': 10, 'B002': 50}, 'total': 60}
+    pd.testing.assert_frame_equal(df, before)
@@ -0,0 +1,34 @@
+import pandas as pd
+
+from src.utils.gpt_helper import column_token_index, execute_flexible_query
+
+
+def _buildings():
+    return pd.DataFrame({
+        'Building ID': ['B001', 'B002', 'B003'],
+        'Floors': [12, 30, 12],
+        'Employee Capacity': [100, 250, 80],
+    })
+
+
+def test_columns_match_whole_tokens():
+    index = column_token_index(('Energy Costs (USD)', 'Employee Capacity'))
+    assert index['cost'] == ['Energy Costs (USD)']
+    assert 'e' not in index and 'capacit' not in index
+
+
+def test_operations_run_over_candidate_columns(full_financial_df):
+    result = execute_flexible_query({'user_query': 'What is the highest employee capacity?'},
+                                    _buildings(), full_financial_df)
+    assert result['query_interpretation']['column_candidates'] == ['Employee Capacity']
+    assert result['result'] == {'Max of Employee Capacity': 250}
+
+    result = execute_flexible_query({'user_query': 'total and average energy costs'}, full_financial_df)
+    assert result['result']['Sum of Energy Costs (USD)'] == full_financial_df['Energy Costs (USD)'].sum()
+    assert result['result']['Average of Energy Costs (USD)'] == full_financial_df['Energy Costs (USD)'].mean()
+
+
+def test_numbers_filter_numeric_candidates_only(full_financial_df):
+    result = execute_flexible_query({'user_query': 'how many buildings have 12 floors'},
+                                    _buildings(), full_financial_df)
+    assert result['result']['Count of Floors'] == 2
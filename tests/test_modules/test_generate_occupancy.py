@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from src.data_manager import generate_occupancy
+from src.data_manager.generate_occupancy import generate_realistic_occupancy, time_grid
+
+FLOORS = pd.DataFrame({"building_id": ["B001", "B001"], "floor": [1, 0], "max_capacity": [40, 10]})
+
+
+def test_time_grid_skips_weekends_and_holidays():
+    # Fri 5 Jan .. Mon 8 Jan 2024, with the Monday as a holiday
+    times = time_grid(datetime(2024, 1, 5), datetime(2024, 1, 8), timedelta(minutes=30), [datetime(2024, 1, 8)])
+    assert set(times.date) == {datetime(2024, 1, 5).date()}
+    assert times[0] == pd.Timestamp("2024-01-05 07:00") and times[-1] == pd.Timestamp("2024-01-05 20:00")
+    assert len(times) == 27
+
+
+def test_occupancy_is_reproducible_and_within_capacity():
+    times = time_grid(datetime(2024, 3, 4), datetime(2024, 3, 8), timedelta(minutes=30), [])
+    rates = {0: 0.5, 1: 0.9}
+    first = generate_realistic_occupancy("B001", FLOORS, times, rates, np.random.default_rng(7))
+    second = generate_realistic_occupancy("B001", FLOORS, times, rates, np.random.default_rng(7))
+
+    pd.testing.assert_frame_equal(first, second)
+    assert list(first.columns) == ["Building ID", "Floor", "Time", "Occupancy"]
+    assert len(first) == 2 * len(times)
+    capacity = first["Floor"].map({0: 10, 1: 40})
+    assert ((first["Occupancy"] >= 0) & (first["Occupancy"] <= capacity)).all()
+    assert first["Time"].iloc[0] == "04/03/2024 07:00"
+
+
+def test_main_creates_the_output_directory(tmp_path, monkeypatch):
+    capacities = tmp_path / "floors_occupancy.csv"
+    capacities.write_text("building_id,floor,max_capacity\nB001,0,50\n")
+    output_dir = tmp_path / "out" / "readings"
+    monkeypatch.setattr("sys.argv", ["generate_occupancy", "--capacities", str(capacities),
+                                     "--output-dir", str(output_dir), "--start", "2024-03-04",
+                                     "--end", "2024-03-05", "--workers", "1"])
+
+    generate_occupancy.main()
+
+    assert (output_dir / "Building_Group_1_Occupancy_2024.csv").exists()
@@ -0,0 +1,22 @@
+from src.data_manager.generate_portfolio import read_templates, scale_portfolio
+
+
+def test_scale_factor_multiplies_a_consistent_portfolio():
+    templates = read_templates("data")
+    buildings, financials, floors = scale_portfolio(*templates, scale_factor=2, seed=1)
+
+    assert len(buildings) == 2 * len(templates[0])
+    assert buildings["building_id"].is_unique
+    assert set(financials["building_id"]) <= set(buildings["building_id"])
+    assert set(floors["building_id"]) == set(buildings["building_id"])
+    # Scale factor 1 is the real portfolio
+    assert buildings.head(len(templates[0])).drop(columns="building_id").equals(
+        templates[0].drop(columns="building_id"))
+    assert len(financials) == 2 * len(templates[1])
+
+
+def test_same_seed_same_portfolio():
+    templates = read_templates("data")
+    first = scale_portfolio(*templates, scale_factor=1.5, seed=3)
+    second = scale_portfolio(*templates, scale_factor=1.5, seed=3)
+    assert all(a.equals(b) for a, b in zip(first, second))
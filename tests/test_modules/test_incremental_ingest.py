@@ -0,0 +1,108 @@
+import re
+import sqlite3
+from datetime import datetime
+
+from src.chat_gpt.sqlite_dialect import register_functions
+from src.data_manager import incremental_ingest
+from src.data_manager.incremental_ingest import append_past_watermarks, file_hash, incremental_load_csv
+
+COLUMNS = ["building_id", "floor", "time", "occupancy"]
+
+
+class SQLiteCursor:
+    """Runs the loader's psycopg2-style SQL (%s / %(name)s parameters) on a sqlite3 connection"""
+
+    def __init__(self, connection):
+        self._cursor = connection.cursor()
+
+    def execute(self, sql, params=None):
+        self._cursor.execute(re.sub(r"%\((\w+)\)s", r":\1", sql).replace("%s", "?"), params or ())
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+
+def watermark_db():
+    connection = sqlite3.connect(":memory:")
+    register_functions(connection)  # GREATEST and now()
+    connection.executescript("""
+        CREATE TABLE floor_utilization (building_id TEXT, floor INTEGER, time TEXT, occupancy INTEGER,
+                                        UNIQUE (building_id, floor, time));
+        CREATE TABLE ingest_watermarks (table_name TEXT, building_id TEXT, floor INTEGER, max_time TEXT,
+                                        updated_at TEXT, PRIMARY KEY (table_name, building_id, floor));
+        CREATE TABLE staging (building_id TEXT, floor INTEGER, time TEXT, occupancy INTEGER);
+        INSERT INTO ingest_watermarks VALUES ('floor_utilization', 'B001', 0, '2024-01-02 08:00:00', NULL);
+    """)
+    return connection
+
+
+def write_occupancy(tmp_path):
+    csv_path = tmp_path / "Building_Group_1_Occupancy_2024.csv"
+    csv_path.write_text("Building ID,Floor,Time,Occupancy\nB001,0,02/01/2024 07:00,12\n")
+    return str(csv_path)
+
+
+def test_unchanged_file_is_skipped(tmp_path, fake_connection):
+    csv_path = write_occupancy(tmp_path)
+    cursor = fake_connection.cursor()
+    cursor.answers["FROM ingested_files"] = (file_hash(csv_path),)
+
+    stats = incremental_load_csv(fake_connection, csv_path, "floor_utilization")
+
+    assert stats["skipped"]
+    assert not cursor.copied
+
+
+def test_changed_file_appends_past_watermarks(tmp_path, fake_connection):
+    csv_path = write_occupancy(tmp_path)
+    cursor = fake_connection.cursor()
+    cursor.answers["FROM ingested_files"] = ("0" * 64,)
+    cursor.default = (datetime(2024, 1, 2, 7), datetime(2024, 1, 2, 7))
+
+    stats = incremental_load_csv(fake_connection, csv_path, "floor_utilization")
+
+    assert not stats["skipped"]
+    assert len(cursor.copied) == 1
+    sql = "\n".join(cursor.statements)
+    assert "s.time > w.max_time" in sql
+    assert "GREATEST(ingest_watermarks.max_time, EXCLUDED.max_time)" in sql
+    assert "INSERT INTO ingested_files" in sql
+
+
+def test_only_readings_past_the_watermark_are_appended(monkeypatch):
+    connection = watermark_db()
+    partitions = []
+    monkeypatch.setattr(incremental_ingest, "ensure_partitions",
+                        lambda cursor, table_name, start, end: partitions.append((start, end)))
+    connection.executemany("INSERT INTO staging VALUES (?, ?, ?, ?)", [
+        ("B001", 0, "2024-01-02 07:00:00", 3),  # before the watermark
+        ("B001", 0, "2024-01-02 08:00:00", 9),  # at the watermark: already loaded
+        ("B001", 0, "2024-01-02 09:00:00", 7),
+        ("B001", 1, "2024-01-02 06:00:00", 2),  # floor without a watermark yet
+    ])
+
+    assert append_past_watermarks(SQLiteCursor(connection), "floor_utilization", "staging", COLUMNS) == 2
+    assert connection.execute("SELECT * FROM floor_utilization ORDER BY floor, time").fetchall() == [
+        ("B001", 0, "2024-01-02 09:00:00", 7), ("B001", 1, "2024-01-02 06:00:00", 2)]
+    assert dict(((building, floor), max_time) for building, floor, max_time in connection.execute(
+        "SELECT building_id, floor, max_time FROM ingest_watermarks")) == {
+        ("B001", 0): "2024-01-02 09:00:00", ("B001", 1): "2024-01-02 06:00:00"}
+    assert partitions == [("2024-01-02 06:00:00", "2024-01-02 09:00:00")]
+
+    # Older readings are skipped and never move their watermark back
+    connection.execute("DELETE FROM staging")
+    connection.executemany("INSERT INTO staging VALUES (?, ?, ?, ?)", [
+        ("B001", 0, "2024-01-02 08:30:00", 4), ("B001", 1, "2024-01-02 07:00:00", 6)])
+    assert append_past_watermarks(SQLiteCursor(connection), "floor_utilization", "staging", COLUMNS) == 1
+    assert connection.execute("SELECT floor, max_time FROM ingest_watermarks ORDER BY floor").fetchall() == [
+        (0, "2024-01-02 09:00:00"), (1, "2024-01-02 07:00:00")]
+
+    # Nothing newer at all: no partitions, no writes
+    connection.execute("DELETE FROM staging")
+    connection.execute("INSERT INTO staging VALUES ('B001', 0, '2024-01-02 08:30:00', 4)")
+    assert append_past_watermarks(SQLiteCursor(connection), "floor_utilization", "staging", COLUMNS) == 0
+    assert len(partitions) == 2
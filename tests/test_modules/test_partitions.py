@@ -0,0 +1,21 @@
+from datetime import date, datetime
+
+import pytest
+
+from src.data_manager.partitions import iter_months, partition_statements
+
+
+def test_months_cross_year_boundary():
+    assert list(iter_months(datetime(2024, 11, 15, 8), date(2025, 1, 2))) == [
+        date(2024, 11, 1), date(2024, 12, 1), date(2025, 1, 1)]
+
+
+def test_partition_bounds_are_half_open_months():
+    [statement] = partition_statements("floor_utilization", date(2024, 12, 5), date(2024, 12, 31))
+    assert statement == ("CREATE TABLE IF NOT EXISTS floor_utilization_y2024m12 PARTITION OF floor_utilization "
+                         "FOR VALUES FROM ('2024-12-01') TO ('2025-01-01')")
+
+
+def test_unpartitioned_table_is_refused():
+    with pytest.raises(ValueError):
+        partition_statements("financials", date(2024, 1, 1), date(2024, 1, 1))
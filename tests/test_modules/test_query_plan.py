@@ -0,0 +1,69 @@
+import pandas as pd
+
+from src.utils import gpt_helper
+from src.utils.gpt_helper import calculate_trend, execute_data_query
+
+
+def _buildings():
+    return pd.DataFrame({
+        'Building ID': ['B001', 'B002', 'B003', 'B004'],
+        'Region': ['NA', 'EMEA', 'APAC', 'NA'],
+        'Employee Capacity': [100, 250, 80, 40],
+    })
+
+
+def test_all_calculations_are_answered(full_financial_df):
+    plan = {'calculations': [
+        {'type': 'sum', 'field': 'Energy Costs (USD)', 'dataset': 'financial', 'building_id': 'B001'},
+        {'type': 'sum', 'field': 'Energy Costs (USD)', 'dataset': 'financial', 'building_id': 'B002'},
+        {'type': 'max', 'field': 'Cleaning Costs (USD)', 'dataset': 'financial'},
+    ], 'time_period': {'year': 2023}}
+    result = execute_data_query({'query_plan': plan}, _buildings(), full_financial_df)['result']
+
+    rows_2023 = full_financial_df[full_financial_df['Date'].dt.year == 2023]
+    energy = rows_2023.groupby('Building ID')['Energy Costs (USD)'].sum()
+    assert list(result) == ['sum of Energy Costs (USD) for B001', 'sum of Energy Costs (USD) for B002',
+                            'max of Cleaning Costs (USD)']
+    assert result['sum of Energy Costs (USD) for B001'] == {'total': energy['B001']}
+    assert result['sum of Energy Costs (USD) for B002'] == {'total': energy['B002']}
+    assert result['max of Cleaning Costs (USD)']['value'] == rows_2023['Cleaning Costs (USD)'].max()
+    assert 'yyyymm' not in result['max of Cleaning Costs (USD)']['context']
+
+
+def test_grouped_counts_and_filters_apply_once(full_financial_df):
+    plan = {'calculations': [
+        {'type': 'count', 'field': 'Building ID', 'dataset': 'buildings', 'groupby': 'Region', 'name': 'by_region'},
+        {'type': 'average', 'field': 'Employee Capacity', 'dataset': 'buildings', 'name': 'capacity'},
+    ], 'filters': [{'dataset': 'buildings', 'field': 'Employee Capacity', 'operator': 'greater_than', 'value': 50}]}
+    result = execute_data_query({'query_plan': plan}, _buildings(), full_financial_df)['result']
+
+    assert result['by_region'] == {'grouped_counts': {'APAC': 1, 'EMEA': 1, 'NA': 1}, 'total_count': 3}
+    assert result['capacity'] == {'average': (100 + 250 + 80) / 3}
+
+
+def test_single_calculation_keeps_its_result_shape(full_financial_df):
+    plan = {'calculations': [{'type': 'count', 'field': 'Energy Costs (USD)', 'dataset': 'financial',
+                              'building_id': 'B002'}], 'time_period': {'year': 2022}}
+    assert execute_data_query({'query_plan': plan}, _buildings(), full_financial_df)['result'] == \
+        {'error': 'No data found for the specified criteria'}
+
+
+def test_trends_reuse_the_prepared_dataset(full_financial_df, monkeypatch):
+    plan = {'calculations': [
+        {'type': 'trend', 'field': 'Energy Costs (USD)', 'building_id': 'B001', 'name': 'b001'},
+        {'type': 'trend', 'field': 'Energy Costs (USD)', 'building_id': 'B002', 'name': 'b002'},
+        {'type': 'trend', 'field': 'Energy Costs (USD)', 'name': 'portfolio'},
+    ], 'time_period': {'year': 2023},
+        'filters': [{'dataset': 'financial', 'field': 'Energy Costs (USD)', 'operator': 'greater_than', 'value': 0}]}
+    expected = {calc['name']: calculate_trend(calc, None, full_financial_df, plan['time_period'])
+                for calc in plan['calculations']}
+
+    prepared_for = []
+    financial_dataset = gpt_helper.financial_dataset
+    monkeypatch.setattr(gpt_helper, 'financial_dataset',
+                        lambda df: prepared_for.append(df) or financial_dataset(df))
+    result = execute_data_query({'query_plan': plan}, _buildings(), full_financial_df)['result']
+
+    assert all(df is full_financial_df for df in prepared_for)
+    for name in expected:
+        assert result[name]['values'] == expected[name]['values']